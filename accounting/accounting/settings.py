@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.humanize",
+    "django.contrib.postgres",
     "drf_yasg",
     "ckeditor",
     "num2words",
@@ -89,6 +90,8 @@ CSRF_COOKIE_SAMESITE = "None"
 CSRF_COOKIE_SECURE = True
 CORS_ALLOW_CREDENTIALS = True
 
+# SQLite پشتیبانی نمی‌شود: ایندکس‌های جستجو (gin_trgm_ops روی PersianNormalize) و
+# جستجوی trigram فقط در PostgreSQL کار می‌کنند.
 # DATABASES = {
 #     "default": {
 #         "ENGINE": "django.db.backends.sqlite3",
@@ -107,6 +110,15 @@ DATABASES = {
     }
 }
 
+# کش مشترک بین workerهای gunicorn (کش گزارش‌های مالی، نمودار حساب‌ها، شمارش صفحه‌ها)؛
+# جدول آن یک بار با python manage.py createcachetable ساخته می‌شود.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    }
+}
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
@@ -2,11 +2,18 @@ from django.contrib import admin
 
 from .models import (
     Account,
+    AccountBalance,
+    AccountBalanceSnapshot,
     AccountEntry,
+    AccountEntryArchive,
     AccountingDocument,
     AccountingTransaction,
     AccountPayment,
     DealFinance,
+    DealLedgerSummary,
+    DocumentSequence,
+    FiscalPeriod,
+    IdempotencyKey,
 )
 
 
@@ -20,6 +27,97 @@ class AccountAdmin(admin.ModelAdmin):
     ordering = ("code",)
 
 
+@admin.register(AccountBalance)
+class AccountBalanceAdmin(admin.ModelAdmin):
+    list_display = (
+        "account",
+        "debit_total",
+        "credit_total",
+        "entry_count",
+        "last_entry_id",
+        "updated_at",
+    )
+    search_fields = ("account__name", "account__code")
+    readonly_fields = (
+        "account",
+        "debit_total",
+        "credit_total",
+        "entry_count",
+        "last_entry_id",
+        "updated_at",
+    )
+    ordering = ("account__code",)
+
+
+@admin.register(AccountBalanceSnapshot)
+class AccountBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = (
+        "account",
+        "period_end",
+        "debit_total",
+        "credit_total",
+        "entry_count",
+        "created_at",
+    )
+    list_filter = ("period_end",)
+    search_fields = ("account__name", "account__code")
+    readonly_fields = ("created_at",)
+    raw_id_fields = ("account",)
+    date_hierarchy = "period_end"
+    ordering = ("-period_end", "account__code")
+
+
+@admin.register(DealLedgerSummary)
+class DealLedgerSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        "deal",
+        "account",
+        "debit",
+        "credit",
+        "settled_receive",
+        "settled_pay",
+        "updated_at",
+    )
+    search_fields = ("account__name", "account__code", "deal__title")
+    readonly_fields = ("updated_at",)
+    raw_id_fields = ("deal", "account")
+    ordering = ("-deal_id", "account__code")
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ("doc_type", "office", "fiscal_year", "last_number")
+    list_filter = ("doc_type", "fiscal_year")
+    raw_id_fields = ("office",)
+    ordering = ("-fiscal_year", "doc_type")
+
+
+@admin.register(FiscalPeriod)
+class FiscalPeriodAdmin(admin.ModelAdmin):
+    list_display = (
+        "fiscal_year",
+        "start_date",
+        "end_date",
+        "status",
+        "closed_by",
+        "closed_at",
+        "archived_at",
+    )
+    list_filter = ("status",)
+    readonly_fields = ("closed_at", "archived_at")
+    raw_id_fields = ("closing_document", "closed_by")
+    ordering = ("-fiscal_year",)
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ("key", "scope", "user", "status_code", "created_at")
+    search_fields = ("key", "scope")
+    readonly_fields = ("created_at",)
+    raw_id_fields = ("user",)
+    ordering = ("-created_at",)
+
+
 @admin.register(AccountingTransaction)
 class AccountingTransactionAdmin(admin.ModelAdmin):
     list_display = ("id", "date", "description", "created_at")
@@ -49,10 +147,27 @@ class AccountEntryAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
 
 
+@admin.register(AccountEntryArchive)
+class AccountEntryArchiveAdmin(admin.ModelAdmin):
+    list_display = ("id", "transaction", "account", "debit", "credit", "created_at")
+    list_filter = ("account__account_type",)
+    search_fields = ("account__name", "account__code", "description")
+    raw_id_fields = ("transaction", "account")
+    ordering = ("-created_at",)
+
+
 @admin.register(AccountingDocument)
 class AccountingDocumentAdmin(admin.ModelAdmin):
-    list_display = ("number", "doc_type", "date", "deal", "transaction", "created_at")
-    list_filter = ("doc_type", "date", "created_at")
+    list_display = (
+        "number",
+        "doc_type",
+        "date",
+        "office",
+        "deal",
+        "transaction",
+        "created_at",
+    )
+    list_filter = ("doc_type", "office", "date", "created_at")
     search_fields = ("number", "description")
     readonly_fields = ("created_at", "updated_at")
     raw_id_fields = ("transaction", "deal")
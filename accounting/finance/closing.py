@@ -0,0 +1,197 @@
+"""
+بستن سال مالی (سال شمسی) و بایگانی ثبت‌های دوره بسته‌شده.
+
+بستن سال: حساب‌های درآمد و هزینه با یک سند بستن حساب‌ها (تاریخ پایان سال) به حساب سود
+(زیان) انباشته بسته می‌شوند، عکس مانده پایان سال (مانده ابتدای سال بعد) ثبت می‌شود و
+دوره در برابر ثبت جدید قفل می‌شود. بایگانی (اختیاری) ثبت‌های سال بسته‌شده را به
+AccountEntryArchive منتقل می‌کند تا کوئری‌های دوره جاری فقط ردیف‌های دوره جاری را بخوانند.
+"""
+
+from datetime import date as date_type
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Account,
+    AccountEntry,
+    AccountEntryArchive,
+    AccountingDocument,
+    AccountingTransaction,
+    FiscalPeriod,
+)
+from .reports import invalidate_reports
+from .services import (
+    create_balance_snapshots,
+    get_next_doc_number,
+    post_ledger_entries,
+)
+from .utils import setup_chart_of_accounts
+
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def fiscal_year_dates(fiscal_year):
+    """تاریخ میلادی شروع و پایان سال مالی (۱ فروردین تا پایان اسفند)."""
+    from jdatetime import date as jdate
+
+    start = jdate(fiscal_year, 1, 1).togregorian()
+    end = jdate(fiscal_year + 1, 1, 1).togregorian() - timedelta(days=1)
+    return start, end
+
+
+def _closing_lines(start, end, retained_earnings):
+    """ردیف‌های سند بستن: صفر کردن مانده سال هر حساب درآمد/هزینه در برابر سود انباشته."""
+    lines = []
+    net = Decimal("0")
+    rows = (
+        AccountEntry.objects.filter(
+            date__gte=start,
+            date__lte=end,
+            account__account_type__in=(
+                Account.AccountType.INCOME,
+                Account.AccountType.EXPENSE,
+            ),
+        )
+        .order_by()
+        .values("account_id", "account__code")
+        .annotate(debit_total=Sum("debit"), credit_total=Sum("credit"))
+        .order_by("account__code")
+    )
+    accounts = Account.objects.in_bulk([r["account_id"] for r in rows])
+    for r in rows:
+        balance = (r["debit_total"] or Decimal("0")) - (
+            r["credit_total"] or Decimal("0")
+        )
+        if not balance:
+            continue
+        lines.append(
+            {
+                "account": accounts[r["account_id"]],
+                "debit": -balance if balance < 0 else Decimal("0"),
+                "credit": balance if balance > 0 else Decimal("0"),
+                "description": "بستن حساب در پایان سال مالی",
+            }
+        )
+        net += balance
+    if lines:
+        # net > 0 یعنی هزینه بیش از درآمد (زیان)
+        lines.append(
+            {
+                "account": retained_earnings,
+                "debit": net if net > 0 else Decimal("0"),
+                "credit": -net if net < 0 else Decimal("0"),
+                "description": "انتقال سود (زیان) سال به سود انباشته",
+            }
+        )
+    return lines
+
+
+def close_fiscal_year(fiscal_year, user=None):
+    """
+    بستن سال مالی: سند بستن حساب‌ها، عکس مانده پایان سال و قفل دوره، همه در یک تراکنش.
+    سال قبل (اگر ثبتی دارد) باید قبلاً بسته شده باشد. برمی‌گرداند FiscalPeriod.
+    """
+    start, end = fiscal_year_dates(fiscal_year)
+    if end >= date_type.today():
+        raise ValueError("سال مالی هنوز تمام نشده است.")
+
+    with db_transaction.atomic():
+        period, _ = FiscalPeriod.objects.get_or_create(
+            fiscal_year=fiscal_year, defaults={"start_date": start, "end_date": end}
+        )
+        period = FiscalPeriod.objects.select_for_update().get(pk=period.pk)
+        if period.status == FiscalPeriod.Status.CLOSED:
+            raise ValueError(f"سال مالی {fiscal_year} قبلاً بسته شده است.")
+        previous_open = (
+            AccountEntry.objects.filter(date__lt=start).exists()
+            and not FiscalPeriod.objects.filter(
+                fiscal_year=fiscal_year - 1, status=FiscalPeriod.Status.CLOSED
+            ).exists()
+        )
+        if previous_open:
+            raise ValueError(f"ابتدا سال مالی {fiscal_year - 1} را ببندید.")
+
+        lines = _closing_lines(
+            start, end, setup_chart_of_accounts()["retained_earnings"]
+        )
+        document = None
+        if lines:
+            trx = AccountingTransaction.objects.create(
+                description=f"بستن حساب‌های درآمد و هزینه سال مالی {fiscal_year}",
+                date=end,
+            )
+            post_ledger_entries(trx, lines)
+            document = AccountingDocument.objects.create(
+                doc_type=AccountingDocument.DocType.CLOSING,
+                number=get_next_doc_number(AccountingDocument.DocType.CLOSING, end),
+                date=end,
+                description=trx.description,
+                transaction=trx,
+            )
+
+        # مانده پایان سال = مانده ابتدای سال بعد
+        create_balance_snapshots(end)
+
+        period.status = FiscalPeriod.Status.CLOSED
+        period.closing_document = document
+        period.closed_by = user
+        period.closed_at = timezone.now()
+        period.save(
+            update_fields=["status", "closing_document", "closed_by", "closed_at"]
+        )
+    return period
+
+
+def archive_fiscal_year(fiscal_year, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    انتقال ثبت‌های یک سال مالی بسته‌شده به AccountEntryArchive در دسته‌های batch_size تایی
+    (هر دسته در یک تراکنش). مانده‌های تجمیعی تغییر نمی‌کنند چون ثبت‌ها فقط جابه‌جا می‌شوند؛
+    حذف بدون سیگنال انجام می‌شود. برمی‌گرداند تعداد ثبت‌های منتقل‌شده.
+    """
+    period = FiscalPeriod.objects.filter(fiscal_year=fiscal_year).first()
+    if period is None or period.status != FiscalPeriod.Status.CLOSED:
+        raise ValueError(f"سال مالی {fiscal_year} هنوز بسته نشده است.")
+    if AccountEntry.objects.filter(date__lt=period.start_date).exists():
+        raise ValueError("ابتدا ثبت‌های سال‌های مالی قبل را بایگانی کنید.")
+
+    entries = AccountEntry.objects.filter(
+        date__gte=period.start_date,
+        date__lte=period.end_date,
+    ).order_by("id")
+    moved = 0
+    while True:
+        with db_transaction.atomic():
+            batch = list(
+                entries.values(
+                    "id",
+                    "transaction_id",
+                    "account_id",
+                    "debit",
+                    "credit",
+                    "description",
+                    "date",
+                    "counterpart_entry_id",
+                    "created_at",
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            AccountEntryArchive.objects.bulk_create(
+                [AccountEntryArchive(**row) for row in batch]
+            )
+            ids = [row["id"] for row in batch]
+            # ارجاع دوطرفه است و طرف مقابل ممکن است در دسته بعد باشد
+            AccountEntry.objects.filter(
+                Q(id__in=ids) | Q(counterpart_entry_id__in=ids)
+            ).update(counterpart_entry=None)
+            AccountEntry.objects.filter(id__in=ids)._raw_delete(AccountEntry.objects.db)
+        moved += len(batch)
+
+    period.archived_at = timezone.now()
+    period.save(update_fields=["archived_at"])
+    invalidate_reports([period.end_date])
+    return moved
@@ -0,0 +1,115 @@
+"""
+اجرای یک‌باره درخواست‌های ثبت پرداخت/سند با کلید یکتایی (Idempotency-Key).
+کلاینت برای هر ثبت یک کلید تصادفی می‌فرستد و در ارسال مجدد همان کلید را تکرار می‌کند؛
+پاسخ موفق اولین درخواست ذخیره می‌شود و تکرارها فقط همان پاسخ را می‌گیرند.
+"""
+
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.db import transaction as db_transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_FIELD = "idempotency_key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+IDEMPOTENCY_KEY_TTL_DAYS = 7
+
+
+class _DiscardKey(Exception):
+    """پاسخ ناموفق: کلید ذخیره نمی‌شود تا کاربر بتواند پس از اصلاح فرم دوباره ارسال کند."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def get_idempotency_key(request):
+    """کلید یکتایی از هدر Idempotency-Key یا فیلد فرم idempotency_key."""
+    key = request.headers.get(IDEMPOTENCY_HEADER) or request.POST.get(
+        IDEMPOTENCY_FIELD, ""
+    )
+    return key.strip()
+
+
+def _replay(record, scope):
+    if record.scope != scope:
+        return JsonResponse(
+            {
+                "success": False,
+                "message": "این کلید یکتایی قبلاً برای درخواست دیگری استفاده شده است.",
+            },
+            status=422,
+        )
+    response = HttpResponse(
+        record.response_body,
+        status=record.status_code,
+        content_type=record.content_type or None,
+    )
+    if record.location:
+        response["Location"] = record.location
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def run_idempotent(request, scope, handler):
+    """
+    اجرای handler (تابع بدون آرگومان که HttpResponse برمی‌گرداند) حداکثر یک بار برای هر
+    (کاربر، کلید). بدون کلید، handler مستقیم اجرا می‌شود.
+    درج کلید و ثبت‌های handler در یک تراکنش انجام می‌شوند: درخواست هم‌زمان با همان کلید
+    روی ایندکس یکتا منتظر می‌ماند و پس از commit اولی پاسخ ذخیره‌شده را می‌گیرد. پاسخ‌های
+    خطا (غیر 2xx/3xx) ذخیره نمی‌شوند و همه ثبت‌های آن درخواست برگردانده می‌شوند.
+    """
+    key = get_idempotency_key(request)
+    if not key:
+        return handler()
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return JsonResponse(
+            {"success": False, "message": "کلید یکتایی درخواست نامعتبر است."},
+            status=400,
+        )
+
+    # مسیر سریع تکرار: فقط یک کوئری روی جدول کلیدها، بدون قفل دفتر
+    record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+    if record is not None:
+        return _replay(record, scope)
+
+    try:
+        with db_transaction.atomic():
+            try:
+                with db_transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user, key=key, scope=scope, status_code=0
+                    )
+            except IntegrityError:
+                return _replay(
+                    IdempotencyKey.objects.get(user=request.user, key=key), scope
+                )
+            response = handler()
+            if not 200 <= response.status_code < 400:
+                raise _DiscardKey(response)
+            record.status_code = response.status_code
+            record.response_body = response.content.decode(response.charset)
+            record.content_type = response.get("Content-Type", "")
+            record.location = response.get("Location", "")
+            record.save(
+                update_fields=[
+                    "status_code",
+                    "response_body",
+                    "content_type",
+                    "location",
+                ]
+            )
+    except _DiscardKey as discarded:
+        return discarded.response
+    return response
+
+
+def purge_idempotency_keys(days=IDEMPOTENCY_KEY_TTL_DAYS):
+    """حذف کلیدهای قدیمی‌تر از days روز؛ تعداد حذف‌شده را برمی‌گرداند."""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,220 @@
+import statistics
+import time
+from datetime import date as date_type
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.test.utils import CaptureQueriesContext
+from finance.closing import fiscal_year_dates
+from finance.models import (
+    Account,
+    AccountBalance,
+    AccountBalanceSnapshot,
+    AccountEntry,
+    AccountingTransaction,
+    FiscalPeriod,
+)
+from finance.partitioning import is_ledger_partitioned
+from finance.reports import _account_rows, _build_reports, invalidate_reports
+from finance.services import (
+    get_account_ledger_page,
+    jalali_fiscal_year,
+    parse_date_string,
+)
+from finance.utils import setup_chart_of_accounts
+
+SEED_BATCH_SIZE = 5000
+
+
+def seed_ledger(entry_count, years):
+    """
+    درج دفتر مصنوعی با entry_count ثبت (تراکنش‌های دوثبتی نقد و بانک / درآمد کمیسیون) که
+    تاریخ‌هایشان به‌طور یکنواخت در years سال مالی اخیر تا امروز پخش شده‌اند؛ با bulk_create
+    دسته‌ای و در پایان بازسازی مانده همان دو حساب. برمی‌گرداند تعداد ثبت‌های درج‌شده.
+    """
+    accounts = setup_chart_of_accounts()
+    debit_account = accounts["cash_bank"]
+    credit_account = accounts["revenue_commission"]
+    today = date_type.today()
+    start, _ = fiscal_year_dates(jalali_fiscal_year(today) - max(years, 1) + 1)
+    span = (today - start).days + 1
+    pairs = max(entry_count // 2, 1)
+    amount = Decimal("1000")
+    for offset in range(0, pairs, SEED_BATCH_SIZE):
+        size = min(SEED_BATCH_SIZE, pairs - offset)
+        with db_transaction.atomic():
+            trxs = AccountingTransaction.objects.bulk_create(
+                [
+                    AccountingTransaction(
+                        description="benchmark",
+                        date=start + timedelta(days=(offset + i) * span // pairs),
+                    )
+                    for i in range(size)
+                ]
+            )
+            AccountEntry.objects.bulk_create(
+                [
+                    AccountEntry(
+                        transaction=trx,
+                        account=account,
+                        date=trx.date,
+                        debit=amount if side == 0 else Decimal("0"),
+                        credit=amount if side == 1 else Decimal("0"),
+                    )
+                    for trx in trxs
+                    for side, account in enumerate((debit_account, credit_account))
+                ]
+            )
+    account_ids = [debit_account.id, credit_account.id]
+    with db_transaction.atomic():
+        totals = AccountBalance.ledger_totals(account_ids)
+        AccountBalance.objects.filter(account_id__in=account_ids).delete()
+        AccountBalance.objects.bulk_create(
+            [
+                AccountBalance(account_id=account_id, **row)
+                for account_id, row in totals.items()
+            ]
+        )
+    invalidate_reports([start, today])
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {AccountEntry._meta.db_table}")
+    return pairs * 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main ledger queries (account ledger page, balance as of a date, "
+        "financial reports, entries in range) against the current database. Run it "
+        "on a copy of production data before and after partition_ledger_entries and "
+        "compare the timings; --explain prints the query plan of the ledger page "
+        "(on PostgreSQL it shows which partitions were scanned). --seed N first "
+        "bulk-inserts a synthetic ledger of N entries (scratch databases only), and "
+        "--partition converts the table after the first run and times it again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--account",
+            help="Account code (default: the account with the most entries).",
+        )
+        parser.add_argument(
+            "--date-from", help="Range start (default: start of the fiscal year)."
+        )
+        parser.add_argument("--date-to", help="Range end (default: today).")
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per query (default 5)."
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Print EXPLAIN ANALYZE of the ledger page query.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            metavar="N",
+            help="Bulk-insert N synthetic ledger entries before timing "
+            "(refused if a fiscal year is closed or balance snapshots exist).",
+        )
+        parser.add_argument(
+            "--seed-years",
+            type=int,
+            default=3,
+            help="Fiscal years (up to the current one) the seeded entries span.",
+        )
+        parser.add_argument(
+            "--partition",
+            action="store_true",
+            help="PostgreSQL: after timing, run partition_ledger_entries and time "
+            "the same queries again.",
+        )
+
+    def handle(self, *args, **options):
+        if options["partition"]:
+            if connection.vendor != "postgresql":
+                raise CommandError("پارتیشن‌بندی فقط در PostgreSQL پشتیبانی می‌شود.")
+            if is_ledger_partitioned():
+                raise CommandError("جدول ثبت‌ها از قبل پارتیشن‌بندی شده است.")
+        if options["seed"] > 0:
+            if (
+                FiscalPeriod.objects.filter(status=FiscalPeriod.Status.CLOSED).exists()
+                or AccountBalanceSnapshot.objects.exists()
+            ):
+                raise CommandError(
+                    "دفتر مصنوعی فقط در دیتابیس آزمایشی بدون سال بسته و عکس مانده "
+                    "ساخته می‌شود."
+                )
+            started = time.perf_counter()
+            seeded = seed_ledger(options["seed"], options["seed_years"])
+            self.stdout.write(
+                f"seeded {seeded} entries in {time.perf_counter() - started:.1f} s"
+            )
+
+        if options["account"]:
+            account = Account.objects.filter(code=options["account"]).first()
+        else:
+            account = (
+                Account.objects.filter(balance_summary__isnull=False)
+                .order_by("-balance_summary__entry_count")
+                .first()
+            )
+        if account is None:
+            raise CommandError("حسابی برای سنجش یافت نشد.")
+        date_to = parse_date_string(options["date_to"]) or date_type.today()
+        date_from = parse_date_string(options["date_from"])
+        if date_from is None:
+            date_from, _ = fiscal_year_dates(jalali_fiscal_year(date_to))
+
+        self._time_queries(account, date_from, date_to, options)
+        if options["partition"]:
+            call_command("partition_ledger_entries", stdout=self.stdout)
+            self._time_queries(account, date_from, date_to, options)
+
+    def _time_queries(self, account, date_from, date_to, options):
+        queries = {
+            "ledger page": lambda: get_account_ledger_page(
+                account, date_from=date_from, date_to=date_to
+            ),
+            "balance as of": lambda: account.get_balance(as_of=date_to),
+            "financial reports": lambda: _build_reports(
+                _account_rows(None, date_from, date_to), date_from, date_to
+            ),
+            "entries in range": lambda: AccountEntry.objects.filter(
+                account=account, date__gte=date_from, date__lte=date_to
+            ).count(),
+        }
+        self.stdout.write(
+            f"account {account.code} ({account.name}), {date_from} .. {date_to}, "
+            f"partitioned: {is_ledger_partitioned()}, "
+            f"entries: {AccountEntry.objects.count()}"
+        )
+        repeat = max(options["repeat"], 1)
+        for label, run in queries.items():
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{label:<20} min {min(timings):9.1f} ms  "
+                f"median {statistics.median(timings):9.1f} ms  "
+                f"queries {len(captured)}"
+            )
+
+        if options["explain"]:
+            page_qs = AccountEntry.objects.filter(
+                account=account, date__gte=date_from, date__lte=date_to
+            ).order_by("date", "transaction_id", "id")[:51]
+            explain_options = (
+                {"analyze": True, "buffers": True}
+                if connection.vendor == "postgresql"
+                else {}
+            )
+            self.stdout.write(page_qs.explain(**explain_options))
@@ -0,0 +1,299 @@
+import re
+from datetime import date as date_type
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from finance.models import (
+    Account,
+    AccountEntry,
+    AccountingTransaction,
+    AccountPayment,
+    PendingDealPayment,
+)
+from transactions.models import Client, DealContract, Deals, TransactionType
+from users.models import Office
+
+SEED_OFFICES = 20
+SEED_BATCH_SIZE = 2000
+
+
+def _first_id(model):
+    return model.objects.order_by("pk").values_list("pk", flat=True).first() or 0
+
+
+def seed_rows(count):
+    """
+    درج count ردیف مصنوعی در هر جدول کوئری‌های پرتکرار (پخش‌شده بین چند بنگاه، معامله و
+    حساب) و به‌روزرسانی آمار planner؛ باید داخل تراکنشی صدا زده شود که rollback می‌شود.
+    برمی‌گرداند شناسه‌های نمونه (بنگاه، معامله و حساب پرداده) برای hot_queries.
+    """
+    offices = Office.objects.bulk_create(
+        [Office(name=f"plan-check-{i}", contact_phone="0") for i in range(SEED_OFFICES)]
+    )
+    deal_type, _ = TransactionType.objects.get_or_create(name="plan-check")
+    statuses = [value for value, _ in Deals.STATUS_CHOICES]
+    deals = Deals.objects.bulk_create(
+        [
+            Deals(
+                title=f"plan-check {i}",
+                type=deal_type,
+                office=offices[i % len(offices)],
+                status=statuses[i % len(statuses)],
+            )
+            for i in range(count)
+        ],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    clients = []
+    for i in range(count):
+        client = Client(
+            name=f"plan-check {i}",
+            national_id=f"{i:010d}",
+            phone=f"0912{i:07d}",
+            office=offices[i % len(offices)],
+        )
+        client.normalize_fields()
+        clients.append(client)
+    Client.objects.bulk_create(clients, batch_size=SEED_BATCH_SIZE)
+    accounts = list(Account.objects.order_by("pk")[:SEED_OFFICES]) or [
+        Account.objects.create(
+            code="PLANCHK", name="plan-check", account_type=Account.AccountType.ASSET
+        )
+    ]
+    today = date_type.today()
+    trxs = AccountingTransaction.objects.bulk_create(
+        [
+            AccountingTransaction(
+                description="plan-check", date=today - timedelta(days=i % 730)
+            )
+            for i in range(count)
+        ],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    amount = Decimal("1000")
+    AccountEntry.objects.bulk_create(
+        [
+            AccountEntry(
+                transaction=trx,
+                account=accounts[(i + side) % len(accounts)],
+                date=trx.date,
+                debit=amount if side == 0 else Decimal("0"),
+                credit=amount if side == 1 else Decimal("0"),
+            )
+            for i, trx in enumerate(trxs)
+            for side in (0, 1)
+        ],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    AccountPayment.objects.bulk_create(
+        [
+            AccountPayment(
+                deal=deals[i % len(deals)],
+                account=accounts[i % len(accounts)],
+                transaction=trx,
+                direction=AccountPayment.Direction.RECEIVE,
+                amount=amount,
+                date=trx.date,
+            )
+            for i, trx in enumerate(trxs)
+        ],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    PendingDealPayment.objects.bulk_create(
+        [
+            PendingDealPayment(
+                deal=deals[i % len(deals)],
+                account=accounts[i % len(accounts)],
+                direction=AccountPayment.Direction.RECEIVE,
+                amount=amount,
+                date=today,
+            )
+            for i in range(count)
+        ],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    DealContract.objects.bulk_create(
+        [DealContract(deal=deals[i % len(deals)], content="") for i in range(count)],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    with connection.cursor() as cursor:
+        for model in (
+            Deals,
+            Client,
+            AccountEntry,
+            AccountPayment,
+            PendingDealPayment,
+            DealContract,
+        ):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+    return {
+        "office_id": offices[0].id,
+        "deal_id": deals[0].id,
+        "account_id": accounts[0].id,
+    }
+
+
+def hot_queries(office_id=None, deal_id=None, account_id=None):
+    """
+    کوئری‌های پرتکرار لیست‌ها و گردش‌ها با شناسه‌های نمونه (پیش‌فرض اولین ردیف‌های
+    دیتابیس فعلی): برچسب -> (جدول، queryset، آیا ترتیب باید از ایندکس بیاید، ایندکس
+    مورد انتظار).
+    """
+    if office_id is None:
+        office_id = (
+            Deals.objects.order_by("pk").values_list("office_id", flat=True).first()
+            or 0
+        )
+    if deal_id is None:
+        deal_id = _first_id(Deals)
+    if account_id is None:
+        account_id = _first_id(Account)
+    year_start = date_type(date_type.today().year, 1, 1)
+    return {
+        "deals by office": (
+            Deals._meta.db_table,
+            Deals.objects.filter(office_id=office_id).order_by("-created_at", "-id")[
+                :20
+            ],
+            True,
+            "deals_office_created",
+        ),
+        "deals by office and status": (
+            Deals._meta.db_table,
+            Deals.objects.filter(office_id=office_id, status="approved").order_by(
+                "-created_at"
+            )[:20],
+            True,
+            "deals_office_status_created",
+        ),
+        "clients by office": (
+            Client._meta.db_table,
+            Client.objects.filter(office_id=office_id).order_by("-created_at")[:20],
+            True,
+            "client_office_created",
+        ),
+        "client by national id": (
+            Client._meta.db_table,
+            Client.objects.filter(
+                office_id=office_id, national_id_normalized="0000000000"
+            ),
+            False,
+            "client_office_national_id",
+        ),
+        "deal payments of account": (
+            AccountPayment._meta.db_table,
+            AccountPayment.objects.filter(deal_id=deal_id, account_id=account_id),
+            False,
+            "payment_deal_account",
+        ),
+        "account payments": (
+            AccountPayment._meta.db_table,
+            AccountPayment.objects.filter(account_id=account_id).order_by(
+                "-date", "-created_at"
+            )[:20],
+            True,
+            "payment_account_date",
+        ),
+        "pending payments of deal": (
+            PendingDealPayment._meta.db_table,
+            PendingDealPayment.objects.filter(deal_id=deal_id).order_by("-created_at"),
+            True,
+            "pending_payment_deal_created",
+        ),
+        "latest contract of deal": (
+            DealContract._meta.db_table,
+            DealContract.objects.filter(deal_id=deal_id).order_by("-created_at")[:1],
+            True,
+            "contract_deal_created",
+        ),
+        "account ledger page": (
+            AccountEntry._meta.db_table,
+            AccountEntry.objects.filter(
+                account_id=account_id, date__gte=year_start
+            ).order_by("date", "transaction_id", "id")[:51],
+            True,
+            "finance_entry_account_date",
+        ),
+    }
+
+
+def plan_problems(plan, table, ordered, index=None):
+    """
+    مشکلات plan یک کوئری روی table: اسکن کامل جدول، اگر ordered باشد مرتب‌سازی جدا
+    (یعنی ترتیب از ایندکس نیامده) و اگر index داده شود استفاده نکردن از آن ایندکس.
+    در PostgreSQL پارتیشن‌ها هم با نام جدول شروع می‌شوند.
+    """
+    problems = []
+    if index and not re.search(rf"\b{re.escape(index)}\b", plan):
+        problems.append(f"not using {index}")
+    for line in plan.splitlines():
+        line = line.strip().lstrip("->").strip()
+        if connection.vendor == "postgresql":
+            if line.startswith(f"Seq Scan on {table}"):
+                problems.append("seq scan")
+            elif ordered and line.startswith(("Sort ", "Incremental Sort ")):
+                problems.append("sort")
+        else:
+            # سطرهای sqlite با ستون‌های عددی id/parent شروع می‌شوند
+            if f"SCAN {table} " in f"{line} " and "INDEX" not in line:
+                problems.append("full scan")
+            elif ordered and "TEMP B-TREE" in line:
+                problems.append("sort")
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the hot office/deal/account queries (lists by recency, payments "
+        "of a deal, account ledger page) are served by index scans. Prints the plan "
+        "of each query and fails if any does a sequential scan or a separate sort. "
+        "On PostgreSQL sequential scans are disabled for the check, so the result "
+        "shows whether a usable index exists regardless of the table size. With "
+        "--seed N the tables first get N synthetic rows and fresh statistics inside "
+        "a transaction that is rolled back, and each query must also use the index "
+        "added for it (e.g. --seed 20000)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full plan of every query, not only the failing ones.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            metavar="N",
+            help="Insert N synthetic rows per table before checking (rolled back).",
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        with transaction.atomic():
+            sample = seed_rows(options["seed"]) if options["seed"] > 0 else {}
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for label, (table, queryset, ordered, index) in hot_queries(
+                **sample
+            ).items():
+                plan = queryset.explain()
+                # روی جدول‌های کوچک هزینه ایندکس‌ها برابر است؛ ایندکس مورد انتظار فقط
+                # با داده مصنوعی بررسی می‌شود
+                problems = plan_problems(plan, table, ordered, sample and index)
+                status = ", ".join(problems) if problems else "index"
+                self.stdout.write(f"{label:<28} {status}")
+                if problems or options["verbose_plans"]:
+                    self.stdout.write(plan)
+                if problems:
+                    failed.append(label)
+            # ردیف‌های مصنوعی و آمار آن‌ها نگه داشته نمی‌شوند
+            transaction.set_rollback(True)
+        if failed:
+            raise CommandError("کوئری‌های بدون ایندکس مناسب: " + "، ".join(failed))
+        self.stdout.write(
+            self.style.SUCCESS("✅ همه کوئری‌های پرتکرار از ایندکس استفاده می‌کنند.")
+        )
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from finance.closing import ARCHIVE_BATCH_SIZE, archive_fiscal_year, close_fiscal_year
+from finance.models import FiscalPeriod
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a Jalali fiscal year: post the closing entries of income/expense "
+        "accounts into retained earnings, snapshot year-end balances as the next "
+        "year's opening balances and lock the period against new postings. "
+        "With --archive, move the closed year's ledger entries into the archive table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fiscal_year", type=int, help="Jalali year, e.g. 1402.")
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Also move the year's entries into the archive table.",
+        )
+        parser.add_argument(
+            "--user", help="Username recorded as the one who closed the period."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help=f"Entries moved per DB transaction (default {ARCHIVE_BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        fiscal_year = options["fiscal_year"]
+        user = None
+        if options["user"]:
+            user = CustomUser.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"User not found: {options['user']}")
+        try:
+            if not FiscalPeriod.objects.filter(
+                fiscal_year=fiscal_year, status=FiscalPeriod.Status.CLOSED
+            ).exists():
+                period = close_fiscal_year(fiscal_year, user=user)
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✅ سال مالی {fiscal_year} بسته شد"
+                        + (
+                            f" (سند {period.closing_document.number})."
+                            if period.closing_document
+                            else "."
+                        )
+                    )
+                )
+            elif not options["archive"]:
+                raise CommandError(f"سال مالی {fiscal_year} قبلاً بسته شده است.")
+            if options["archive"]:
+                moved = archive_fiscal_year(
+                    fiscal_year, batch_size=max(options["batch_size"], 1)
+                )
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✅ {moved} ثبت سال مالی {fiscal_year} بایگانی شد."
+                    )
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
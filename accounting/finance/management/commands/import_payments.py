@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from finance.payment_import import (
+    PAYMENT_IMPORT_CHUNK_SIZE,
+    import_payments,
+    parse_payment_rows,
+)
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a batch of account payments/receipts (e.g. a bank statement) from a "
+        "CSV or JSON file. Columns: account (code), amount, direction "
+        "(receive/pay), date (Jalali or Gregorian), deal (optional id), method, "
+        "description. Rows are posted in chunks; invalid rows are reported and "
+        "skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the CSV or JSON file.")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "json"),
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--user", help="Username recorded as the creator of the payments."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=PAYMENT_IMPORT_CHUNK_SIZE,
+            help=f"Rows posted per DB transaction (default {PAYMENT_IMPORT_CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only validate rows and balances without posting.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.is_file():
+            raise CommandError(f"File not found: {path}")
+        fmt = options["format"] or ("json" if path.suffix.lower() == ".json" else "csv")
+        user = None
+        if options["user"]:
+            user = CustomUser.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"User not found: {options['user']}")
+        try:
+            rows = parse_payment_rows(path.read_bytes(), fmt)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        result = import_payments(
+            rows,
+            user=user,
+            chunk_size=max(options["chunk_size"], 1),
+            dry_run=options["dry_run"],
+        )
+        for error in result["errors"]:
+            self.stdout.write(
+                self.style.WARNING(f"ردیف {error['row']}: {error['message']}")
+            )
+        verb = "معتبر است" if options["dry_run"] else "ثبت شد"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {result['created']} از {result['total']} ردیف {verb}؛ "
+                f"{len(result['errors'])} ردیف خطا داشت."
+            )
+        )
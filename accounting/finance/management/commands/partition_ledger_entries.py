@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_transaction
+from finance.partitioning import (
+    enforce_entry_dates,
+    is_ledger_partitioned,
+    missing_partition_statements,
+    partition_statements,
+    sync_entry_dates,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "PostgreSQL only, opt-in: convert the ledger entries table into a table "
+        "range-partitioned by entry date, one partition per Jalali fiscal year plus "
+        "a default partition. The conversion copies every row under an exclusive "
+        "lock in a single transaction; take a backup and run it in a maintenance "
+        "window. On an already partitioned table, create the partitions of the "
+        "upcoming fiscal years instead (schedule this yearly). The entry date column "
+        "is added as nullable so migrate works on a populated table; roll it out in "
+        "this order: 1) migrate, 2) --sync-dates to copy transaction dates onto "
+        "existing entries (any database, can run while the app is up), 3) "
+        "--enforce-not-null to backfill rows written in between and make the "
+        "column NOT NULL (PostgreSQL), 4) optionally partition. The conversion "
+        "also backfills and enforces NOT NULL itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the SQL statements without executing them.",
+        )
+        parser.add_argument(
+            "--years-ahead",
+            type=int,
+            default=1,
+            help="Fiscal years after the current one to create partitions for.",
+        )
+
+        parser.add_argument(
+            "--sync-dates",
+            action="store_true",
+            help="Only backfill entry dates from their transactions (any database).",
+        )
+        parser.add_argument(
+            "--enforce-not-null",
+            action="store_true",
+            help="Backfill entry dates, then make the date column NOT NULL "
+            "(PostgreSQL).",
+        )
+
+    def handle(self, *args, **options):
+        if options["sync_dates"]:
+            updated = sync_entry_dates()
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ تاریخ {updated} ثبت دفتری به‌روز شد.")
+            )
+            return
+        if connection.vendor != "postgresql":
+            raise CommandError("پارتیشن‌بندی فقط در PostgreSQL پشتیبانی می‌شود.")
+        if options["enforce_not_null"]:
+            updated = enforce_entry_dates()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ تاریخ {updated} ثبت دفتری به‌روز و ستون تاریخ اجباری شد."
+                )
+            )
+            return
+        converting = not is_ledger_partitioned()
+        if converting:
+            statements = partition_statements()
+        else:
+            statements = missing_partition_statements(max(options["years_ahead"], 0))
+        if options["dry_run"]:
+            for sql in statements:
+                self.stdout.write(f"{sql};")
+            return
+        with db_transaction.atomic():
+            if converting:
+                sync_entry_dates()
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        if converting:
+            message = "✅ جدول ثبت‌های دفتری بر اساس تاریخ پارتیشن‌بندی شد."
+        else:
+            message = f"✅ {len(statements)} پارتیشن سال مالی جدید ساخته شد."
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from finance.idempotency import IDEMPOTENCY_KEY_TTL_DAYS, purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored idempotency keys (and their saved responses) older than "
+        "the given number of days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=IDEMPOTENCY_KEY_TTL_DAYS,
+            help=f"Keep keys newer than this many days (default {IDEMPOTENCY_KEY_TTL_DAYS}).",
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"✅ {deleted} کلید یکتایی قدیمی حذف شد."))
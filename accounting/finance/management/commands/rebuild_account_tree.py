@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from finance.models import AccountTreePath
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the account tree closure table (AccountTreePath) from Account.parent."
+    )
+
+    def handle(self, *args, **options):
+        count = AccountTreePath.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {count} مسیر درخت حساب‌ها بازسازی شد.")
+        )
@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from finance.models import Account, AccountBalance
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the AccountBalance table from AccountEntry rows. "
+        "Use --verify to only report drift without writing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Compare stored balances with the ledger and report drift only.",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            return self._verify()
+
+        with db_transaction.atomic():
+            # قفل جدول حساب‌ها تا در حین بازسازی ثبت جدیدی روی مانده‌ها اعمال نشود
+            list(Account.objects.select_for_update().values_list("id", flat=True))
+            expected = AccountBalance.ledger_totals()
+            AccountBalance.objects.all().delete()
+            AccountBalance.objects.bulk_create(
+                [
+                    AccountBalance(account_id=account_id, **totals)
+                    for account_id, totals in expected.items()
+                ],
+                batch_size=1000,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ مانده {len(expected)} حساب بازسازی شد.")
+        )
+
+    def _verify(self):
+        expected = AccountBalance.ledger_totals()
+        stored = {b.account_id: b for b in AccountBalance.objects.all()}
+        empty = {
+            "debit_total": Decimal("0"),
+            "credit_total": Decimal("0"),
+            "entry_count": 0,
+        }
+        drift = 0
+        for account_id in sorted(set(expected) | set(stored)):
+            exp = expected.get(account_id, empty)
+            cur = stored.get(account_id)
+            got = {
+                "debit_total": cur.debit_total if cur else Decimal("0"),
+                "credit_total": cur.credit_total if cur else Decimal("0"),
+                "entry_count": cur.entry_count if cur else 0,
+            }
+            diffs = [
+                f"{field}: stored={got[field]} expected={exp[field]}"
+                for field in ("debit_total", "credit_total", "entry_count")
+                if got[field] != exp[field]
+            ]
+            if diffs:
+                drift += 1
+                self.stdout.write(
+                    self.style.WARNING(f"account {account_id}: " + ", ".join(diffs))
+                )
+        if drift:
+            raise CommandError(
+                f"{drift} حساب با دفتر همخوانی ندارد. "
+                "برای اصلاح rebuild_balances را بدون --verify اجرا کنید."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ مانده {len(expected)} حساب با دفتر همخوان است.")
+        )
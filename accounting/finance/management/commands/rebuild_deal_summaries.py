@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from finance.models import DealFinance, DealLedgerSummary
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-deal, per-account ledger summary (DealLedgerSummary) "
+        "from commission entries and deal payments, in batches of deals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--deal",
+            dest="deal_ids",
+            type=int,
+            action="append",
+            help="Only rebuild this deal id (may be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        deal_ids = options["deal_ids"] or list(
+            DealFinance.objects.order_by("deal_id").values_list("deal_id", flat=True)
+        )
+        rows = 0
+        for start in range(0, len(deal_ids), BATCH_SIZE):
+            rows += DealLedgerSummary.rebuild(deal_ids[start : start + BATCH_SIZE])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ خلاصه دفتر {len(deal_ids)} معامله ({rows} ردیف) بازسازی شد."
+            )
+        )
@@ -0,0 +1,279 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from django.db.models.functions import Coalesce
+from finance.models import (
+    Account,
+    AccountBalance,
+    AccountBalanceSnapshot,
+    AccountEntry,
+    AccountEntryArchive,
+    AccountPayment,
+    DealLedgerSummary,
+    FiscalPeriod,
+    PendingDealPayment,
+)
+from finance.reports import invalidate_reports_on_commit
+from finance.utils import (
+    PERSON_ACCOUNT_KINDS,
+    ensure_accounts_for,
+    legacy_person_account_code,
+)
+from transactions.models import Client, CommissionSplit, DealClientCommission, Deals
+from users.models import Consultant, Office
+
+# از این id به بعد کد قدیمی (بریده‌شده به ۶ کاراکتر) با شخص دیگری مشترک می‌شد
+LEGACY_ID_LIMIT = 10000
+BATCH_SIZE = 500
+
+# نوع زیرحساب → (مدل صاحب حساب، آرگومان ensure_accounts_for)
+_KIND_OWNERS = {
+    "client_receivable": (Client, "clients"),
+    "client_payable": (Client, "client_payables"),
+    "consultant_payable": (Consultant, "consultants"),
+    "consultant_receivable": (Consultant, "consultants"),
+    "office_receivable": (Office, "offices"),
+    "office_payable": (Office, "offices"),
+    "manager_receivable": (Office, "office_managers"),
+    "manager_payable": (Office, "office_managers"),
+}
+
+
+def _deal_participants(model, deal_ids):
+    """{deal_id: مجموعه id صاحبان حساب از نوع model که در معامله حضور دارند}."""
+    participants = defaultdict(set)
+    if model is Client:
+        querysets = [
+            DealClientCommission.objects.filter(deal_id__in=deal_ids).values_list(
+                "deal_id", "client_id"
+            )
+        ]
+    elif model is Consultant:
+        querysets = [
+            CommissionSplit.objects.filter(
+                deal_id__in=deal_ids, consultant__isnull=False
+            ).values_list("deal_id", "consultant_id"),
+            Deals.consultants.through.objects.filter(deals_id__in=deal_ids).values_list(
+                "deals_id", "consultant_id"
+            ),
+        ]
+    else:
+        querysets = [
+            Deals.objects.filter(id__in=deal_ids, office__isnull=False).values_list(
+                "id", "office_id"
+            )
+        ]
+    for qs in querysets:
+        for deal_id, owner_id in qs:
+            participants[deal_id].add(owner_id)
+    return participants
+
+
+def _recompute_balances(account_ids):
+    """بازمحاسبه مانده تجمیعی چند حساب از روی ثبت‌ها و ثبت‌های بایگانی‌شده."""
+    totals = AccountBalance.ledger_totals(account_ids)
+    empty = {
+        "debit_total": Decimal("0"),
+        "credit_total": Decimal("0"),
+        "entry_count": 0,
+        "last_entry_id": None,
+    }
+    for account_id in account_ids:
+        AccountBalance.objects.update_or_create(
+            account_id=account_id, defaults=totals.get(account_id, empty)
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Find per-person accounts whose legacy 6-character code was shared by "
+        "several clients/consultants/offices (ids >= 10000) and move each owner's "
+        "entries to its own collision-free account. Entries of closed fiscal years "
+        "(including archived ones) are never moved; they are reported and stay on "
+        "the shared account."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report collisions and planned moves without writing.",
+        )
+
+    def handle(self, *args, **options):
+        stats = {"collisions": 0, "moved": 0, "ambiguous": 0, "locked": 0}
+        self.closed_until = FiscalPeriod.bounds()["closed_until"]
+        for kind, (model, ensure_arg) in _KIND_OWNERS.items():
+            groups = defaultdict(list)
+            for obj in (
+                model.objects.filter(id__gte=LEGACY_ID_LIMIT)
+                .only("id", "name")
+                .order_by("id")
+                .iterator(chunk_size=2000)
+            ):
+                groups[legacy_person_account_code(kind, obj.id)].append(obj)
+            codes = sorted(groups)
+            for start in range(0, len(codes), BATCH_SIZE):
+                batch = {
+                    code: groups[code] for code in codes[start : start + BATCH_SIZE]
+                }
+                self._repair_batch(
+                    kind, model, ensure_arg, batch, options["dry_run"], stats
+                )
+
+        verb = "شناسایی" if options["dry_run"] else "اصلاح"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {stats['collisions']} حساب مشترک {verb} شد؛ "
+                f"{stats['moved']} ثبت منتقل"
+                f"{' می‌شود' if options['dry_run'] else ' شد'}، "
+                f"{stats['ambiguous']} ثبت قابل تشخیص نبود و "
+                f"{stats['locked']} ثبت سال مالی بسته در حساب قبلی ماند."
+            )
+        )
+
+    def _repair_batch(self, kind, model, ensure_arg, groups, dry_run, stats):
+        legacy_accounts = {
+            acc.code: acc for acc in Account.objects.filter(code__in=list(groups))
+        }
+        if not legacy_accounts:
+            return
+        stats["collisions"] += len(legacy_accounts)
+
+        # ثبت‌های بایگانی‌شده هم خوانده می‌شوند تا به جای نادیده ماندن گزارش شوند
+        entries = []
+        for entry_model in (AccountEntry, AccountEntryArchive):
+            entries += (
+                entry_model.objects.filter(
+                    account_id__in=[acc.id for acc in legacy_accounts.values()]
+                )
+                .annotate(
+                    source_deal_id=Coalesce(
+                        "transaction__account_payment__deal",
+                        "transaction__deal_finance__deal",
+                        "transaction__accounting_document__deal",
+                    )
+                )
+                .values(
+                    "id",
+                    "account_id",
+                    "transaction_id",
+                    "source_deal_id",
+                    "debit",
+                    "credit",
+                    "date",
+                )
+            )
+        participants = _deal_participants(
+            model, {e["source_deal_id"] for e in entries if e["source_deal_id"]}
+        )
+        canonical_names = dict(
+            model.objects.filter(
+                id__in=[int(code[2:]) for code in legacy_accounts]
+            ).values_list("id", "name")
+        )
+
+        # ثبت‌هایی که فقط به یکی از صاحبان id بزرگ تعلق دارند: (حساب قدیمی، صاحب) → ثبت‌ها
+        moves = defaultdict(list)
+        owner_by_id = {}
+        entries_by_account = defaultdict(list)
+        for entry in entries:
+            entries_by_account[entry["account_id"]].append(entry)
+        for code, account in legacy_accounts.items():
+            owners = {obj.id: obj for obj in groups[code]}
+            owner_by_id.update(owners)
+            group_ids = set(owners) | {int(code[2:])}
+            for entry in entries_by_account[account.id]:
+                candidates = (
+                    participants.get(entry["source_deal_id"], set()) & group_ids
+                )
+                if len(candidates) == 1 and candidates <= set(owners):
+                    if self.closed_until is not None and (
+                        entry["date"] is None or entry["date"] <= self.closed_until
+                    ):
+                        # مانده و عکس مانده سال بسته نباید تغییر کند
+                        stats["locked"] += 1
+                        self.stdout.write(
+                            self.style.WARNING(
+                                f"{code}: entry {entry['id']} ({entry['date']}) is in "
+                                "a closed fiscal year and was not moved"
+                            )
+                        )
+                        continue
+                    moves[(account.id, candidates.pop())].append(entry)
+                elif candidates != {int(code[2:])}:
+                    stats["ambiguous"] += 1
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"{code}: entry {entry['id']} (deal "
+                            f"{entry['source_deal_id']}) could not be attributed"
+                        )
+                    )
+        stats["moved"] += sum(len(rows) for rows in moves.values())
+        if dry_run:
+            return
+
+        with db_transaction.atomic():
+            try:
+                # سالی که پس از خواندن ثبت‌ها بسته شده باشد
+                FiscalPeriod.check_open(
+                    [e["date"] for rows in moves.values() for e in rows]
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            new_accounts = ensure_accounts_for(
+                **{ensure_arg: [owner_by_id[owner_id] for _, owner_id in moves]}
+            )
+            snapshot_deltas = defaultdict(
+                lambda: defaultdict(lambda: [Decimal("0"), Decimal("0"), 0])
+            )
+            touched = set()
+            touched_deals = set()
+            for (old_id, owner_id), rows in moves.items():
+                new_id = new_accounts[(kind, owner_id)].id
+                touched.update((old_id, new_id))
+                AccountEntry.objects.filter(id__in=[e["id"] for e in rows]).update(
+                    account_id=new_id
+                )
+                trx_ids = {e["transaction_id"] for e in rows}
+                payments = AccountPayment.objects.filter(
+                    account_id=old_id, transaction_id__in=trx_ids
+                )
+                touched_deals.update(payments.values_list("deal_id", flat=True))
+                touched_deals.update(e["source_deal_id"] for e in rows)
+                payments.update(account_id=new_id)
+                PendingDealPayment.objects.filter(
+                    account_id=old_id,
+                    deal_id__in={e["source_deal_id"] for e in rows},
+                ).update(account_id=new_id)
+                for e in rows:
+                    for account_id, sign in ((old_id, -1), (new_id, 1)):
+                        delta = snapshot_deltas[e["date"]][account_id]
+                        delta[0] += sign * e["debit"]
+                        delta[1] += sign * e["credit"]
+                        delta[2] += sign
+
+            if touched:
+                _recompute_balances(touched)
+            # خلاصه دفتر معاملات به حساب جدید منتقل می‌شود (وگرنه مانده قابل تسویه ندارد)
+            touched_deals.discard(None)
+            if touched_deals:
+                DealLedgerSummary.rebuild(touched_deals)
+            for date, deltas in snapshot_deltas.items():
+                AccountBalanceSnapshot.apply_deltas(
+                    date, {k: tuple(v) for k, v in deltas.items()}
+                )
+            invalidate_reports_on_commit(snapshot_deltas)
+
+            # حساب کد قدیمی از این پس متعلق به صاحب id کوچک است
+            name_format = PERSON_ACCOUNT_KINDS[kind][2]
+            for code, account in legacy_accounts.items():
+                name = canonical_names.get(int(code[2:]))
+                if name is None:
+                    continue
+                expected = name_format.format(name=name)
+                if account.name != expected:
+                    account.name = expected
+                    account.save(update_fields=["name"])
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from finance.services import deal_revenue_shortfalls, repair_deal_revenue_shortfalls
+
+
+class Command(BaseCommand):
+    help = (
+        "Find commission transactions (DealFinance.income_transaction) whose client "
+        "receivable debits exceed the commission revenue credit, using one grouped "
+        "query, and post the missing revenue credit in batches. Transactions dated "
+        "in a closed fiscal year are reported but not changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the imbalanced transactions without writing.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of transactions fixed per database transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            count = 0
+            for row in deal_revenue_shortfalls().iterator():
+                count += 1
+                self.stdout.write(
+                    f"deal {row['transaction__deal_finance__deal_id']} "
+                    f"(transaction {row['transaction_id']}): "
+                    f"missing {row['client_debit'] - row['revenue_credit']}"
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ {count} سند کمیسیون نیاز به اصلاح دارد.")
+            )
+            return
+
+        fixed = 0
+        batch_size = max(1, options["batch_size"])
+        while True:
+            # ردیف‌های اصلاح‌شده از نتیجه کوئری حذف می‌شوند؛ هر دور دسته بعدی را می‌خواند
+            batch = list(deal_revenue_shortfalls(open_only=True)[:batch_size])
+            if not batch:
+                break
+            fixed += repair_deal_revenue_shortfalls(batch)
+        skipped = deal_revenue_shortfalls().count()
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{skipped} سند کمیسیون در سال‌های مالی بسته‌شده اصلاح نشد."
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ درآمد کمیسیون {fixed} سند معامله اصلاح شد.")
+        )
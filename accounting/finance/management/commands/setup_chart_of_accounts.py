@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from finance.utils import bootstrap_chart_of_accounts, invalidate_chart_of_accounts
+
+
+class Command(BaseCommand):
+    help = "Create the base chart of accounts and reset the cached registry."
+
+    def handle(self, *args, **options):
+        accounts = bootstrap_chart_of_accounts()
+        invalidate_chart_of_accounts()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {len(accounts)} حساب پایه آماده است.")
+        )
@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from finance.services import create_balance_snapshots, parse_date_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a balance period: store cumulative debit/credit snapshots of every "
+        "account up to --date (Jalali or Gregorian, defaults to yesterday). "
+        "Intended to run from a scheduler, e.g. at the end of each month."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            dest="period_end",
+            help="Period end date, e.g. 1403/06/31 or 2024-09-21.",
+        )
+
+    def handle(self, *args, **options):
+        if options["period_end"]:
+            period_end = parse_date_string(options["period_end"])
+            if period_end is None:
+                raise CommandError("تاریخ پایان دوره نامعتبر است.")
+        else:
+            period_end = datetime.date.today() - datetime.timedelta(days=1)
+        try:
+            count = create_balance_snapshots(period_end)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ عکس مانده {count} حساب تا {period_end} ثبت شد.")
+        )
@@ -1,10 +1,24 @@
 import os
 import uuid
+from datetime import date as date_type
 from decimal import Decimal
 
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Q, Sum
+from django.db import IntegrityError, models
+from django.db import transaction as db_transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
 
@@ -30,6 +44,141 @@ def pending_payment_receipt_upload_to(instance, filename):
     )
 
 
+class AccountQuerySet(models.QuerySet):
+    def with_balances(self, as_of=None):
+        """
+        افزودن ستون‌های debit_total، credit_total و balance به هر حساب در یک کوئری.
+        بدون as_of از جدول مانده‌های تجمیعی (AccountBalance) خوانده می‌شود؛
+        با as_of نزدیک‌ترین عکس مانده به‌علاوه جمع ثبت‌های بعد از آن تا as_of (و ثبت‌های
+        بایگانی‌شده همان بازه) با یک کوئری گروه‌بندی‌شده محاسبه می‌شود.
+        """
+        amount_field = models.DecimalField(max_digits=18, decimal_places=2)
+        zero = Value(Decimal("0"), output_field=amount_field)
+        if as_of is None:
+            qs = self.annotate(
+                debit_total=Coalesce(
+                    F("balance_summary__debit_total"), zero, output_field=amount_field
+                ),
+                credit_total=Coalesce(
+                    F("balance_summary__credit_total"), zero, output_field=amount_field
+                ),
+            )
+        else:
+            # نزدیک‌ترین عکس مانده تا as_of؛ فقط ثبت‌های بعد از آن جمع زده می‌شوند
+            snapshot = AccountBalanceSnapshot.objects.filter(
+                account=OuterRef("pk"), period_end__lte=as_of
+            ).order_by("-period_end")
+            qs = self.annotate(
+                snapshot_end=Subquery(snapshot.values("period_end")[:1]),
+                snapshot_debit=Coalesce(
+                    Subquery(snapshot.values("debit_total")[:1]),
+                    zero,
+                    output_field=amount_field,
+                ),
+                snapshot_credit=Coalesce(
+                    Subquery(snapshot.values("credit_total")[:1]),
+                    zero,
+                    output_field=amount_field,
+                ),
+            )
+            in_range = Q(entries__date__lte=as_of) & (
+                Q(snapshot_end__isnull=True) | Q(entries__date__gt=F("snapshot_end"))
+            )
+
+            def _archived_sum(field):
+                # as_of وسط سال بایگانی‌شده: ثبت‌های آن سال فقط در بایگانی هستند
+                totals = (
+                    AccountEntryArchive.objects.filter(
+                        account=OuterRef("pk"),
+                        date__lte=as_of,
+                        date__gt=Coalesce(
+                            OuterRef("snapshot_end"),
+                            Value(date_type.min),
+                            output_field=models.DateField(),
+                        ),
+                    )
+                    .order_by()
+                    .values("account")
+                    .annotate(total=Sum(field))
+                    .values("total")
+                )
+                return Coalesce(Subquery(totals), zero, output_field=amount_field)
+
+            qs = qs.annotate(
+                debit_total=F("snapshot_debit")
+                + Coalesce(
+                    Sum("entries__debit", filter=in_range),
+                    zero,
+                    output_field=amount_field,
+                )
+                + _archived_sum("debit"),
+                credit_total=F("snapshot_credit")
+                + Coalesce(
+                    Sum("entries__credit", filter=in_range),
+                    zero,
+                    output_field=amount_field,
+                )
+                + _archived_sum("credit"),
+            )
+        return qs.annotate(balance=_signed_balance("debit_total", "credit_total"))
+
+    def with_subtree_balances(self):
+        """
+        افزودن مانده تجمیعی زیردرخت هر حساب (خود حساب و همه زیرحساب‌ها) با استفاده از
+        جدول بستار درخت حساب‌ها؛ برای هر ردیف یک زیرکوئری گروه‌بندی‌شده روی ایندکس.
+        """
+        amount_field = models.DecimalField(max_digits=18, decimal_places=2)
+        zero = Value(Decimal("0"), output_field=amount_field)
+
+        def _subtree_sum(field):
+            totals = (
+                AccountBalance.objects.filter(
+                    account__ancestor_links__ancestor=OuterRef("pk")
+                )
+                .order_by()
+                .values("account__ancestor_links__ancestor")
+                .annotate(total=Sum(field))
+                .values("total")
+            )
+            return Coalesce(Subquery(totals), zero, output_field=amount_field)
+
+        return self.annotate(
+            subtree_debit_total=_subtree_sum("debit_total"),
+            subtree_credit_total=_subtree_sum("credit_total"),
+        ).annotate(
+            subtree_balance=_signed_balance(
+                "subtree_debit_total", "subtree_credit_total"
+            )
+        )
+
+
+def _signed_balance(debit_field, credit_field):
+    """عبارت SQL مانده با توجه به ماهیت حساب (دارایی/هزینه: بدهکار - بستانکار)."""
+    return Case(
+        When(
+            account_type__in=(
+                Account.AccountType.ASSET,
+                Account.AccountType.EXPENSE,
+            ),
+            then=F(debit_field) - F(credit_field),
+        ),
+        default=F(credit_field) - F(debit_field),
+        output_field=models.DecimalField(max_digits=18, decimal_places=2),
+    )
+
+
+def _per_account_case(deltas, position, output_field):
+    """CASE account_id WHEN ... برای اعمال مقدار متفاوت به هر حساب در یک UPDATE."""
+    return Case(
+        *[
+            When(account_id=account_id, then=Value(values[position]))
+            for account_id, values in deltas.items()
+        ],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
 class Account(models.Model):
 
     class AccountType(models.TextChoices):
@@ -85,6 +234,8 @@ class Account(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AccountQuerySet.as_manager()
+
     class Meta:
         verbose_name = "حساب"
         verbose_name_plural = "حساب‌ها"
@@ -93,15 +244,58 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
-    def get_balance(self):
-        """محاسبه مانده حساب: بدهکار - بستانکار"""
-        debit_total = self.entries.aggregate(total=Sum("debit", filter=Q(debit__gt=0)))[
-            "total"
-        ] or Decimal("0")
-        credit_total = self.entries.aggregate(
-            total=Sum("credit", filter=Q(credit__gt=0))
-        )["total"] or Decimal("0")
+    def save(self, *args, **kwargs):
+        """ذخیره حساب و همگام‌سازی جدول بستار درخت در صورت ایجاد یا تغییر والد"""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "parent" not in update_fields:
+            super().save(*args, **kwargs)
+            return
+        with db_transaction.atomic():
+            adding = self._state.adding
+            previous_parent_id = None
+            if not adding:
+                previous_parent_id = (
+                    Account.objects.filter(pk=self.pk)
+                    .values_list("parent_id", flat=True)
+                    .first()
+                )
+                if (
+                    self.parent_id
+                    and AccountTreePath.objects.filter(
+                        ancestor_id=self.pk, descendant_id=self.parent_id
+                    ).exists()
+                ):
+                    raise ValueError("حساب والد نمی‌تواند زیرحساب همین حساب باشد.")
+            super().save(*args, **kwargs)
+            if adding:
+                AccountTreePath.link_new_account(self)
+            elif previous_parent_id != self.parent_id:
+                AccountTreePath.move_subtree(self)
+
+    def get_balance(self, as_of=None):
+        """محاسبه مانده حساب: بدهکار - بستانکار (از جدول مانده‌های تجمیعی یا عکس مانده تا as_of)"""
+        if as_of is not None:
+            return (
+                Account.objects.filter(pk=self.pk)
+                .with_balances(as_of=as_of)
+                .values_list("balance", flat=True)
+                .get()
+            )
+        try:
+            summary = self.balance_summary
+        except AccountBalance.DoesNotExist:
+            # حساب‌هایی که هنوز ردیف مانده ندارند (پیش از اجرای rebuild_balances)؛
+            # ثبت‌های بایگانی‌شده سال‌های بسته هم جزو مانده هستند
+            totals = AccountBalance.ledger_totals([self.pk]).get(self.pk)
+            if totals is None:
+                return self.balance_from_totals(Decimal("0"), Decimal("0"))
+            return self.balance_from_totals(
+                totals["debit_total"], totals["credit_total"]
+            )
+        return self.balance_from_totals(summary.debit_total, summary.credit_total)
 
+    def balance_from_totals(self, debit_total, credit_total):
+        """مانده حساب بر اساس جمع بدهکار و بستانکار با توجه به ماهیت حساب."""
         # برای حساب‌های دارایی و هزینه: بدهکار - بستانکار
         # برای حساب‌های بدهی و درآمد: بستانکار - بدهکار
         if self.account_type in (
@@ -113,6 +307,345 @@ class Account(models.Model):
             return credit_total - debit_total
 
 
+class AccountBalance(models.Model):
+    """
+    مانده تجمیعی هر حساب (جمع بدهکار/بستانکار و تعداد ثبت‌ها).
+    در همان تراکنش پایگاه داده‌ای که AccountEntry ایجاد/ویرایش/حذف می‌شود به‌روزرسانی می‌شود
+    تا محاسبه مانده نیازی به SUM روی کل ثبت‌های دفتری نداشته باشد.
+    """
+
+    account = models.OneToOneField(
+        Account,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="balance_summary",
+        verbose_name="حساب",
+    )
+    debit_total = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal("0"),
+        verbose_name="جمع بدهکار",
+    )
+    credit_total = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal("0"),
+        verbose_name="جمع بستانکار",
+    )
+    entry_count = models.PositiveIntegerField(default=0, verbose_name="تعداد ثبت‌ها")
+    last_entry_id = models.BigIntegerField(
+        null=True, blank=True, verbose_name="شناسه آخرین ثبت"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "مانده حساب"
+        verbose_name_plural = "مانده حساب‌ها"
+
+    def __str__(self):
+        return f"{self.account_id} - بدهکار: {self.debit_total}, بستانکار: {self.credit_total}"
+
+    @classmethod
+    def ledger_totals(cls, account_ids=None):
+        """
+        جمع بدهکار/بستانکار، تعداد و آخرین شناسه ثبت هر حساب (همه حساب‌ها یا account_ids)
+        با یک کوئری گروه‌بندی‌شده روی ثبت‌ها و یکی روی ثبت‌های بایگانی‌شده سال‌های بسته‌شده.
+        """
+        totals = {}
+        for model in (AccountEntry, AccountEntryArchive):
+            rows = model.objects.order_by()
+            if account_ids is not None:
+                rows = rows.filter(account_id__in=list(account_ids))
+            rows = rows.values("account_id").annotate(
+                debit_total=Sum("debit"),
+                credit_total=Sum("credit"),
+                entry_count=Count("id"),
+                last_entry_id=Max("id"),
+            )
+            for r in rows:
+                current = totals.setdefault(
+                    r["account_id"],
+                    {
+                        "debit_total": Decimal("0"),
+                        "credit_total": Decimal("0"),
+                        "entry_count": 0,
+                        "last_entry_id": None,
+                    },
+                )
+                current["debit_total"] += r["debit_total"] or Decimal("0")
+                current["credit_total"] += r["credit_total"] or Decimal("0")
+                current["entry_count"] += r["entry_count"]
+                current["last_entry_id"] = max(
+                    current["last_entry_id"] or 0, r["last_entry_id"] or 0
+                )
+        return totals
+
+    @classmethod
+    def ensure_rows(cls, account_ids):
+        """
+        ساخت ردیف مانده حساب‌هایی که هنوز ردیف ندارند از جمع ثبت‌های موجودشان (مثلاً
+        حساب‌های دیتابیسی که پیش از جدول مانده ثبت داشته‌اند). باید پیش از نوشتن ثبت‌ها
+        صدا زده شود تا ردیف ساخته‌شده وضعیت قبل از تغییر باشد و delta بعدی روی آن اعمال شود.
+        """
+        account_ids = {account_id for account_id in account_ids if account_id}
+        missing = account_ids - set(
+            cls.objects.filter(account_id__in=account_ids).values_list(
+                "account_id", flat=True
+            )
+        )
+        if not missing:
+            return
+        totals = cls.ledger_totals(missing)
+        cls.objects.bulk_create(
+            [
+                cls(account_id=account_id, **totals.get(account_id, {}))
+                for account_id in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def apply_delta(cls, account_id, debit, credit, count, last_entry_id=None):
+        """
+        اعمال تغییر روی مانده تجمیعی یک حساب با UPDATE اتمیک (F expression).
+        اگر ردیف مانده وجود نداشته باشد ایجاد می‌شود.
+        """
+        updates = {
+            "debit_total": F("debit_total") + debit,
+            "credit_total": F("credit_total") + credit,
+            "entry_count": F("entry_count") + count,
+            "updated_at": timezone.now(),
+        }
+        if last_entry_id is not None:
+            updates["last_entry_id"] = Greatest(
+                Coalesce(F("last_entry_id"), Value(0)), Value(last_entry_id)
+            )
+        with db_transaction.atomic():
+            if cls.objects.filter(account_id=account_id).update(**updates):
+                return
+            try:
+                with db_transaction.atomic():
+                    cls.objects.create(
+                        account_id=account_id,
+                        debit_total=debit,
+                        credit_total=credit,
+                        entry_count=max(count, 0),
+                        last_entry_id=last_entry_id,
+                    )
+            except IntegrityError:
+                # ردیف هم‌زمان توسط درخواست دیگری ساخته شده است
+                cls.objects.filter(account_id=account_id).update(**updates)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        نسخه دسته‌ای apply_delta برای چند حساب با تعداد ثابت کوئری.
+        deltas: دیکت {account_id: (debit, credit, count, last_entry_id)}.
+        """
+        if not deltas:
+            return
+        amount_field = models.DecimalField(max_digits=18, decimal_places=2)
+        with db_transaction.atomic():
+            cls.objects.bulk_create(
+                [cls(account_id=account_id) for account_id in deltas],
+                ignore_conflicts=True,
+            )
+            cls.objects.filter(account_id__in=list(deltas)).update(
+                debit_total=F("debit_total")
+                + _per_account_case(deltas, 0, amount_field),
+                credit_total=F("credit_total")
+                + _per_account_case(deltas, 1, amount_field),
+                entry_count=F("entry_count")
+                + _per_account_case(deltas, 2, models.IntegerField()),
+                last_entry_id=Greatest(
+                    Coalesce(F("last_entry_id"), Value(0)),
+                    _per_account_case(deltas, 3, models.BigIntegerField()),
+                ),
+                updated_at=timezone.now(),
+            )
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    عکس لحظه‌ای مانده تجمعی حساب در پایان یک دوره (بسته شدن دوره).
+    مانده در هر تاریخ = نزدیک‌ترین عکس قبل از آن + جمع ثبت‌های بعد از عکس.
+    """
+
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name="balance_snapshots",
+        verbose_name="حساب",
+    )
+    period_end = models.DateField(verbose_name="پایان دوره")
+    debit_total = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal("0"),
+        verbose_name="جمع بدهکار تا پایان دوره",
+    )
+    credit_total = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal("0"),
+        verbose_name="جمع بستانکار تا پایان دوره",
+    )
+    entry_count = models.PositiveIntegerField(default=0, verbose_name="تعداد ثبت‌ها")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "عکس مانده حساب"
+        verbose_name_plural = "عکس‌های مانده حساب‌ها"
+        ordering = ("account", "-period_end")
+        unique_together = [["account", "period_end"]]
+
+    def __str__(self):
+        return f"{self.account_id} تا {self.period_end}"
+
+    @classmethod
+    def apply_delta(cls, account_id, date, debit, credit, count):
+        """
+        ثبتی با تاریخ قبل از عکس‌های موجود (سند با تاریخ گذشته یا حذف ثبت قدیمی)
+        روی همه عکس‌های بعد از آن تاریخ اعمال می‌شود تا عکس‌ها معتبر بمانند.
+        """
+        if date is None:
+            return
+        cls.objects.filter(account_id=account_id, period_end__gte=date).update(
+            debit_total=F("debit_total") + debit,
+            credit_total=F("credit_total") + credit,
+            entry_count=F("entry_count") + count,
+        )
+
+    @classmethod
+    def apply_deltas(cls, date, deltas):
+        """نسخه دسته‌ای apply_delta برای ثبت‌های هم‌تاریخ چند حساب در یک UPDATE."""
+        if date is None or not deltas:
+            return
+        amount_field = models.DecimalField(max_digits=18, decimal_places=2)
+        cls.objects.filter(account_id__in=list(deltas), period_end__gte=date).update(
+            debit_total=F("debit_total") + _per_account_case(deltas, 0, amount_field),
+            credit_total=F("credit_total") + _per_account_case(deltas, 1, amount_field),
+            entry_count=F("entry_count")
+            + _per_account_case(deltas, 2, models.IntegerField()),
+        )
+
+
+class AccountTreePath(models.Model):
+    """
+    جدول بستار (closure table) درخت حساب‌ها: برای هر حساب یک ردیف به ازای خودش و هر جد آن.
+    با این جدول مانده تجمیعی همه گره‌ها با یک کوئری گروه‌بندی‌شده بدون پیمایش بازگشتی محاسبه می‌شود.
+    """
+
+    ancestor = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name="descendant_links",
+        verbose_name="حساب جد",
+    )
+    descendant = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name="ancestor_links",
+        verbose_name="حساب نواده",
+    )
+    depth = models.PositiveSmallIntegerField(default=0, verbose_name="فاصله")
+
+    class Meta:
+        verbose_name = "مسیر درخت حساب"
+        verbose_name_plural = "مسیرهای درخت حساب‌ها"
+        unique_together = [["ancestor", "descendant"]]
+
+    def __str__(self):
+        return f"{self.ancestor_id} → {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def link_new_account(cls, account):
+        """ثبت مسیرهای یک حساب تازه ایجادشده: خودش و همه اجداد والدش."""
+        cls.link_new_accounts([account])
+
+    @classmethod
+    def link_new_accounts(cls, accounts):
+        """
+        ثبت دسته‌ای مسیرهای چند حساب تازه (مثلاً پس از bulk_create که save را صدا نمی‌زند).
+        والدها باید از قبل در جدول بستار باشند؛ اجداد همه والدها با یک کوئری خوانده می‌شوند.
+        """
+        parent_ids = {acc.parent_id for acc in accounts if acc.parent_id}
+        ancestors = {}
+        if parent_ids:
+            for ancestor_id, descendant_id, depth in cls.objects.filter(
+                descendant_id__in=parent_ids
+            ).values_list("ancestor_id", "descendant_id", "depth"):
+                ancestors.setdefault(descendant_id, []).append((ancestor_id, depth))
+        links = []
+        for acc in accounts:
+            links.append(cls(ancestor_id=acc.pk, descendant_id=acc.pk, depth=0))
+            links.extend(
+                cls(ancestor_id=ancestor_id, descendant_id=acc.pk, depth=depth + 1)
+                for ancestor_id, depth in ancestors.get(acc.parent_id, ())
+            )
+        cls.objects.bulk_create(links, ignore_conflicts=True)
+
+    @classmethod
+    def detach_subtree(cls, account_id):
+        """حذف پیوند زیردرخت یک حساب از اجداد فعلی آن (مسیرهای داخلی زیردرخت حفظ می‌شوند)."""
+        subtree_ids = cls.objects.filter(ancestor_id=account_id).values("descendant_id")
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(
+            ancestor_id__in=subtree_ids
+        ).delete()
+
+    @classmethod
+    def move_subtree(cls, account):
+        """انتقال زیردرخت حساب به والد جدید (reparent)."""
+        cls.detach_subtree(account.pk)
+        cls.objects.get_or_create(
+            ancestor_id=account.pk, descendant_id=account.pk, defaults={"depth": 0}
+        )
+        if not account.parent_id:
+            return
+        new_ancestors = list(
+            cls.objects.filter(descendant_id=account.parent_id).values_list(
+                "ancestor_id", "depth"
+            )
+        )
+        subtree = list(
+            cls.objects.filter(ancestor_id=account.pk).values_list(
+                "descendant_id", "depth"
+            )
+        )
+        cls.objects.bulk_create(
+            [
+                cls(
+                    ancestor_id=ancestor_id,
+                    descendant_id=descendant_id,
+                    depth=up + down + 1,
+                )
+                for ancestor_id, up in new_ancestors
+                for descendant_id, down in subtree
+            ],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def rebuild(cls):
+        """بازسازی کامل جدول بستار از روی فیلد parent همه حساب‌ها."""
+        parents = dict(Account.objects.values_list("id", "parent_id"))
+        links = []
+        for account_id in parents:
+            current, depth, seen = account_id, 0, set()
+            while current is not None and current not in seen:
+                seen.add(current)
+                links.append(
+                    cls(ancestor_id=current, descendant_id=account_id, depth=depth)
+                )
+                current = parents.get(current)
+                depth += 1
+        with db_transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(links, batch_size=2000)
+        return len(links)
+
+
 class AccountingTransaction(models.Model):
     """
     تراکنش حسابداری: گروهی از ثبت‌های دفتری که باید همیشه متعادل باشند
@@ -131,6 +664,50 @@ class AccountingTransaction(models.Model):
     def __str__(self):
         return f"تراکنش #{self.id} - {self.date}"
 
+    def save(self, *args, **kwargs):
+        """
+        ذخیره و هم‌گام کردن تاریخ ثبت‌های دفتری (کلید پارتیشن) با تاریخ تراکنش.
+        تغییر تاریخ تراکنشی که ثبت دارد مثل حذف ثبت‌ها در تاریخ قبلی و ثبت دوباره در تاریخ
+        جدید است: هر دو تاریخ باید در دوره باز باشند، عکس‌های مانده بین دو تاریخ اصلاح و
+        کش گزارش‌های هر دو تاریخ باطل می‌شود.
+        """
+        update_fields = kwargs.get("update_fields")
+        old_date = None
+        if self.pk is not None and (update_fields is None or "date" in update_fields):
+            old_date = (
+                AccountingTransaction.objects.filter(pk=self.pk)
+                .values_list("date", flat=True)
+                .first()
+            )
+        if old_date is None or old_date == self.date:
+            super().save(*args, **kwargs)
+            return
+
+        deltas = {
+            row["account_id"]: (row["debit"], row["credit"], row["count"])
+            for row in self.entries.order_by()
+            .values("account_id")
+            .annotate(debit=Sum("debit"), credit=Sum("credit"), count=Count("id"))
+        }
+        if deltas:
+            FiscalPeriod.check_open([old_date, self.date])
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+            if not deltas:
+                return
+            self.entries.update(date=self.date)
+            AccountBalanceSnapshot.apply_deltas(
+                old_date,
+                {
+                    account_id: (-debit, -credit, -count)
+                    for account_id, (debit, credit, count) in deltas.items()
+                },
+            )
+            AccountBalanceSnapshot.apply_deltas(self.date, deltas)
+            from .reports import invalidate_reports_on_commit
+
+            invalidate_reports_on_commit([old_date, self.date])
+
     def is_balanced(self):
         """بررسی تعادل تراکنش: مجموع بدهکار = مجموع بستانکار"""
         totals = self.entries.aggregate(
@@ -165,6 +742,7 @@ class AccountEntry(models.Model):
         on_delete=models.PROTECT,
         related_name="entries",
         verbose_name="حساب",
+        db_index=False,  # پیشوند ایندکس finance_entry_account_date
     )
     debit = models.DecimalField(
         max_digits=15,
@@ -183,6 +761,15 @@ class AccountEntry(models.Model):
         help_text="مبلغ بستانکار (برای حساب‌های بدهی و درآمد)",
     )
     description = models.TextField(blank=True, default="", verbose_name="شرح")
+    # null فقط برای افزودن ستون به جدول موجود است: پس از migrate با
+    # partition_ledger_entries --sync-dates پر و با --enforce-not-null اجباری می‌شود
+    date = models.DateField(
+        null=True,
+        editable=False,
+        db_index=True,
+        verbose_name="تاریخ",
+        help_text="کپی تاریخ تراکنش؛ کلید پارتیشن جدول و فیلتر بازه در کوئری‌های دفتر",
+    )
     counterpart_entry = models.ForeignKey(
         "self",
         on_delete=models.SET_NULL,
@@ -198,14 +785,73 @@ class AccountEntry(models.Model):
         verbose_name = "ثبت دفتری"
         verbose_name_plural = "ثبت‌های دفتری"
         ordering = ("transaction", "id")
+        indexes = [
+            # گردش حساب: فیلتر حساب و بازه تاریخ و ترتیب (date, transaction, id) بدون sort
+            models.Index(
+                fields=["account", "date", "transaction", "id"],
+                name="finance_entry_account_date",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.account.name} - بدهکار: {self.debit}, بستانکار: {self.credit}"
 
     def save(self, *args, **kwargs):
-        """ذخیره با اعتبارسنجی"""
+        """
+        ذخیره با اعتبارسنجی و به‌روزرسانی مانده تجمیعی حساب در همان تراکنش.
+        تغییر حساب یا مبلغ ثبتی که (پیش یا پس از تغییر) در دوره بسته است پذیرفته نمی‌شود.
+        """
+        if self.transaction_id is not None:
+            self.date = self.transaction.date
         self.full_clean()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not (
+            set(update_fields) & {"account", "debit", "credit"}
+        ):
+            super().save(*args, **kwargs)
+            return
+        with db_transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    AccountEntry.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values("account_id", "debit", "credit", "date")
+                    .first()
+                )
+            FiscalPeriod.check_open([self.date, previous and previous["date"]])
+            AccountBalance.ensure_rows(
+                [self.account_id, previous and previous["account_id"]]
+            )
+            super().save(*args, **kwargs)
+            if previous is not None:
+                AccountBalance.apply_delta(
+                    previous["account_id"],
+                    -previous["debit"],
+                    -previous["credit"],
+                    -1,
+                )
+                AccountBalanceSnapshot.apply_delta(
+                    previous["account_id"],
+                    previous["date"],
+                    -previous["debit"],
+                    -previous["credit"],
+                    -1,
+                )
+            AccountBalance.apply_delta(
+                self.account_id,
+                self.debit or Decimal("0"),
+                self.credit or Decimal("0"),
+                1,
+                last_entry_id=self.pk,
+            )
+            AccountBalanceSnapshot.apply_delta(
+                self.account_id,
+                self.date,
+                self.debit or Decimal("0"),
+                self.credit or Decimal("0"),
+                1,
+            )
 
     def clean(self):
         """اعتبارسنجی: هر ثبت باید یا بدهکار یا بستانکار داشته باشد، نه هر دو"""
@@ -219,6 +865,125 @@ class AccountEntry(models.Model):
             raise ValidationError("یک ثبت باید حداقل یک بدهکار یا بستانکار داشته باشد.")
 
 
+class AccountEntryArchive(models.Model):
+    """
+    بایگانی ثبت‌های دفتری سال‌های مالی بسته‌شده (همان ستون‌ها و همان شناسه ثبت).
+    ثبت‌های بایگانی‌شده از AccountEntry حذف می‌شوند تا کوئری‌های دوره جاری فقط ردیف‌های
+    دوره جاری را بخوانند؛ مانده ابتدای دوره از عکس مانده پایان سال بسته‌شده خوانده می‌شود.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    transaction = models.ForeignKey(
+        AccountingTransaction,
+        on_delete=models.CASCADE,
+        related_name="archived_entries",
+        verbose_name="تراکنش",
+    )
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.PROTECT,
+        related_name="archived_entries",
+        verbose_name="حساب",
+    )
+    debit = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0"), verbose_name="بدهکار"
+    )
+    credit = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0"), verbose_name="بستانکار"
+    )
+    description = models.TextField(blank=True, default="", verbose_name="شرح")
+    date = models.DateField(db_index=True, verbose_name="تاریخ")
+    counterpart_entry_id = models.BigIntegerField(
+        null=True, blank=True, verbose_name="شناسه ثبت طرف مقابل"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "ثبت دفتری بایگانی‌شده"
+        verbose_name_plural = "ثبت‌های دفتری بایگانی‌شده"
+        ordering = ("transaction", "id")
+
+    def __str__(self):
+        return f"{self.account_id} - بدهکار: {self.debit}, بستانکار: {self.credit}"
+
+
+class FiscalPeriod(models.Model):
+    """
+    سال مالی (سال شمسی). پس از بستن، ثبت جدید با تاریخ داخل دوره پذیرفته نمی‌شود و
+    مانده پایان سال (عکس مانده) مانده ابتدای سال بعد است؛ ثبت‌های دوره بسته‌شده را
+    می‌توان به AccountEntryArchive منتقل کرد.
+    """
+
+    class Status(models.TextChoices):
+        OPEN = "open", "باز"
+        CLOSED = "closed", "بسته"
+
+    fiscal_year = models.PositiveSmallIntegerField(unique=True, verbose_name="سال مالی")
+    start_date = models.DateField(verbose_name="تاریخ شروع")
+    end_date = models.DateField(verbose_name="تاریخ پایان")
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.OPEN,
+        verbose_name="وضعیت",
+    )
+    closing_document = models.OneToOneField(
+        "AccountingDocument",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="closed_fiscal_period",
+        verbose_name="سند بستن حساب‌ها",
+    )
+    closed_by = models.ForeignKey(
+        "users.CustomUser",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="closed_fiscal_periods",
+        verbose_name="بسته‌شده توسط",
+    )
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="تاریخ بستن")
+    archived_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="تاریخ بایگانی ثبت‌ها"
+    )
+
+    class Meta:
+        verbose_name = "سال مالی"
+        verbose_name_plural = "سال‌های مالی"
+        ordering = ("-fiscal_year",)
+
+    def __str__(self):
+        return f"سال مالی {self.fiscal_year} ({self.get_status_display()})"
+
+    @classmethod
+    def bounds(cls):
+        """
+        {"closed_until", "archived_until"}: پایان آخرین سال بسته‌شده و آخرین سال
+        بایگانی‌شده (یا None). هر بار از دیتابیس خوانده می‌شود (یک کوئری روی جدول کوچک
+        سال‌ها به ازای هر دسته ثبت) تا قفل دوره بسته در همه پروسه‌ها فوراً اعمال شود.
+        """
+        closed = Q(status=cls.Status.CLOSED)
+        return cls.objects.aggregate(
+            closed_until=Max("end_date", filter=closed),
+            archived_until=Max(
+                "end_date", filter=closed & Q(archived_at__isnull=False)
+            ),
+        )
+
+    @classmethod
+    def check_open(cls, dates):
+        """ValueError اگر یکی از تاریخ‌ها در سال مالی بسته‌شده باشد."""
+        closed_until = cls.bounds()["closed_until"]
+        if closed_until is not None and any(d and d <= closed_until for d in dates):
+            from jdatetime import date as jdate
+
+            shamsi = jdate.fromgregorian(date=closed_until).strftime("%Y/%m/%d")
+            raise ValueError(
+                f"دوره مالی تا تاریخ {shamsi} بسته شده است و ثبت جدید در آن مجاز نیست."
+            )
+
+
 class DealFinance(models.Model):
     """
     پل ارتباطی بین معامله املاک و تراکنش حسابداری.
@@ -260,6 +1025,7 @@ class AccountingDocument(models.Model):
         PAYMENT = "payment", "سند پرداخت"
         COMMISSION = "commission", "سند کمیسیون معامله"
         TRANSFER = "transfer", "سند انتقال"
+        CLOSING = "closing", "سند بستن حساب‌ها"
         OTHER = "other", "سند متفرقه"
 
     doc_type = models.CharField(
@@ -293,6 +1059,14 @@ class AccountingDocument(models.Model):
         related_name="accounting_documents",
         verbose_name="معامله",
     )
+    office = models.ForeignKey(
+        "users.Office",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="accounting_documents",
+        verbose_name="بنگاه",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -300,12 +1074,88 @@ class AccountingDocument(models.Model):
         verbose_name = "سند حسابداری"
         verbose_name_plural = "اسناد حسابداری"
         ordering = ("-date", "-created_at")
+        # شماره از شمارنده (نوع سند، بنگاه، سال مالی) می‌آید؛ پس فقط داخل هر بنگاه یکتاست
+        constraints = [
+            models.UniqueConstraint(
+                fields=["office", "number"],
+                condition=Q(office__isnull=False) & ~Q(number=""),
+                name="uniq_accounting_document_office_number",
+            ),
+            models.UniqueConstraint(
+                fields=["number"],
+                condition=Q(office__isnull=True) & ~Q(number=""),
+                name="uniq_accounting_document_no_office_number",
+            ),
+        ]
 
     def __str__(self):
         num = self.number or f"#{self.id}"
         return f"{self.get_doc_type_display()} {num} ({self.date})"
 
 
+class DocumentSequence(models.Model):
+    """
+    شمارنده شماره اسناد به ازای (نوع سند، بنگاه، سال مالی شمسی).
+    شماره بعدی با قفل ردیف شمارنده در همان تراکنش ساخت سند گرفته می‌شود؛ پس شماره‌ها
+    بدون تکرار زیر درخواست‌های هم‌زمان و بدون فاصله (با rollback سند، شماره هم برمی‌گردد) هستند.
+    """
+
+    doc_type = models.CharField(
+        max_length=20,
+        choices=AccountingDocument.DocType.choices,
+        verbose_name="نوع سند",
+    )
+    office = models.ForeignKey(
+        "users.Office",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="document_sequences",
+        verbose_name="بنگاه",
+    )
+    fiscal_year = models.PositiveSmallIntegerField(verbose_name="سال مالی")
+    last_number = models.PositiveIntegerField(default=0, verbose_name="آخرین شماره")
+
+    class Meta:
+        verbose_name = "شمارنده اسناد"
+        verbose_name_plural = "شمارنده‌های اسناد"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["doc_type", "office", "fiscal_year"],
+                condition=Q(office__isnull=False),
+                name="uniq_document_sequence_office",
+            ),
+            models.UniqueConstraint(
+                fields=["doc_type", "fiscal_year"],
+                condition=Q(office__isnull=True),
+                name="uniq_document_sequence_no_office",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.doc_type} {self.fiscal_year} — {self.last_number}"
+
+    @classmethod
+    def next_number(cls, doc_type, office, fiscal_year):
+        """
+        گرفتن شماره بعدی با قفل ردیف شمارنده (select_for_update)؛ قفل تا پایان تراکنش
+        بیرونی (که سند در آن ساخته می‌شود) نگه داشته می‌شود، پس باید داخل atomic صدا زده شود.
+        """
+        lookup = {"doc_type": doc_type, "office": office, "fiscal_year": fiscal_year}
+        with db_transaction.atomic():
+            seq = cls.objects.select_for_update().filter(**lookup).first()
+            if seq is None:
+                try:
+                    with db_transaction.atomic():
+                        seq = cls.objects.create(**lookup)
+                except IntegrityError:
+                    # شمارنده هم‌زمان توسط درخواست دیگری ساخته شد
+                    seq = cls.objects.select_for_update().get(**lookup)
+            seq.last_number += 1
+            seq.save(update_fields=["last_number"])
+        return seq.last_number
+
+
 class AccountPayment(models.Model):
     """
     ثبت واریز/برداشت برای یک حساب خاص در قالب یک تراکنش حسابداری جداگانه.
@@ -331,12 +1181,14 @@ class AccountPayment(models.Model):
         blank=True,
         related_name="account_payments",
         verbose_name="معامله",
+        db_index=False,  # پیشوند ایندکس payment_deal_account
     )
     account = models.ForeignKey(
         Account,
         on_delete=models.PROTECT,
         related_name="payments",
         verbose_name="حساب طرف مقابل",
+        db_index=False,  # پیشوند ایندکس payment_account_date
     )
     transaction = models.OneToOneField(
         AccountingTransaction,
@@ -384,11 +1236,216 @@ class AccountPayment(models.Model):
         verbose_name = "پرداخت/دریافت حساب"
         verbose_name_plural = "پرداخت‌ها و دریافت‌های حساب‌ها"
         ordering = ("-date", "-created_at")
+        indexes = [
+            models.Index(fields=["deal", "account"], name="payment_deal_account"),
+            models.Index(
+                fields=["account", "date", "created_at"], name="payment_account_date"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_direction_display()} {self.amount} برای حساب {self.account}"
 
 
+class DealLedgerSummary(models.Model):
+    """
+    خلاصه دفتر معامله به ازای هر حساب: مبلغ اولیه در سند کمیسیون و مجموع تسویه‌ها.
+    با ثبت سند کمیسیون و هر پرداخت/دریافت معامله به‌صورت افزایشی به‌روز می‌شود تا صفحه
+    حساب‌های معامله به‌جای بازسازی کل دفتر فقط همین جدول کوچک را بخواند.
+    """
+
+    deal = models.ForeignKey(
+        "transactions.Deals",
+        on_delete=models.CASCADE,
+        related_name="ledger_summaries",
+        verbose_name="معامله",
+    )
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name="deal_ledger_summaries",
+        verbose_name="حساب",
+    )
+    debit = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="بدهکار سند کمیسیون"
+    )
+    credit = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="بستانکار سند کمیسیون"
+    )
+    settled_receive = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="جمع دریافت‌ها"
+    )
+    settled_pay = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="جمع پرداخت‌ها"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "خلاصه دفتر معامله"
+        verbose_name_plural = "خلاصه‌های دفتر معاملات"
+        unique_together = [["deal", "account"]]
+
+    def __str__(self):
+        return f"معامله #{self.deal_id} - {self.account_id}"
+
+    @property
+    def settled_amount(self):
+        """برای حساب بدهکار (طلب بنگاه) دریافت‌ها و برای حساب بستانکار پرداخت‌ها."""
+        return self.settled_receive if self.debit > 0 else self.settled_pay
+
+    @property
+    def remaining_amount(self):
+        original = self.debit if self.debit > 0 else self.credit
+        return max(Decimal("0"), original - self.settled_amount)
+
+    @classmethod
+    def add_entries(cls, deal_id, entries):
+        """افزودن ثبت‌های سند کمیسیون معامله به مبلغ اولیه حساب‌ها (تعداد ثابت کوئری)."""
+        cls.add_entries_bulk({deal_id: entries})
+
+    @classmethod
+    def add_entries_bulk(cls, entries_by_deal):
+        """
+        نسخه چندمعامله‌ای add_entries: entries_by_deal دیکت {deal_id: ثبت‌ها}؛ یک درج
+        دسته‌ای ردیف‌های نبوده و یک UPDATE برای همه (معامله، حساب)ها.
+        """
+        deltas = {}
+        for deal_id, entries in entries_by_deal.items():
+            for entry in entries:
+                key = (deal_id, entry.account_id)
+                debit, credit = deltas.get(key, (Decimal("0"), Decimal("0")))
+                deltas[key] = (debit + entry.debit, credit + entry.credit)
+        if not deltas:
+            return
+        amount_field = models.DecimalField(max_digits=18, decimal_places=2)
+
+        def per_pair(position):
+            return Case(
+                *[
+                    When(
+                        deal_id=deal_id,
+                        account_id=account_id,
+                        then=Value(values[position]),
+                    )
+                    for (deal_id, account_id), values in deltas.items()
+                ],
+                default=Value(0),
+                output_field=amount_field,
+            )
+
+        with db_transaction.atomic():
+            cls.objects.bulk_create(
+                [
+                    cls(deal_id=deal_id, account_id=account_id)
+                    for deal_id, account_id in deltas
+                ],
+                ignore_conflicts=True,
+            )
+            cls.objects.filter(
+                deal_id__in={deal_id for deal_id, _ in deltas},
+                account_id__in={account_id for _, account_id in deltas},
+            ).update(
+                debit=F("debit") + per_pair(0),
+                credit=F("credit") + per_pair(1),
+                updated_at=timezone.now(),
+            )
+
+    @classmethod
+    def remove_entry(cls, deal_id, entry):
+        """کسر یک ثبت حذف‌شده سند کمیسیون از مبلغ اولیه حساب در معامله."""
+        cls.objects.filter(deal_id=deal_id, account_id=entry.account_id).update(
+            debit=F("debit") - entry.debit,
+            credit=F("credit") - entry.credit,
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def apply_payment(cls, deal_id, account_id, direction, amount):
+        """
+        افزودن (یا با مبلغ منفی کسر) یک پرداخت/دریافت به تسویه‌های حساب در معامله.
+        فقط حساب‌هایی که در سند کمیسیون معامله هستند ردیف خلاصه دارند.
+        """
+        if not deal_id:
+            return
+        field = (
+            "settled_receive"
+            if direction == AccountPayment.Direction.RECEIVE
+            else "settled_pay"
+        )
+        cls.objects.filter(deal_id=deal_id, account_id=account_id).update(
+            **{field: F(field) + amount, "updated_at": timezone.now()}
+        )
+
+    @classmethod
+    def compute(cls, deal_ids):
+        """
+        محاسبه (بدون ذخیره) ردیف‌های خلاصه چند معامله با یک کوئری گروه‌بندی‌شده:
+        به ازای هر (معامله، حساب) جمع بدهکار/بستانکار سند کمیسیون و جمع شرطی
+        پرداخت‌ها بر اساس نوع (زیرکوئری همبسته). همه مبالغ Decimal هستند.
+        """
+        amount_field = models.DecimalField(max_digits=18, decimal_places=2)
+
+        def settled(direction):
+            paid = (
+                AccountPayment.objects.filter(
+                    deal_id=OuterRef("transaction__deal_finance__deal_id"),
+                    account_id=OuterRef("account_id"),
+                    direction=direction,
+                )
+                .order_by()
+                .values("account_id")
+                .annotate(total=Sum("amount"))
+                .values("total")[:1]
+            )
+            return Coalesce(
+                Subquery(paid, output_field=amount_field),
+                Value(Decimal("0")),
+                output_field=amount_field,
+            )
+
+        deal_ids = list(deal_ids)
+        summaries = {}
+        # ثبت‌های سال‌های بایگانی‌شده هم در خلاصه معامله حساب می‌شوند
+        for model in (AccountEntry, AccountEntryArchive):
+            rows = (
+                model.objects.filter(transaction__deal_finance__deal_id__in=deal_ids)
+                .order_by()
+                .values("transaction__deal_finance__deal_id", "account_id")
+                .annotate(
+                    debit_total=Sum("debit"),
+                    credit_total=Sum("credit"),
+                    receive_total=settled(AccountPayment.Direction.RECEIVE),
+                    pay_total=settled(AccountPayment.Direction.PAY),
+                )
+            )
+            for r in rows:
+                key = (r["transaction__deal_finance__deal_id"], r["account_id"])
+                summary = summaries.get(key)
+                if summary is None:
+                    summaries[key] = cls(
+                        deal_id=key[0],
+                        account_id=key[1],
+                        debit=r["debit_total"] or Decimal("0"),
+                        credit=r["credit_total"] or Decimal("0"),
+                        settled_receive=r["receive_total"],
+                        settled_pay=r["pay_total"],
+                    )
+                else:
+                    summary.debit += r["debit_total"] or Decimal("0")
+                    summary.credit += r["credit_total"] or Decimal("0")
+        return list(summaries.values())
+
+    @classmethod
+    def rebuild(cls, deal_ids):
+        """بازسازی و ذخیره خلاصه چند معامله؛ تعداد ردیف‌ها را برمی‌گرداند."""
+        deal_ids = list(deal_ids)
+        rows = cls.compute(deal_ids)
+        with db_transaction.atomic():
+            cls.objects.filter(deal_id__in=deal_ids).delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
 class PendingDealPayment(models.Model):
     """
     تراکنش پیشنهادی توسط مشاور برای حساب‌های مشتری؛ پس از تایید اپراتور/مدیر به دفتر اعمال می‌شود.
@@ -404,6 +1461,7 @@ class PendingDealPayment(models.Model):
         on_delete=models.CASCADE,
         related_name="pending_payments",
         verbose_name="معامله",
+        db_index=False,  # پیشوند ایندکس pending_payment_deal_created
     )
     account = models.ForeignKey(
         Account,
@@ -476,6 +1534,43 @@ class PendingDealPayment(models.Model):
         verbose_name = "تراکنش در انتظار تایید"
         verbose_name_plural = "تراکنش‌های در انتظار تایید"
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["deal", "created_at"], name="pending_payment_deal_created"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_direction_display()} {self.amount} — {self.get_status_display()}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    کلید یکتایی درخواست ثبت پرداخت/سند که کلاینت در هدر Idempotency-Key یا فیلد
+    idempotency_key می‌فرستد. پاسخ موفق اولین درخواست همراه کلید ذخیره می‌شود و
+    تکرار همان درخواست (مثلاً ارسال مجدد در اینترنت ضعیف موبایل) همان پاسخ را بدون
+    قفل دفتر و بدون ثبت تکراری برمی‌گرداند.
+    """
+
+    user = models.ForeignKey(
+        "users.CustomUser",
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+        verbose_name="کاربر",
+    )
+    key = models.CharField(max_length=64, verbose_name="کلید")
+    # مسیر/نوع درخواست؛ استفاده مجدد از کلید برای درخواست دیگر رد می‌شود
+    scope = models.CharField(max_length=100, verbose_name="نوع درخواست")
+    status_code = models.PositiveSmallIntegerField(verbose_name="کد پاسخ")
+    response_body = models.TextField(blank=True, default="", verbose_name="بدنه پاسخ")
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    location = models.CharField(max_length=500, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "کلید یکتایی درخواست"
+        verbose_name_plural = "کلیدهای یکتایی درخواست"
+        unique_together = [["user", "key"]]
+
+    def __str__(self):
+        return f"{self.scope} — {self.key}"
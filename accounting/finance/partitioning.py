@@ -0,0 +1,168 @@
+"""
+پارتیشن‌بندی بازه‌ای (PostgreSQL) جدول ثبت‌های دفتری بر اساس تاریخ، به ازای هر سال مالی.
+
+کلید پارتیشن ستون AccountEntry.date (کپی تاریخ تراکنش) است و کوئری‌های گردش حساب، عکس
+مانده و گزارش‌ها روی همین ستون فیلتر می‌شوند تا planner فقط پارتیشن‌های بازه را بخواند.
+تبدیل اختیاری است و با دستور partition_ledger_entries انجام می‌شود؛ بدون آن جدول معمولی
+با همان ستون و ایندکس‌ها کار می‌کند.
+
+محدودیت‌ها: کلید اصلی جدول پارتیشن‌شده (id, date) است، پس کلید خارجی دیتابیسی
+counterpart_entry (ارجاع به همین جدول) حذف می‌شود و فقط در سطح ORM باقی می‌ماند.
+AccountingTransaction پارتیشن نمی‌شود چون چند جدول به آن کلید خارجی دارند.
+"""
+
+from datetime import date as date_type
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .closing import fiscal_year_dates
+from .models import AccountEntry, AccountingTransaction
+from .services import jalali_fiscal_year
+
+TABLE = AccountEntry._meta.db_table
+SEQUENCE = f"{TABLE}_id_seq"
+OLD_TABLE = f"{TABLE}_unpartitioned"
+DEFAULT_PARTITION = f"{TABLE}_default"
+NOT_NULL_SQL = f"ALTER TABLE {TABLE} ALTER COLUMN date SET NOT NULL"
+
+
+def partition_name(fiscal_year):
+    return f"{TABLE}_{fiscal_year}"
+
+
+def sync_entry_dates():
+    """
+    کپی تاریخ تراکنش روی ثبت‌هایی که تاریخشان خالی یا متفاوت است (یک بار پس از افزودن
+    ستون date به جدول موجود). برمی‌گرداند تعداد ثبت‌های به‌روزشده.
+    """
+    return AccountEntry.objects.filter(
+        Q(date__isnull=True) | ~Q(date=F("transaction__date"))
+    ).update(
+        date=Subquery(
+            AccountingTransaction.objects.filter(pk=OuterRef("transaction_id")).values(
+                "date"
+            )[:1]
+        )
+    )
+
+
+def enforce_entry_dates():
+    """
+    پر کردن تاریخ‌های خالی و سپس NOT NULL کردن ستون date (فقط PostgreSQL)؛ ستون nullable
+    اضافه می‌شود تا migrate روی جدول پر شکست نخورد. برمی‌گرداند تعداد ثبت‌های به‌روزشده.
+    """
+    with transaction.atomic():
+        updated = sync_entry_dates()
+        with connection.cursor() as cursor:
+            cursor.execute(NOT_NULL_SQL)
+    return updated
+
+
+def is_ledger_partitioned():
+    """آیا جدول ثبت‌ها در PostgreSQL پارتیشن‌شده است."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions():
+    """سال‌های مالی که پارتیشن دارند."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f"{TABLE}_"
+    return {
+        int(name[len(prefix) :])
+        for name in names
+        if name.startswith(prefix) and name[len(prefix) :].isdigit()
+    }
+
+
+def _partition_sql(fiscal_year):
+    start, _ = fiscal_year_dates(fiscal_year)
+    # کران بالای بازه در PostgreSQL انحصاری است: ۱ فروردین سال بعد
+    upper, _ = fiscal_year_dates(fiscal_year + 1)
+    return (
+        f"CREATE TABLE {partition_name(fiscal_year)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+    )
+
+
+def _entry_year_range():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(date) FROM {TABLE}")
+        first_date = cursor.fetchone()[0]
+    current = jalali_fiscal_year(date_type.today())
+    first = jalali_fiscal_year(first_date) if first_date else current
+    return min(first, current), current + 1
+
+
+def partition_statements():
+    """
+    دستورهای SQL تبدیل جدول ثبت‌ها به جدول پارتیشن‌شده (در یک تراکنش اجرا می‌شوند):
+    NOT NULL کردن ستون date (تاریخ‌ها پیش از آن پر می‌شوند)، تغییر نام جدول فعلی، ساخت جدول پارتیشن‌شده با همان ستون‌ها، یک پارتیشن برای هر سال مالی
+    از اولین ثبت تا سال بعد به‌علاوه پارتیشن پیش‌فرض، کپی ردیف‌ها، حذف جدول قدیم و ساخت
+    دوباره sequence، کلید اصلی (id, date)، کلیدهای خارجی و ایندکس‌ها با نام‌های جنگو.
+    """
+    first_year, last_year = _entry_year_range()
+    statements = [
+        f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE",
+        NOT_NULL_SQL,
+        f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}",
+        f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE}) " "PARTITION BY RANGE (date)",
+    ]
+    statements += [_partition_sql(year) for year in range(first_year, last_year + 1)]
+    statements += [
+        f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT",
+        f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}",
+        f"DROP TABLE {OLD_TABLE}",
+        f"CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id",
+        f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')",
+        f"SELECT setval('{SEQUENCE}', COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, "
+        "false)",
+        f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, date)",
+    ]
+    with connection.schema_editor(collect_sql=True) as editor:
+        for field in AccountEntry._meta.local_fields:
+            if field.remote_field and field.db_constraint:
+                if field.remote_field.model is not AccountEntry:
+                    statements.append(
+                        str(
+                            editor._create_fk_sql(
+                                AccountEntry, field, "_fk_%(to_table)s_%(to_column)s"
+                            )
+                        )
+                    )
+            if field.db_index and not field.unique:
+                statements.append(
+                    str(editor._create_index_sql(AccountEntry, fields=[field]))
+                )
+        for index in AccountEntry._meta.indexes:
+            statements.append(str(index.create_sql(AccountEntry, editor)))
+    statements.append(f"ANALYZE {TABLE}")
+    return statements
+
+
+def missing_partition_statements(years_ahead=1):
+    """
+    دستورهای ساخت پارتیشن سال‌های مالی آینده (تا years_ahead سال بعد از سال جاری) که هنوز
+    ساخته نشده‌اند؛ باید پیش از رسیدن سال اجرا شود تا ثبت‌ها در پارتیشن پیش‌فرض نروند.
+    """
+    existing = existing_partitions()
+    current = jalali_fiscal_year(date_type.today())
+    return [
+        _partition_sql(year)
+        for year in range(current, current + years_ahead + 1)
+        if year not in existing
+    ]
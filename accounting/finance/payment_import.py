@@ -0,0 +1,201 @@
+"""
+ورود دسته‌ای پرداخت/دریافت‌ها (مثلاً صورت‌حساب ماهانه بانک) از فایل CSV یا JSON.
+همه ردیف‌ها ابتدا یک‌جا اعتبارسنجی می‌شوند؛ ردیف‌های معتبر در بسته‌های chunk_size تایی
+و هر بسته در یک تراکنش DB با درج دسته‌ای ثبت می‌شوند. خطای هر ردیف جداگانه گزارش
+می‌شود و باعث توقف کل دسته نمی‌شود.
+
+ستون‌ها: account (کد حساب)، amount، direction (receive/pay یا دریافت/پرداخت)،
+date (شمسی یا میلادی)، deal (شناسه معامله، اختیاری)، method و description (اختیاری).
+"""
+
+import csv
+import io
+import json
+from datetime import date as date_type
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction as db_transaction
+from transactions.normalization import fold_digits
+
+from .models import Account, AccountingDocument, AccountPayment, FiscalPeriod
+from .services import (
+    _TRANSACTION_TARGET_CATEGORIES,
+    check_settleable_batch,
+    create_account_payments_bulk,
+    parse_date_string,
+)
+
+PAYMENT_IMPORT_CHUNK_SIZE = 200
+PAYMENT_IMPORT_MAX_ROWS = 5000
+
+_DIRECTIONS = {
+    "receive": AccountPayment.Direction.RECEIVE,
+    "دریافت": AccountPayment.Direction.RECEIVE,
+    "pay": AccountPayment.Direction.PAY,
+    "پرداخت": AccountPayment.Direction.PAY,
+}
+
+
+def _clean(value):
+    return fold_digits(value if value is not None else "").strip()
+
+
+def parse_payment_rows(content, fmt):
+    """
+    تبدیل محتوای فایل (bytes یا str) با قالب csv یا json به لیست دیکت ردیف‌ها.
+    JSON می‌تواند لیست ردیف‌ها یا {"rows": [...]} باشد. قالب نامعتبر ValueError می‌دهد.
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValueError("فایل باید با کدگذاری UTF-8 ذخیره شده باشد.")
+    if fmt == "json":
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            raise ValueError("فایل JSON نامعتبر است.")
+        if isinstance(data, dict):
+            data = data.get("rows")
+        if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+            raise ValueError("فایل JSON باید لیستی از ردیف‌ها باشد.")
+        rows = data
+    elif fmt == "csv":
+        reader = csv.DictReader(io.StringIO(content))
+        if not reader.fieldnames or "account" not in [
+            name.strip().lower() for name in reader.fieldnames
+        ]:
+            raise ValueError("ستون account در فایل CSV یافت نشد.")
+        rows = [
+            {(k or "").strip().lower(): v for k, v in row.items()} for row in reader
+        ]
+    else:
+        raise ValueError("قالب فایل باید csv یا json باشد.")
+    if len(rows) > PAYMENT_IMPORT_MAX_ROWS:
+        raise ValueError(
+            f"حداکثر {PAYMENT_IMPORT_MAX_ROWS} ردیف در هر فایل قابل ورود است."
+        )
+    return rows
+
+
+def validate_payment_rows(rows, office=None):
+    """
+    اعتبارسنجی همه ردیف‌ها با تعداد ثابت کوئری (حساب‌ها، اسناد کمیسیون و مرز سال‌های
+    مالی بسته‌شده یک‌جا خوانده می‌شوند).
+    با office فقط معاملات همان بنگاه پذیرفته می‌شوند.
+    برمی‌گرداند (valid, errors): valid لیست (شماره ردیف، دیکت پرداخت) و errors لیست
+    {"row", "message"}؛ شماره ردیف از ۱ شروع می‌شود.
+    """
+    codes = {_clean(row.get("account")) for row in rows}
+    accounts = {
+        acc.code: acc
+        for acc in Account.objects.filter(code__in=codes - {""}, is_active=True)
+    }
+    deal_ids = set()
+    for row in rows:
+        deal = _clean(row.get("deal"))
+        if deal.isdigit():
+            deal_ids.add(int(deal))
+    documents_qs = AccountingDocument.objects.filter(
+        deal_id__in=deal_ids, doc_type=AccountingDocument.DocType.COMMISSION
+    ).order_by("id")
+    if office is not None:
+        documents_qs = documents_qs.filter(deal__office=office)
+    documents = {}
+    for document in documents_qs:
+        documents.setdefault(document.deal_id, document)
+    # قفل سال مالی بسته‌شده هم‌اینجا بررسی می‌شود تا یک ردیف کل بسته را رد نکند
+    closed_until = FiscalPeriod.bounds()["closed_until"]
+
+    valid, errors = [], []
+    for number, row in enumerate(rows, start=1):
+
+        def reject(message):
+            errors.append({"row": number, "message": message})
+
+        account = accounts.get(_clean(row.get("account")))
+        if account is None:
+            reject("حساب با این کد یافت نشد یا غیرفعال است.")
+            continue
+        try:
+            amount = Decimal(
+                _clean(row.get("amount")).replace(",", "").replace("٬", "") or "0"
+            )
+        except InvalidOperation:
+            amount = None
+        if amount is None or amount <= 0:
+            reject("مبلغ باید بزرگ‌تر از صفر باشد.")
+            continue
+        direction = _DIRECTIONS.get(_clean(row.get("direction")).lower())
+        if direction is None:
+            reject("نوع تراکنش (دریافت/پرداخت) را مشخص کنید.")
+            continue
+        raw_date = _clean(row.get("date"))
+        date = parse_date_string(raw_date) if raw_date else date_type.today()
+        if date is None:
+            reject("تاریخ نامعتبر است.")
+            continue
+        if closed_until is not None and date <= closed_until:
+            reject("تاریخ در سال مالی بسته‌شده است و ثبت جدید در آن مجاز نیست.")
+            continue
+        document = None
+        raw_deal = _clean(row.get("deal"))
+        if raw_deal:
+            document = documents.get(int(raw_deal)) if raw_deal.isdigit() else None
+            if document is None:
+                reject("سند کمیسیون این معامله یافت نشد.")
+                continue
+            if account.category not in _TRANSACTION_TARGET_CATEGORIES:
+                reject(
+                    "ثبت تراکنش فقط برای پرداخت/دریافت مشتری، پرداخت به مشاور و "
+                    "پرداخت به مدیر بنگاه امکان‌پذیر است."
+                )
+                continue
+        valid.append(
+            (
+                number,
+                {
+                    "document": document,
+                    "account": account,
+                    "amount": amount,
+                    "direction": direction,
+                    "date": date,
+                    "method": _clean(row.get("method"))[:50],
+                    "description": str(row.get("description") or "").strip(),
+                },
+            )
+        )
+    return valid, errors
+
+
+def import_payments(
+    rows, *, user=None, office=None, chunk_size=PAYMENT_IMPORT_CHUNK_SIZE, dry_run=False
+):
+    """
+    اعتبارسنجی و ثبت دسته‌ای ردیف‌های پرداخت/دریافت.
+    هر بسته در یک تراکنش DB ثبت می‌شود؛ اگر ثبت یک بسته خطا دهد فقط ردیف‌های همان بسته
+    با پیام خطا گزارش می‌شوند. با dry_run فقط اعتبارسنجی (شامل مانده‌ها) انجام می‌شود.
+    برمی‌گرداند {"total", "created", "errors"}.
+    """
+    valid, errors = validate_payment_rows(rows, office=office)
+    created = 0
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start : start + chunk_size]
+        accepted, rejected = [], []
+        try:
+            with db_transaction.atomic():
+                accepted, rejected = check_settleable_batch(chunk, lock=not dry_run)
+                if accepted and not dry_run:
+                    create_account_payments_bulk(
+                        [payment for _, payment in accepted], user=user
+                    )
+        except ValueError as e:
+            failed = accepted if accepted or rejected else chunk
+            errors.extend({"row": number, "message": str(e)} for number, _ in failed)
+            accepted = []
+        errors.extend(
+            {"row": number, "message": message} for number, message in rejected
+        )
+        created += len(accepted)
+    errors.sort(key=lambda error: error["row"])
+    return {"total": len(rows), "created": created, "errors": errors}
@@ -0,0 +1,357 @@
+"""
+گزارش‌های مالی: تراز آزمایشی، صورت سود و زیان و ترازنامه.
+هر سه گزارش از یک کوئری گروه‌بندی‌شده (بر اساس حساب) ساخته می‌شوند و نتیجه برای هر
+(بنگاه، بازه) در کش جنگو نگه داشته می‌شود. تغییر ثبت‌های یک سال، کش گزارش‌هایی را که
+تا آن سال یا بعد از آن را پوشش می‌دهند باطل می‌کند. باطل‌سازی فقط وقتی به همه پروسه‌ها
+می‌رسد که کش مشترک باشد (CACHES در settings)؛ با کش محلی هر پروسه گزارش‌ها کش نمی‌شوند.
+"""
+
+import uuid
+from datetime import date as date_type
+from decimal import Decimal
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction as db_transaction
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Account,
+    AccountEntry,
+    AccountEntryArchive,
+    AccountingDocument,
+    FiscalPeriod,
+)
+from .utils import RETAINED_EARNINGS_CODE
+
+REPORT_CACHE_TIMEOUT = 60 * 60 * 6
+REPORT_VERSION_CACHE_KEY = "finance:reports:version:{year}"
+# تاریخ‌های ثبت‌های تراکنش جاری که پس از commit باید باطل شوند (روی اتصال دیتابیس)
+_PENDING_REPORT_DATES = "_finance_pending_report_dates"
+
+_ZERO = Decimal("0")
+_DEBIT_NATURE = (Account.AccountType.ASSET, Account.AccountType.EXPENSE)
+
+
+def _shared_cache():
+    """آیا کش پیش‌فرض بین پروسه‌ها مشترک است (نه LocMemCache هر worker)."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _year_version(year):
+    key = REPORT_VERSION_CACHE_KEY.format(year=year)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, None)
+    return version
+
+
+def invalidate_reports(dates):
+    """
+    باطل کردن کش گزارش‌ها پس از تغییر ثبت‌های این تاریخ‌ها.
+    گزارش با پایان بازه در سال Y به همه ثبت‌های تا آن سال وابسته است؛ پس نسخه سال ثبت
+    و سال‌های بعد از آن (تا سال آینده) عوض می‌شود.
+    """
+    years = {d.year for d in dates if d}
+    if not years:
+        return
+    last_year = max(max(years), date_type.today().year + 1)
+    cache.set_many(
+        {
+            REPORT_VERSION_CACHE_KEY.format(year=year): uuid.uuid4().hex
+            for year in range(min(years), last_year + 1)
+        },
+        None,
+    )
+
+
+def invalidate_reports_on_commit(dates):
+    """
+    باطل کردن کش گزارش‌ها پس از commit تراکنش جاری، یک بار برای کل تراکنش: تاریخ‌های
+    همه ثبت‌های تراکنش جمع می‌شوند و یک invalidate_reports پس از commit اجرا می‌شود
+    (با rollback تراکنش یا savepoint، کال‌بک و تاریخ‌هایش دور ریخته می‌شوند).
+    """
+    dates = {d for d in dates if d}
+    if not dates:
+        return
+    connection = db_transaction.get_connection()
+    if not connection.in_atomic_block:
+        invalidate_reports(dates)
+        return
+    pending = getattr(connection, _PENDING_REPORT_DATES, None)
+    if pending is None or not any(
+        callback is pending[1] for _, callback, _ in connection.run_on_commit
+    ):
+        pending_dates = set()
+
+        def flush():
+            if getattr(connection, _PENDING_REPORT_DATES, None) is pending:
+                setattr(connection, _PENDING_REPORT_DATES, None)
+            invalidate_reports(pending_dates)
+
+        pending = (pending_dates, flush)
+        setattr(connection, _PENDING_REPORT_DATES, pending)
+        db_transaction.on_commit(flush)
+    pending[0].update(dates)
+
+
+def _office_entries(office, model=AccountEntry):
+    """
+    ثبت‌های یک بنگاه: از طریق معامله (سند کمیسیون، پرداخت، سند)، بنگاه ثبت‌شده روی سند
+    (اسناد روزنامه، دریافت و پرداخت بدون معامله) و برای پرداخت‌های قدیمی بدون معامله و
+    بنگاه سند، بنگاه کاربر ثبت‌کننده.
+    """
+    qs = model.objects.all()
+    if office is not None:
+        qs = qs.filter(
+            Q(transaction__deal_finance__deal__office=office)
+            | Q(transaction__account_payment__deal__office=office)
+            | Q(transaction__accounting_document__deal__office=office)
+            | Q(transaction__accounting_document__office=office)
+            | Q(
+                transaction__account_payment__deal__isnull=True,
+                transaction__account_payment__created_by__office=office,
+            )
+        )
+    return qs
+
+
+def _sum(field, condition=None):
+    return Coalesce(
+        Sum(field, filter=condition),
+        Value(_ZERO),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+
+
+def _signed(account_type, debit, credit):
+    if account_type in _DEBIT_NATURE:
+        return debit - credit
+    return credit - debit
+
+
+def _grouped_rows(qs, opening, within):
+    closing_entries = Q(
+        transaction__accounting_document__doc_type=AccountingDocument.DocType.CLOSING
+    )
+    if within is not None:
+        closing_entries &= within
+    return list(
+        qs.order_by()
+        .values(
+            "account_id",
+            "account__code",
+            "account__name",
+            "account__account_type",
+            "account__category",
+        )
+        .annotate(
+            **opening,
+            period_debit=_sum("debit", within),
+            period_credit=_sum("credit", within),
+            closing_entries_debit=_sum("debit", closing_entries),
+            closing_entries_credit=_sum("credit", closing_entries),
+        )
+    )
+
+
+def _account_rows(office, date_from, date_to):
+    """
+    یک کوئری گروه‌بندی‌شده: گردش قبل از بازه، گردش بازه و جمع تا پایان بازه برای هر حساب.
+    اگر سالی بایگانی شده باشد، جمع ثبت‌های بایگانی (که همه قبل از بازه‌اند) با یک کوئری
+    دیگر روی جدول بایگانی به مانده ابتدای بازه (یا بدون date_from به گردش بازه) اضافه می‌شود.
+    """
+    archived_until = FiscalPeriod.bounds()["archived_until"]
+    if archived_until is not None and (date_from or date_to) <= archived_until:
+        raise ValueError(
+            "ثبت‌های این بازه بایگانی شده‌اند؛ گزارش فقط برای بازه‌های بعد از آخرین سال "
+            "مالی بایگانی‌شده قابل تهیه است."
+        )
+    amount_field = DecimalField(max_digits=18, decimal_places=2)
+    zero = Value(_ZERO, output_field=amount_field)
+    qs = _office_entries(office).filter(date__lte=date_to)
+    if date_from:
+        before = Q(date__lt=date_from)
+        opening = {
+            "opening_debit": _sum("debit", before),
+            "opening_credit": _sum("credit", before),
+        }
+        within = Q(date__gte=date_from)
+    else:
+        opening = {"opening_debit": zero, "opening_credit": zero}
+        within = None
+    rows = {r["account_id"]: r for r in _grouped_rows(qs, opening, within)}
+
+    if archived_until is not None:
+        target = "opening" if date_from else "period"
+        for r in _grouped_rows(
+            _office_entries(office, AccountEntryArchive),
+            {"opening_debit": zero, "opening_credit": zero},
+            None,
+        ):
+            row = rows.setdefault(
+                r["account_id"],
+                {
+                    **r,
+                    "opening_debit": _ZERO,
+                    "opening_credit": _ZERO,
+                    "period_debit": _ZERO,
+                    "period_credit": _ZERO,
+                    "closing_entries_debit": _ZERO,
+                    "closing_entries_credit": _ZERO,
+                },
+            )
+            row[f"{target}_debit"] += r["period_debit"]
+            row[f"{target}_credit"] += r["period_credit"]
+            if target == "period":
+                row["closing_entries_debit"] += r["closing_entries_debit"]
+                row["closing_entries_credit"] += r["closing_entries_credit"]
+    return sorted(rows.values(), key=lambda r: r["account__code"])
+
+
+def _build_reports(rows, date_from, date_to):
+    category_labels = dict(Account.AccountCategory.choices)
+    type_labels = dict(Account.AccountType.choices)
+
+    trial_rows = []
+    tb_totals = dict.fromkeys(
+        (
+            "opening_debit",
+            "opening_credit",
+            "period_debit",
+            "period_credit",
+            "closing_debit",
+            "closing_credit",
+        ),
+        _ZERO,
+    )
+    income_sections = {}
+    balance_sections = {}
+    retained_earnings = _ZERO
+
+    for r in rows:
+        account_type = r["account__account_type"]
+        closing_debit = r["opening_debit"] + r["period_debit"]
+        closing_credit = r["opening_credit"] + r["period_credit"]
+        row = {
+            "account_id": r["account_id"],
+            "code": r["account__code"],
+            "name": r["account__name"],
+            "account_type": account_type,
+            "category": r["account__category"],
+            "opening_debit": r["opening_debit"],
+            "opening_credit": r["opening_credit"],
+            "period_debit": r["period_debit"],
+            "period_credit": r["period_credit"],
+            "closing_debit": closing_debit,
+            "closing_credit": closing_credit,
+            "balance": _signed(account_type, closing_debit, closing_credit),
+        }
+        trial_rows.append(row)
+        for field in tb_totals:
+            tb_totals[field] += row[field]
+
+        if account_type in (Account.AccountType.INCOME, Account.AccountType.EXPENSE):
+            # سود و زیان فقط گردش بازه (بدون سند بستن حساب‌ها)؛ سود انباشته تا پایان
+            # بازه در ترازنامه
+            retained_earnings += _signed(
+                Account.AccountType.INCOME, closing_debit, closing_credit
+            )
+            amount = _signed(
+                account_type,
+                r["period_debit"] - r["closing_entries_debit"],
+                r["period_credit"] - r["closing_entries_credit"],
+            )
+            section = income_sections.setdefault(
+                account_type, {"label": type_labels[account_type], "categories": {}}
+            )
+        elif row["code"] == RETAINED_EARNINGS_CODE:
+            # نتیجه سال‌های بسته‌شده؛ در ترازنامه جزو سود انباشته است نه بدهی‌ها
+            retained_earnings += row["balance"]
+            continue
+        else:
+            amount = row["balance"]
+            section = balance_sections.setdefault(
+                account_type, {"label": type_labels[account_type], "categories": {}}
+            )
+        category = section["categories"].setdefault(
+            row["category"],
+            {
+                "label": category_labels.get(row["category"], row["category"]),
+                "amount": _ZERO,
+                "accounts": [],
+            },
+        )
+        category["amount"] += amount
+        category["accounts"].append({**row, "amount": amount})
+
+    for sections in (income_sections, balance_sections):
+        for section in sections.values():
+            section["categories"] = list(section["categories"].values())
+            section["total"] = sum((c["amount"] for c in section["categories"]), _ZERO)
+
+    def _total(sections, account_type):
+        return sections.get(account_type, {}).get("total", _ZERO)
+
+    total_income = _total(income_sections, Account.AccountType.INCOME)
+    total_expense = _total(income_sections, Account.AccountType.EXPENSE)
+    total_assets = _total(balance_sections, Account.AccountType.ASSET)
+    total_liabilities = _total(balance_sections, Account.AccountType.LIABILITY)
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "trial_balance": {
+            "rows": trial_rows,
+            "totals": tb_totals,
+            "is_balanced": tb_totals["closing_debit"] == tb_totals["closing_credit"],
+        },
+        "income_statement": {
+            "sections": list(income_sections.values()),
+            "total_income": total_income,
+            "total_expense": total_expense,
+            "net_income": total_income - total_expense,
+        },
+        "balance_sheet": {
+            "sections": list(balance_sections.values()),
+            "total_assets": total_assets,
+            "total_liabilities": total_liabilities,
+            "retained_earnings": retained_earnings,
+            "total_liabilities_and_equity": total_liabilities + retained_earnings,
+            "is_balanced": total_assets == total_liabilities + retained_earnings,
+        },
+    }
+
+
+def get_financial_reports(office=None, date_from=None, date_to=None):
+    """
+    تراز آزمایشی، صورت سود و زیان (گردش بازه) و ترازنامه (مانده تا پایان بازه).
+    office=None یعنی کل دفاتر؛ در غیر این صورت فقط تراکنش‌های مرتبط با معاملات آن بنگاه.
+    """
+    date_to = date_to or date_type.today()
+    if date_from and date_from > date_to:
+        raise ValueError("تاریخ شروع بازه نمی‌تواند بعد از تاریخ پایان باشد.")
+
+    # گزارش‌های آینده دور با invalidate_reports پوشش داده نمی‌شوند و کش نمی‌شوند
+    cacheable = _shared_cache() and date_to.year <= date_type.today().year + 1
+    cache_key = None
+    if cacheable:
+        cache_key = "finance:reports:{}:{}:{}:{}".format(
+            office.pk if office is not None else "all",
+            date_from.isoformat() if date_from else "",
+            date_to.isoformat(),
+            _year_version(date_to.year),
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    reports = _build_reports(
+        _account_rows(office, date_from, date_to), date_from, date_to
+    )
+    if cache_key:
+        cache.set(cache_key, reports, REPORT_CACHE_TIMEOUT)
+    return reports
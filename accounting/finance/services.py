@@ -1,25 +1,35 @@
+from collections import defaultdict
+from datetime import date as date_type
+from datetime import timedelta
 from decimal import Decimal
 
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction as db_transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
-from transactions.models import DealClientCommission
+from django.utils import timezone
+from transactions.models import DealClientCommission, Deals
 
 from .models import (
     Account,
+    AccountBalance,
+    AccountBalanceSnapshot,
     AccountEntry,
     AccountingDocument,
     AccountingTransaction,
     AccountPayment,
+    AccountTreePath,
     DealFinance,
+    DealLedgerSummary,
+    DocumentSequence,
+    FiscalPeriod,
+    PendingDealPayment,
 )
 
 # دسته‌ی حساب برای تشخیص طلب مشتری و درآمد کمیسیون
-from .utils import (
-    ensure_client_account,
-    ensure_consultant_accounts,
-    ensure_office_manager_accounts,
-    setup_chart_of_accounts,
-)
+from .reports import invalidate_reports_on_commit
+from .utils import ensure_accounts_for, setup_chart_of_accounts
 
 # برچسب‌ها و ترتیب نمایش برای دفتر معامله
 _CATEGORY_LABELS = {
@@ -73,50 +83,511 @@ _TRANSACTION_TARGET_CATEGORIES = (
 )
 
 
+def get_balances(account_ids, as_of=None):
+    """
+    مانده چند حساب در یک رفت‌وبرگشت به پایگاه داده.
+    برمی‌گرداند دیکت {account_id: مانده}؛ حساب‌های بدون ثبت مانده صفر دارند.
+    """
+    account_ids = [a for a in account_ids if a is not None]
+    if not account_ids:
+        return {}
+    return dict(
+        Account.objects.filter(id__in=account_ids)
+        .with_balances(as_of=as_of)
+        .values_list("id", "balance")
+    )
+
+
+def get_rollup_balances(account_ids=None, as_of=None):
+    """
+    مانده تجمیعی زیردرخت حساب‌ها (خود حساب + همه زیرحساب‌ها) برای همه گره‌ها در یک کوئری
+    گروه‌بندی‌شده روی جدول بستار درخت. اگر account_ids داده شود فقط همان گره‌ها محاسبه می‌شوند.
+    با as_of مانده هر حساب از with_balances(as_of) (عکس مانده + ثبت‌ها و بایگانی بعد از آن)
+    خوانده و روی اجداد جمع زده می‌شود.
+    برمی‌گرداند دیکت {account_id: {"debit_total", "credit_total", "balance"}}.
+    """
+    links = AccountTreePath.objects.order_by()
+    if account_ids is not None:
+        links = links.filter(ancestor_id__in=list(account_ids))
+    if as_of is None:
+        rows = links.values("ancestor_id", "ancestor__account_type").annotate(
+            debit_total=Sum("descendant__balance_summary__debit_total"),
+            credit_total=Sum("descendant__balance_summary__credit_total"),
+        )
+    else:
+        totals = {
+            row[0]: row[1:]
+            for row in Account.objects.filter(id__in=links.values("descendant_id"))
+            .with_balances(as_of=as_of)
+            .values_list("id", "debit_total", "credit_total")
+        }
+        grouped = {}
+        for ancestor_id, account_type, descendant_id in links.values_list(
+            "ancestor_id", "ancestor__account_type", "descendant_id"
+        ):
+            row = grouped.setdefault(
+                ancestor_id,
+                {
+                    "ancestor_id": ancestor_id,
+                    "ancestor__account_type": account_type,
+                    "debit_total": Decimal("0"),
+                    "credit_total": Decimal("0"),
+                },
+            )
+            debit, credit = totals.get(descendant_id, (0, 0))
+            row["debit_total"] += debit
+            row["credit_total"] += credit
+        rows = grouped.values()
+    result = {}
+    for row in rows:
+        debit_total = row["debit_total"] or Decimal("0")
+        credit_total = row["credit_total"] or Decimal("0")
+        if row["ancestor__account_type"] in (
+            Account.AccountType.ASSET,
+            Account.AccountType.EXPENSE,
+        ):
+            balance = debit_total - credit_total
+        else:
+            balance = credit_total - debit_total
+        result[row["ancestor_id"]] = {
+            "debit_total": debit_total,
+            "credit_total": credit_total,
+            "balance": balance,
+        }
+    return result
+
+
+def create_balance_snapshots(period_end):
+    """
+    بستن دوره: ثبت عکس مانده تجمعی همه حساب‌ها تا پایان period_end.
+    عکس جدید از آخرین عکس قبلی به‌علاوه ثبت‌های بین دو تاریخ ساخته می‌شود،
+    پس هزینه آن به حجم ثبت‌های همان دوره بستگی دارد نه کل تاریخچه.
+    برمی‌گرداند تعداد عکس‌های ثبت‌شده.
+    """
+    archived_until = FiscalPeriod.bounds()["archived_until"]
+    if archived_until is not None and period_end <= archived_until:
+        raise ValueError(
+            "ثبت‌های این دوره بایگانی شده‌اند و عکس مانده آن قابل ساخت نیست."
+        )
+    previous_end = (
+        AccountBalanceSnapshot.objects.filter(period_end__lt=period_end)
+        .order_by("-period_end")
+        .values_list("period_end", flat=True)
+        .first()
+    )
+    totals = {}
+    if previous_end is not None:
+        for snap in AccountBalanceSnapshot.objects.filter(period_end=previous_end):
+            totals[snap.account_id] = [
+                snap.debit_total,
+                snap.credit_total,
+                snap.entry_count,
+            ]
+    period_entries = AccountEntry.objects.filter(date__lte=period_end)
+    if previous_end is not None:
+        period_entries = period_entries.filter(date__gt=previous_end)
+    for row in (
+        period_entries.order_by()
+        .values("account_id")
+        .annotate(
+            debit_total=Sum("debit"),
+            credit_total=Sum("credit"),
+            entry_count=Count("id"),
+        )
+    ):
+        current = totals.setdefault(row["account_id"], [Decimal("0"), Decimal("0"), 0])
+        current[0] += row["debit_total"] or Decimal("0")
+        current[1] += row["credit_total"] or Decimal("0")
+        current[2] += row["entry_count"]
+    with db_transaction.atomic():
+        AccountBalanceSnapshot.objects.filter(period_end=period_end).delete()
+        AccountBalanceSnapshot.objects.bulk_create(
+            [
+                AccountBalanceSnapshot(
+                    account_id=account_id,
+                    period_end=period_end,
+                    debit_total=debit_total,
+                    credit_total=credit_total,
+                    entry_count=entry_count,
+                )
+                for account_id, (
+                    debit_total,
+                    credit_total,
+                    entry_count,
+                ) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+LEDGER_PAGE_SIZE = 50
+
+
+def encode_ledger_cursor(entry):
+    """کلید صفحه‌بندی گردش حساب: (تاریخ تراکنش، شناسه تراکنش، شناسه ثبت)."""
+    return f"{entry.date.isoformat()}_{entry.transaction_id}_{entry.id}"
+
+
+def decode_ledger_cursor(cursor):
+    """برگرداندن (date, transaction_id, entry_id) از رشته cursor؛ نامعتبر → None."""
+    if not cursor:
+        return None
+    try:
+        day, trx_id, entry_id = str(cursor).split("_")
+        return (
+            date_type.fromisoformat(day),
+            int(trx_id),
+            int(entry_id),
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def get_account_ledger_page(
+    account, date_from=None, date_to=None, cursor=None, page_size=LEDGER_PAGE_SIZE
+):
+    """
+    یک صفحه از گردش حساب با صفحه‌بندی keyset روی (تاریخ تراکنش، شناسه تراکنش، شناسه ثبت).
+    مانده تجمعی از مانده ابتدای صفحه ادامه پیدا می‌کند؛ مانده ابتدای صفحه از عکس مانده و
+    ثبت‌های همان روز قبل از cursor محاسبه می‌شود، پس هزینه هر صفحه به عمق صفحه وابسته نیست.
+    ثبت‌های سال‌های بایگانی‌شده در گردش نیستند؛ گردش از ابتدای اولین سال بایگانی‌نشده و با
+    مانده ابتدای آن (عکس مانده پایان سال بسته‌شده) نمایش داده می‌شود.
+    """
+    archived_until = FiscalPeriod.bounds()["archived_until"]
+    if archived_until is not None and (
+        date_from is None or date_from <= archived_until
+    ):
+        date_from = archived_until + timedelta(days=1)
+    entries_qs = (
+        AccountEntry.objects.filter(account=account)
+        .select_related("transaction")
+        .order_by("date", "transaction_id", "id")
+    )
+    if date_from:
+        entries_qs = entries_qs.filter(date__gte=date_from)
+    if date_to:
+        entries_qs = entries_qs.filter(date__lte=date_to)
+
+    position = decode_ledger_cursor(cursor)
+    if position is not None:
+        day, trx_id, entry_id = position
+        entries_qs = entries_qs.filter(
+            Q(date__gt=day)
+            | Q(date=day, transaction_id__gt=trx_id)
+            | Q(date=day, transaction_id=trx_id, id__gt=entry_id)
+        )
+        same_day = AccountEntry.objects.filter(account=account, date=day).filter(
+            Q(transaction_id__lt=trx_id) | Q(transaction_id=trx_id, id__lte=entry_id)
+        )
+        totals = same_day.aggregate(debit=Sum("debit"), credit=Sum("credit"))
+        opening_balance = account.get_balance(
+            as_of=day - timedelta(days=1)
+        ) + account.balance_from_totals(
+            totals["debit"] or Decimal("0"), totals["credit"] or Decimal("0")
+        )
+    elif date_from:
+        opening_balance = account.get_balance(as_of=date_from - timedelta(days=1))
+    else:
+        opening_balance = Decimal("0")
+
+    page = list(entries_qs[: page_size + 1])
+    has_next = len(page) > page_size
+    page = page[:page_size]
+
+    rows = []
+    running = opening_balance
+    for e in page:
+        debit = e.debit or Decimal("0")
+        credit = e.credit or Decimal("0")
+        running += account.balance_from_totals(debit, credit)
+        rows.append(
+            {
+                "entry": e,
+                "debit": debit,
+                "credit": credit,
+                "running_balance": running,
+            }
+        )
+    return {
+        "rows": rows,
+        "opening_balance": opening_balance,
+        "closing_balance": running,
+        "has_next": has_next,
+        "next_cursor": encode_ledger_cursor(page[-1]) if has_next else "",
+    }
+
+
+def deal_revenue_shortfalls(open_only=False):
+    """
+    کوئری گروه‌بندی‌شده روی همه تراکنش‌های سند کمیسیون (DealFinance.income_transaction):
+    تراکنش‌هایی که طلب از مشتریان (بدهکار) بیش از درآمد کمیسیون (بستانکار) ثبت شده است.
+    با open_only فقط تراکنش‌های سال‌های مالی باز (قابل اصلاح).
+    """
+    revenue_account = setup_chart_of_accounts()["revenue_commission"]
+    amount_field = DecimalField(max_digits=18, decimal_places=2)
+    entries = AccountEntry.objects.filter(transaction__deal_finance__isnull=False)
+    closed_until = FiscalPeriod.bounds()["closed_until"] if open_only else None
+    if closed_until is not None:
+        entries = entries.filter(date__gt=closed_until)
+    return (
+        entries.order_by()
+        .values(
+            "transaction_id",
+            "date",
+            "transaction__deal_finance__deal_id",
+        )
+        .annotate(
+            client_debit=Coalesce(
+                Sum(
+                    "debit",
+                    filter=Q(
+                        account__category=Account.AccountCategory.RECEIVABLE_CLIENT
+                    ),
+                ),
+                Value(Decimal("0")),
+                output_field=amount_field,
+            ),
+            revenue_credit=Coalesce(
+                Sum("credit", filter=Q(account=revenue_account)),
+                Value(Decimal("0")),
+                output_field=amount_field,
+            ),
+        )
+        .filter(client_debit__gt=F("revenue_credit"))
+        .order_by("transaction_id")
+    )
+
+
+def repair_deal_revenue_shortfalls(shortfalls):
+    """
+    ثبت دسته‌ای ردیف‌های بستانکار درآمد کمیسیون برای ردیف‌های deal_revenue_shortfalls
+    (یک bulk_create و به‌روزرسانی دسته‌ای مانده‌ها، عکس مانده‌ها و خلاصه معاملات).
+    ردیف با تاریخ در سال مالی بسته‌شده ValueError می‌دهد. تعداد ردیف‌های اصلاحی را برمی‌گرداند.
+    """
+    shortfalls = list(shortfalls)
+    if not shortfalls:
+        return 0
+    revenue_account = setup_chart_of_accounts()["revenue_commission"]
+    entries = [
+        AccountEntry(
+            transaction_id=row["transaction_id"],
+            date=row["date"],
+            account=revenue_account,
+            debit=Decimal("0"),
+            credit=row["client_debit"] - row["revenue_credit"],
+            description=(
+                "اصلاح معادل درآمد کمیسیون بنگاه "
+                f"(معامله {row['transaction__deal_finance__deal_id']})"
+            ),
+        )
+        for row in shortfalls
+    ]
+    FiscalPeriod.check_open([row["date"] for row in shortfalls])
+    with db_transaction.atomic():
+        AccountBalance.ensure_rows([revenue_account.id])
+        AccountEntry.objects.bulk_create(entries)
+        AccountBalance.apply_deltas(
+            {
+                revenue_account.id: (
+                    Decimal("0"),
+                    sum((e.credit for e in entries), Decimal("0")),
+                    len(entries),
+                    max(e.id for e in entries),
+                )
+            }
+        )
+        by_date = defaultdict(lambda: (Decimal("0"), 0))
+        by_deal = defaultdict(list)
+        for row, entry in zip(shortfalls, entries):
+            credit, count = by_date[row["date"]]
+            by_date[row["date"]] = (credit + entry.credit, count + 1)
+            by_deal[row["transaction__deal_finance__deal_id"]].append(entry)
+        DealLedgerSummary.add_entries_bulk(by_deal)
+        for trx_date, (credit, count) in by_date.items():
+            AccountBalanceSnapshot.apply_deltas(
+                trx_date, {revenue_account.id: (Decimal("0"), credit, count)}
+            )
+        invalidate_reports_on_commit(by_date)
+    return len(entries)
+
+
 def repair_deal_ledger_revenue(deal, trx):
     """
     اگر در تراکنش سند کمیسیون، طلب از مشتریان (بدهکار) وجود دارد ولی معادل
     درآمد کمیسیون بنگاه (بستانکار) ثبت نشده یا ناقص است، ردیف‌های بستانکار درآمد را اضافه می‌کند.
+    برای همه معاملات از فرمان repair_deal_revenue استفاده کنید.
     """
-    base_accounts = setup_chart_of_accounts()
-    revenue_account = base_accounts["revenue_commission"]
-    receivable_client_category = Account.AccountCategory.RECEIVABLE_CLIENT
-
-    entries = AccountEntry.objects.filter(transaction=trx).select_related("account")
-    client_debit_total = Decimal("0")
-    revenue_credit_total = Decimal("0")
-    for e in entries:
-        acc = e.account
-        if not acc:
-            continue
-        if getattr(acc, "category", None) == receivable_client_category:
-            client_debit_total += Decimal(str(e.debit or 0))
-        if acc.id == revenue_account.id:
-            revenue_credit_total += Decimal(str(e.credit or 0))
+    return repair_deal_revenue_shortfalls(
+        deal_revenue_shortfalls().filter(transaction_id=trx.id)
+    )
 
-    missing = client_debit_total - revenue_credit_total
-    if missing <= 0:
+
+def check_deal_open(deal):
+    """
+    ValueError اگر معامله ثبتی (سند کمیسیون، پرداخت یا سند دیگر) در سال مالی بسته‌شده
+    داشته باشد؛ حذف چنین معامله‌ای گزارش‌های بنگاه در آن سال را تغییر می‌دهد.
+    """
+    closed_until = FiscalPeriod.bounds()["closed_until"]
+    if closed_until is None:
         return
-    with db_transaction.atomic():
-        AccountEntry.objects.create(
-            transaction=trx,
-            account=revenue_account,
-            debit=Decimal("0"),
-            credit=missing,
-            description=f"اصلاح معادل درآمد کمیسیون بنگاه (معامله {deal.id})",
+    first_closed = (
+        AccountingTransaction.objects.filter(
+            Q(deal_finance__deal=deal)
+            | Q(account_payment__deal=deal)
+            | Q(accounting_document__deal=deal),
+            date__lte=closed_until,
+            entries__isnull=False,
+        )
+        .values_list("date", flat=True)
+        .first()
+    )
+    FiscalPeriod.check_open([first_closed])
+
+
+def get_settleable_balance(deal, account_id, lock=False):
+    """
+    مانده قابل تسویه یک حساب در معامله با یک کوئری از خلاصه دفتر معامله:
+    مبلغ اولیه بدهکار/بستانکار سند کمیسیون و جمع دریافت‌ها/پرداخت‌های ثبت‌شده.
+    با lock=True ردیف خلاصه تا پایان تراکنش جاری قفل می‌شود (select_for_update) تا دو
+    پرداخت هم‌زمان نتوانند هر دو از بررسی مانده عبور کنند؛ باید داخل atomic صدا زده شود.
+    اگر حساب در سند کمیسیون معامله نباشد None برمی‌گرداند.
+    """
+    qs = DealLedgerSummary.objects.select_related("account").filter(
+        deal=deal, account_id=account_id
+    )
+    if lock:
+        qs = qs.select_for_update(of=("self",))
+    summary = qs.first()
+    if summary is None and not DealLedgerSummary.objects.filter(deal=deal).exists():
+        # معامله قدیمی بدون خلاصه: یک بار ساخته می‌شود تا ردیف قابل قفل شدن باشد. ردیف
+        # معامله قفل می‌شود تا درخواست هم‌زمان پس از ساخت، خلاصه را دوباره نسازد.
+        with db_transaction.atomic():
+            list(Deals.objects.select_for_update().filter(pk=deal.pk).values("pk"))
+            if not DealLedgerSummary.objects.filter(deal=deal).exists():
+                DealLedgerSummary.rebuild([deal.id])
+        summary = qs.first()
+    return summary
+
+
+def check_settleable_amount(summary, direction, amount):
+    """
+    جلوگیری از تسویه بیش از مانده: برای حساب طلب بنگاه (بدهکار) دریافت بیش از مانده و
+    برای حساب بدهی بنگاه (بستانکار) پرداخت بیش از مانده ValueError می‌دهد.
+    """
+    remaining_receivable = summary.debit - summary.settled_receive
+    remaining_payable = summary.credit - summary.settled_pay
+    if (
+        direction == AccountPayment.Direction.RECEIVE
+        and summary.debit > 0
+        and amount > remaining_receivable
+    ):
+        raise ValueError(
+            "مبلغ وارد شده بیشتر از مانده قابل دریافت از این حساب است. "
+            f"مانده فعلی: {remaining_receivable} ریال."
+        )
+    if (
+        direction == AccountPayment.Direction.PAY
+        and summary.credit > 0
+        and amount > remaining_payable
+    ):
+        raise ValueError(
+            "مبلغ وارد شده بیشتر از مانده قابل پرداخت به این حساب است. "
+            f"مانده فعلی: {remaining_payable} ریال."
+        )
+
+
+def check_settleable_batch(items, lock=False):
+    """
+    بررسی مانده قابل تسویه چند پرداخت با یک کوئری روی خلاصه دفتر معاملات.
+    items: لیست (key, payment) که payment دیکت با کلیدهای document, account, direction
+    و amount است؛ پرداخت بدون document (بدون معامله) بررسی نمی‌شود. پرداخت‌های هم‌حساب
+    به ترتیب لیست از مانده کم می‌کنند. با lock ردیف‌های خلاصه تا پایان تراکنش جاری قفل
+    می‌شوند و خلاصه معاملات قدیمی ذخیره می‌شود؛ بدون lock فقط محاسبه می‌شود.
+    برمی‌گرداند (accepted, rejected): accepted لیست (key, payment) و rejected لیست (key, پیام).
+    """
+    deal_ids = {p["document"].deal_id for _, p in items if p["document"]}
+    summaries = {}
+    if deal_ids:
+        qs = DealLedgerSummary.objects.filter(
+            deal_id__in=deal_ids,
+            account_id__in={p["account"].id for _, p in items if p["document"]},
         )
+        if lock:
+            qs = qs.select_for_update()
+        summaries = {(s.deal_id, s.account_id): s for s in qs}
+        # معاملات قدیمی بدون خلاصه
+        missing = deal_ids - set(
+            DealLedgerSummary.objects.filter(deal_id__in=deal_ids).values_list(
+                "deal_id", flat=True
+            )
+        )
+        if missing:
+            if lock:
+                # ردیف معاملات قفل و دوباره بررسی می‌شود تا درخواست هم‌زمان خلاصه‌ای را
+                # که دیگری همین حالا ساخته دوباره نسازد
+                list(
+                    Deals.objects.select_for_update()
+                    .filter(pk__in=missing)
+                    .order_by("pk")
+                    .values("pk")
+                )
+                still_missing = missing - set(
+                    DealLedgerSummary.objects.filter(deal_id__in=missing).values_list(
+                        "deal_id", flat=True
+                    )
+                )
+                if still_missing:
+                    DealLedgerSummary.rebuild(still_missing)
+                fresh = qs.filter(deal_id__in=missing)
+            else:
+                fresh = DealLedgerSummary.compute(missing)
+            summaries.update({(s.deal_id, s.account_id): s for s in fresh})
+
+    accepted, rejected = [], []
+    for key, payment in items:
+        if payment["document"]:
+            summary = summaries.get(
+                (payment["document"].deal_id, payment["account"].id)
+            )
+            if summary is None:
+                rejected.append((key, "این حساب مربوط به این معامله نیست."))
+                continue
+            try:
+                check_settleable_amount(
+                    summary, payment["direction"], payment["amount"]
+                )
+            except ValueError as e:
+                rejected.append((key, str(e)))
+                continue
+            if payment["direction"] == AccountPayment.Direction.RECEIVE:
+                summary.settled_receive += payment["amount"]
+            else:
+                summary.settled_pay += payment["amount"]
+        accepted.append((key, payment))
+    return accepted, rejected
 
 
 def get_deal_ledger_summary(deal, trx, document):
     """
     خلاصه دفتر معامله برای نمایش در صفحه: ردیف‌های دفتری، مانده‌ها، پرداخت‌ها، لیست حساب‌ها برای ثبت تراکنش.
+    مبالغ اولیه و تسویه‌ها از جدول DealLedgerSummary خوانده می‌شوند و همه مبالغ Decimal هستند
+    (بدون تبدیل به float و خطای گرد کردن در مبالغ بزرگ ریالی).
     برمی‌گرداند یک دیکت مناسب برای context ویو.
     """
-    entries_qs = (
-        AccountEntry.objects.filter(transaction=trx)
+    summaries = list(
+        DealLedgerSummary.objects.filter(deal=deal)
         .select_related("account")
-        .order_by("id")
+        .order_by("account_id")
     )
+    if not summaries and trx is not None:
+        # معامله‌های قدیمی که خلاصه‌شان هنوز ساخته نشده است (rebuild_deal_summaries):
+        # محاسبه در حافظه بدون نوشتن در مسیر خواندن
+        summaries = DealLedgerSummary.compute([deal.id])
+        accounts = Account.objects.in_bulk([s.account_id for s in summaries])
+        for summary in summaries:
+            summary.account = accounts[summary.account_id]
+        summaries.sort(key=lambda s: s.account_id)
     payments_qs = (
         AccountPayment.objects.filter(deal=deal)
         .select_related("account", "created_by")
@@ -143,7 +614,7 @@ def get_deal_ledger_summary(deal, trx, document):
                 "date": p.date.strftime("%Y/%m/%d"),
                 "direction": p.get_direction_display(),
                 "direction_value": p.direction,
-                "amount": float(p.amount or 0),
+                "amount": p.amount or Decimal("0"),
                 "method": p.method or "",
                 "description": p.description or "",
                 "receipt_url": receipt_url,
@@ -151,100 +622,72 @@ def get_deal_ledger_summary(deal, trx, document):
             }
         )
     category_totals = {
-        k: {"label": v, "debit": 0.0, "credit": 0.0}
+        k: {"label": v, "debit": Decimal("0"), "credit": Decimal("0")}
         for k, v in _CATEGORY_LABELS.items()
     }
-    by_account = {}
-    total_debit = 0.0
-    total_credit = 0.0
+    total_debit = Decimal("0")
+    total_credit = Decimal("0")
     deal_accounts_list = []
-    seen_account_ids = set()
-    for entry in entries_qs:
-        debit = float(entry.debit or 0)
-        credit = float(entry.credit or 0)
+    ledger_rows = []
+    total_received_from_clients = Decimal("0")
+    for summary in summaries:
+        acc = summary.account
+        debit = summary.debit
+        credit = summary.credit
         total_debit += debit
         total_credit += credit
-        acc = entry.account
         category = getattr(acc, "category", None) or "other"
         if category in category_totals:
             category_totals[category]["debit"] += debit
             category_totals[category]["credit"] += credit
-        if acc.id not in seen_account_ids:
-            seen_account_ids.add(acc.id)
-            if category in _TRANSACTION_TARGET_CATEGORIES:
-                deal_accounts_list.append(
-                    {
-                        "id": acc.id,
-                        "code": acc.code or "",
-                        "name": acc.name or "",
-                        "category": category,
-                    }
-                )
-        if acc.id not in by_account:
-            kind_label = _KIND_LABELS.get(category, "سایر")
-            payments_list = payments_by_account.get(acc.code or "", [])
-            by_account[acc.id] = {
+        settled = summary.settled_amount
+        remaining = summary.remaining_amount
+        if category == "receivable_client":
+            total_received_from_clients += settled
+        if category in _TRANSACTION_TARGET_CATEGORIES:
+            deal_accounts_list.append(
+                {
+                    "id": acc.id,
+                    "code": acc.code or "",
+                    "name": acc.name or "",
+                    "category": category,
+                    "remaining_amount": remaining,
+                }
+            )
+        ledger_rows.append(
+            {
                 "account_name": acc.name or "—",
                 "account_code": acc.code or "—",
-                "account_kind": kind_label,
+                "account_kind": _KIND_LABELS.get(category, "سایر"),
                 "counterpart_label": _CATEGORY_LABELS.get(category, ""),
-                "debit": 0.0,
-                "credit": 0.0,
-                "has_payments": bool(payments_list),
-                "settled_amount": 0.0,
-                "remaining_amount": 0.0,
+                "debit": debit,
+                "credit": credit,
+                "has_payments": bool(payments_by_account.get(acc.code or "")),
+                "settled_amount": settled,
+                "remaining_amount": remaining,
                 "order_key": _ORDER_KEYS.get(category, (4, 0)),
-                "_payments_list": payments_list,
-                "_category": category,
             }
-        by_account[acc.id]["debit"] += debit
-        by_account[acc.id]["credit"] += credit
-    total_received_from_clients = 0.0
-    ledger_rows = []
-    for _acc_id, b in by_account.items():
-        payments_list = b.pop("_payments_list", [])
-        category = b.pop("_category", "other")
-        debit, credit = b["debit"], b["credit"]
-        settled = (
-            sum(
-                x["amount"]
-                for x in payments_list
-                if x.get("direction_value") == "receive"
-            )
-            if debit > 0
-            else sum(
-                x["amount"] for x in payments_list if x.get("direction_value") == "pay"
-            )
         )
-        if category == "receivable_client":
-            total_received_from_clients += settled
-        balance = debit if debit > 0 else credit
-        b["settled_amount"] = settled
-        b["remaining_amount"] = max(0, balance - settled)
-        ledger_rows.append(b)
     for row in ledger_rows:
         if row.get("account_kind") == "درآمد کمیسیون بنگاه":
             row["settled_amount"] = total_received_from_clients
             row["remaining_amount"] = max(
-                0, float(row.get("credit") or 0) - total_received_from_clients
+                Decimal("0"), row["credit"] - total_received_from_clients
             )
-    client_debit = (category_totals.get("receivable_client") or {}).get("debit", 0) or 0
+    client_debit = category_totals["receivable_client"]["debit"]
     for row in ledger_rows:
         if (
             row.get("account_kind") == "درآمد کمیسیون بنگاه"
-            and (not row.get("credit") or row["credit"] == 0)
+            and not row["credit"]
             and client_debit > 0
         ):
             row["credit"] = client_debit
-            row["remaining_amount"] = max(0, client_debit - row["settled_amount"])
+            row["remaining_amount"] = max(
+                Decimal("0"), client_debit - row["settled_amount"]
+            )
     ledger_rows.sort(key=lambda r: (r["order_key"], r["account_code"]))
-    remaining_by_account_id = {
-        aid: by_account[aid]["remaining_amount"] for aid in by_account
-    }
-    for item in deal_accounts_list:
-        item["remaining_amount"] = remaining_by_account_id.get(item["id"], 0.0)
     summary_items = []
-    client_receivable_balance = 0.0
+    client_receivable_balance = Decimal("0")
     for key, data in category_totals.items():
         if data["debit"] == 0 and data["credit"] == 0:
             continue
@@ -264,7 +707,7 @@ def get_deal_ledger_summary(deal, trx, document):
         "entries": [],
         "total_debit": total_debit,
         "total_credit": total_credit,
-        "is_balanced": trx.is_balanced(),
+        "is_balanced": total_debit == total_credit,
         "summary_items": summary_items,
         "client_receivable_balance": client_receivable_balance,
         "ledger_rows": ledger_rows,
@@ -274,19 +717,31 @@ def get_deal_ledger_summary(deal, trx, document):
     }
 
 
+def parse_date_string(value):
+    """
+    تبدیل رشته تاریخ شمسی (مثلاً 1403/05/15) یا میلادی (2024-08-05) به date میلادی.
+    در صورت نامعتبر بودن None برمی‌گرداند.
+    """
+    if not value:
+        return None
+    try:
+        parts = str(value).strip().replace("/", "-").split("-")
+        if len(parts) >= 3:
+            y, m, d = int(parts[0]), int(parts[1]), int(parts[2])
+            if y < 1500:
+                from jdatetime import date as jdate
+
+                return jdate(y, m, d).togregorian()
+            return __import__("datetime").date(y, m, d)
+    except Exception:
+        pass
+    return None
+
+
 def _parse_deal_date(deal):
-    if deal.date:
-        try:
-            parts = str(deal.date).replace("/", "-").split("-")
-            if len(parts) >= 3:
-                y, m, d = int(parts[0]), int(parts[1]), int(parts[2])
-                if y < 1500:
-                    from jdatetime import date as jdate
-
-                    return jdate(y, m, d).togregorian()
-                return __import__("datetime").date(y, m, d)
-        except Exception:
-            pass
+    parsed = parse_date_string(deal.date)
+    if parsed is not None:
+        return parsed
     return (
         deal.created_at.date()
         if deal.created_at
@@ -294,6 +749,171 @@ def _parse_deal_date(deal):
     )
 
 
+def ledger_pair(debit_account, credit_account, amount, debit_desc, credit_desc):
+    """
+    دو ردیف دوطرفه (بدهکار ↔ بستانکار) با مبلغ یکسان برای post_ledger_entries.
+    ردیف‌ها در هنگام ثبت به‌عنوان counterpart یکدیگر لینک می‌شوند.
+    """
+    amount = Decimal(str(amount))
+    return [
+        {
+            "account": debit_account,
+            "debit": amount,
+            "credit": Decimal("0"),
+            "description": debit_desc,
+            "counterpart": 1,
+        },
+        {
+            "account": credit_account,
+            "debit": Decimal("0"),
+            "credit": amount,
+            "description": credit_desc,
+            "counterpart": -1,
+        },
+    ]
+
+
+def post_ledger_entries(trx, lines):
+    """
+    موتور ثبت دسته‌ای دفتر: اعتبارسنجی همه ردیف‌ها و تعادل تراکنش در حافظه،
+    درج همه ثبت‌ها با یک bulk_create، لینک counterpart ها با یک bulk_update و
+    به‌روزرسانی مانده‌های تجمیعی با تعداد ثابت کوئری (مستقل از تعداد ردیف‌ها).
+
+    lines: لیست دیکت با کلیدهای account, debit, credit, description و counterpart
+    (اختیاری؛ فاصله نسبی ردیف طرف مقابل در همین لیست، مثلاً 1 یا -1 مانند ledger_pair).
+    در صورت نامعتبر بودن ردیف‌ها یا عدم تعادل ValueError می‌دهد و چیزی ثبت نمی‌شود.
+    """
+    return post_ledger_batch([(trx, lines)])[0]
+
+
+def _build_entries(trx, lines):
+    entries = []
+    total_debit = Decimal("0")
+    total_credit = Decimal("0")
+    for line in lines:
+        debit = Decimal(str(line.get("debit") or 0))
+        credit = Decimal(str(line.get("credit") or 0))
+        if debit < 0 or credit < 0:
+            raise ValueError("مبلغ بدهکار/بستانکار نمی‌تواند منفی باشد.")
+        entry = AccountEntry(
+            transaction=trx,
+            date=trx.date,
+            account=line["account"],
+            debit=debit,
+            credit=credit,
+            description=line.get("description", "") or "",
+        )
+        try:
+            entry.clean()
+        except DjangoValidationError as e:
+            raise ValueError(e.messages[0] if e.messages else str(e))
+        entries.append(entry)
+        total_debit += debit
+        total_credit += credit
+    if not entries:
+        raise ValueError("تراکنش بدون ردیف قابل ثبت نیست.")
+    if total_debit != total_credit:
+        raise ValueError(
+            f"تراکنش متعادل نیست! بدهکار: {total_debit}, بستانکار: {total_credit}"
+        )
+    return entries
+
+
+def post_ledger_batch(batches):
+    """
+    نسخه چندتراکنشی post_ledger_entries: batches لیست (trx, lines) است.
+    ثبت‌های همه تراکنش‌ها با یک bulk_create درج و مانده‌ها با یک به‌روزرسانی تجمیعی
+    (و یک UPDATE عکس مانده به ازای هر تاریخ) اعمال می‌شوند. خروجی: لیست ثبت‌های هر تراکنش.
+    """
+    FiscalPeriod.check_open([trx.date for trx, _ in batches])
+    built = [(trx, lines, _build_entries(trx, lines)) for trx, lines in batches]
+
+    with db_transaction.atomic():
+        AccountBalance.ensure_rows(
+            {entry.account_id for _, _, entries in built for entry in entries}
+        )
+        AccountEntry.objects.bulk_create(
+            [entry for _, _, entries in built for entry in entries]
+        )
+        linked = []
+        for _, lines, entries in built:
+            for index, line in enumerate(lines):
+                offset = line.get("counterpart")
+                if offset:
+                    entries[index].counterpart_entry = entries[index + offset]
+                    linked.append(entries[index])
+        if linked:
+            AccountEntry.objects.bulk_update(linked, ["counterpart_entry"])
+
+        deltas = {}
+        deltas_by_date = defaultdict(dict)
+        for trx, _, entries in built:
+            for entry in entries:
+                for bucket in (deltas, deltas_by_date[trx.date]):
+                    debit, credit, count, last_id = bucket.get(
+                        entry.account_id, (Decimal("0"), Decimal("0"), 0, 0)
+                    )
+                    bucket[entry.account_id] = (
+                        debit + entry.debit,
+                        credit + entry.credit,
+                        count + 1,
+                        max(last_id, entry.id),
+                    )
+        AccountBalance.apply_deltas(deltas)
+        for date, date_deltas in deltas_by_date.items():
+            AccountBalanceSnapshot.apply_deltas(date, date_deltas)
+        invalidate_reports_on_commit(deltas_by_date)
+    return [entries for _, _, entries in built]
+
+
+def payment_ledger_lines(account, cash_account, amount, direction, description=""):
+    """
+    ردیف‌های دفتری یک پرداخت/دریافت (منطق ثبت در create_account_payment توضیح داده شده).
+    """
+    is_asset = account.account_type in (
+        Account.AccountType.ASSET,
+        Account.AccountType.EXPENSE,
+    )
+
+    # جهت ثبت از دید بنگاه
+    if direction == AccountPayment.Direction.RECEIVE:
+        if is_asset:
+            # دریافت از مشتری/سایرین: کاهش بستانکاری، افزایش نقد و بانک
+            return ledger_pair(
+                cash_account,
+                account,
+                amount,
+                description or "دریافت وجه از طرف حساب",
+                description or "تسویه/کاهش بستانکاری طرف حساب",
+            )
+        # دریافت از حساب بدهی (مثلاً وقتی طرف بدهی خود را بازمی‌گرداند)
+        return ledger_pair(
+            account,
+            cash_account,
+            amount,
+            description or "کاهش بدهی بنگاه به طرف حساب",
+            description or "دریافت وجه از طرف حساب",
+        )
+    # PAY
+    if is_asset:
+        # پرداخت به صاحب حساب دارایی: افزایش بستانکاری، کاهش نقد و بانک
+        return ledger_pair(
+            account,
+            cash_account,
+            amount,
+            description or "افزایش بستانکاری طرف حساب",
+            description or "پرداخت وجه به طرف حساب",
+        )
+    # پرداخت به حساب بدهی (پرداختنی به مشاور/مدیر/مشتری)
+    return ledger_pair(
+        account,
+        cash_account,
+        amount,
+        description or "تسویه بدهی به طرف حساب",
+        description or "پرداخت وجه به طرف حساب",
+    )
+
+
 def create_account_payment(
     *,
     document: AccountingDocument | None,
@@ -342,88 +962,10 @@ def create_account_payment(
             date=date,
         )
 
-        is_asset = account.account_type in (
-            Account.AccountType.ASSET,
-            Account.AccountType.EXPENSE,
+        lines = payment_ledger_lines(
+            account, cash_account, amount, direction, description
         )
-
-        def _link_counterpart(e1, e2):
-            e1.counterpart_entry = e2
-            e1.save(update_fields=["counterpart_entry"])
-            e2.counterpart_entry = e1
-            e2.save(update_fields=["counterpart_entry"])
-
-        # جهت ثبت از دید بنگاه
-        if direction == AccountPayment.Direction.RECEIVE:
-            if is_asset:
-                # دریافت از مشتری/سایرین: کاهش بستانکاری، افزایش نقد و بانک
-                e_cash = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=cash_account,
-                    debit=amount,
-                    credit=Decimal("0"),
-                    description=description or "دریافت وجه از طرف حساب",
-                )
-                e_acc = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=account,
-                    debit=Decimal("0"),
-                    credit=amount,
-                    description=description or "تسویه/کاهش بستانکاری طرف حساب",
-                )
-                _link_counterpart(e_cash, e_acc)
-            else:
-                # دریافت از حساب بدهی (مثلاً وقتی طرف بدهی خود را بازمی‌گرداند)
-                e_acc = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=account,
-                    debit=amount,
-                    credit=Decimal("0"),
-                    description=description or "کاهش بدهی بنگاه به طرف حساب",
-                )
-                e_cash = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=cash_account,
-                    debit=Decimal("0"),
-                    credit=amount,
-                    description=description or "دریافت وجه از طرف حساب",
-                )
-                _link_counterpart(e_acc, e_cash)
-        else:  # PAY
-            if is_asset:
-                # پرداخت به صاحب حساب دارایی: افزایش بستانکاری، کاهش نقد و بانک
-                e_acc = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=account,
-                    debit=amount,
-                    credit=Decimal("0"),
-                    description=description or "افزایش بستانکاری طرف حساب",
-                )
-                e_cash = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=cash_account,
-                    debit=Decimal("0"),
-                    credit=amount,
-                    description=description or "پرداخت وجه به طرف حساب",
-                )
-                _link_counterpart(e_acc, e_cash)
-            else:
-                # پرداخت به حساب بدهی (پرداختنی به مشاور/مدیر/مشتری)
-                e_acc = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=account,
-                    debit=amount,
-                    credit=Decimal("0"),
-                    description=description or "تسویه بدهی به طرف حساب",
-                )
-                e_cash = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=cash_account,
-                    debit=Decimal("0"),
-                    credit=amount,
-                    description=description or "پرداخت وجه به طرف حساب",
-                )
-                _link_counterpart(e_acc, e_cash)
+        post_ledger_entries(trx, lines)
 
         payment = AccountPayment.objects.create(
             document=document,
@@ -440,10 +982,164 @@ def create_account_payment(
         if receipt_file:
             payment.receipt_file = receipt_file
             payment.save(update_fields=["receipt_file"])
+        DealLedgerSummary.apply_payment(payment.deal_id, account.id, direction, amount)
 
         return payment
 
 
+def create_account_payments_bulk(payments, user=None):
+    """
+    ثبت دسته‌ای چند پرداخت/دریافت با همان منطق create_account_payment در یک تراکنش DB:
+    تراکنش‌ها، ثبت‌ها و پرداخت‌ها هر کدام با یک bulk_create درج می‌شوند و مانده‌ها و
+    خلاصه دفتر معاملات به‌صورت تجمیعی به‌روز می‌شوند.
+
+    payments: لیست دیکت با کلیدهای document, account, amount (Decimal مثبت)،
+    direction (AccountPayment.Direction), date و اختیاری method, description و receipt_file.
+    """
+    if not payments:
+        return []
+    cash_account = setup_chart_of_accounts()["cash_bank"]
+
+    with db_transaction.atomic():
+        trxs = AccountingTransaction.objects.bulk_create(
+            [
+                AccountingTransaction(
+                    description=p.get("description")
+                    or f"{p['direction'].label} بابت حساب {p['account'].name}",
+                    date=p["date"],
+                )
+                for p in payments
+            ]
+        )
+        post_ledger_batch(
+            [
+                (
+                    trx,
+                    payment_ledger_lines(
+                        p["account"],
+                        cash_account,
+                        p["amount"],
+                        p["direction"],
+                        p.get("description", ""),
+                    ),
+                )
+                for trx, p in zip(trxs, payments)
+            ]
+        )
+        created = AccountPayment.objects.bulk_create(
+            [
+                AccountPayment(
+                    document=p["document"],
+                    deal_id=p["document"].deal_id if p["document"] else None,
+                    account=p["account"],
+                    transaction=trx,
+                    direction=p["direction"],
+                    amount=p["amount"],
+                    date=p["date"],
+                    method=p.get("method") or "",
+                    description=p.get("description") or "",
+                    receipt_file=p.get("receipt_file"),
+                    created_by=user,
+                )
+                for trx, p in zip(trxs, payments)
+            ]
+        )
+
+        settled = defaultdict(Decimal)
+        for payment in created:
+            if payment.deal_id:
+                settled[
+                    (payment.deal_id, payment.account_id, payment.direction)
+                ] += payment.amount
+        for (deal_id, account_id, direction), amount in settled.items():
+            DealLedgerSummary.apply_payment(deal_id, account_id, direction, amount)
+    return created
+
+
+def review_pending_payments(deal, pending_ids, *, approve, user, reason=""):
+    """
+    تایید یا رد دسته‌ای تراکنش‌های پیشنهادی مشاور در یک معامله.
+    ردیف‌های در انتظار قفل می‌شوند تا دو بررسی هم‌زمان یک تراکنش را دو بار اعمال نکنند.
+    در تایید، مانده همه حساب‌های درگیر یک‌جا (به ترتیب ثبت پیشنهادها) بررسی و همه
+    پیشنهادهای معتبر با یک ثبت دسته‌ای در دفتر اعمال می‌شوند؛ بقیه با پیام خطا برمی‌گردند.
+    برمی‌گرداند {"reviewed": [id ها], "errors": [{"id", "message"}]}.
+    """
+    pending_ids = list(dict.fromkeys(pending_ids))
+    now = timezone.now()
+    with db_transaction.atomic():
+        pendings = list(
+            PendingDealPayment.objects.select_for_update(of=("self",))
+            .select_related("account")
+            .filter(
+                deal=deal,
+                id__in=pending_ids,
+                status=PendingDealPayment.Status.PENDING,
+            )
+            .order_by("created_at", "id")
+        )
+        found = {p.id for p in pendings}
+        errors = [
+            {"id": pid, "message": "تراکنش یافت نشد یا قبلاً بررسی شده است."}
+            for pid in pending_ids
+            if pid not in found
+        ]
+
+        if not approve:
+            PendingDealPayment.objects.filter(id__in=found).update(
+                status=PendingDealPayment.Status.REJECTED,
+                reviewed_by=user,
+                reviewed_at=now,
+                rejection_reason=(reason or "")[:2000],
+            )
+            return {"reviewed": [p.id for p in pendings], "errors": errors}
+
+        if not pendings:
+            return {"reviewed": [], "errors": errors}
+        document = AccountingDocument.objects.filter(
+            deal=deal, doc_type=AccountingDocument.DocType.COMMISSION
+        ).first()
+        if document is None:
+            raise ValueError("سند حسابداری این معامله یافت نشد.")
+        accepted, rejected = check_settleable_batch(
+            [
+                (
+                    pending,
+                    {
+                        "document": document,
+                        "account": pending.account,
+                        "amount": pending.amount,
+                        "direction": AccountPayment.Direction(pending.direction),
+                        "date": pending.date,
+                        "method": pending.method or "",
+                        "description": pending.description or "",
+                        "receipt_file": pending.receipt_file or None,
+                    },
+                )
+                for pending in pendings
+            ],
+            lock=True,
+        )
+        errors.extend(
+            {"id": pending.id, "message": message} for pending, message in rejected
+        )
+        payments = create_account_payments_bulk(
+            [payment for _, payment in accepted], user=user
+        )
+        approved = []
+        for (pending, _), payment in zip(accepted, payments):
+            pending.status = PendingDealPayment.Status.APPROVED
+            pending.reviewed_by = user
+            pending.reviewed_at = now
+            pending.account_payment = payment
+            approved.append(pending)
+        if approved:
+            PendingDealPayment.objects.bulk_update(
+                approved, ["status", "reviewed_by", "reviewed_at", "account_payment"]
+            )
+    errors.sort(key=lambda error: pending_ids.index(error["id"]))
+    return {"reviewed": [p.id for p in approved], "errors": errors}
+
+
 def create_deal_ledger_entry(deal):
     """
     ثبت سند حسابداری معامله: درآمد کمیسیون از مشتریان، تسهیم به مشاوران و مدیر دفتر.
@@ -471,107 +1167,110 @@ def create_deal_ledger_entry(deal):
             date=trx_date,
         )
 
+        lines = []
         client_commissions = (
             DealClientCommission.objects.filter(deal=deal, amount__gt=0)
             .select_related("client")
             .order_by("id")
         )
+        splits = list(deal.splits.select_related("consultant"))
+        manager_splits = [s for s in splits if s.role == "manager"]
+        total_manager_amount = sum(Decimal(str(s.amount or 0)) for s in manager_splits)
+
+        # همه زیرحساب‌های لازم (مشتریان، مشاوران، مدیر) با یک فراخوانی دسته‌ای
+        client_commissions = list(client_commissions)
+        person_accounts = ensure_accounts_for(
+            clients=[cc.client for cc in client_commissions],
+            consultants=[
+                s.consultant
+                for s in splits
+                if s.role == "consultant" and s.consultant and s.amount and s.amount > 0
+            ],
+            office_managers=(
+                [deal.office] if deal.office and total_manager_amount > 0 else []
+            ),
+        )
+
         for cc in client_commissions:
-            client_acc = ensure_client_account(cc.client)
-            amount = Decimal(str(cc.amount))
+            client_acc = person_accounts[("client_receivable", cc.client_id)]
             role_label = (
                 "خریدار"
                 if cc.role == DealClientCommission.ClientRole.BUYER
                 else "فروشنده"
             )
             # بدهکار: حساب بستانکاری مشتری (طلب بنگاه از مشتری)
-            entry_receivable = AccountEntry.objects.create(
-                transaction=trx,
-                account=client_acc,
-                debit=amount,
-                credit=Decimal("0"),
-                description=f"کمیسیون مشتری {cc.client.name} ({role_label})",
-            )
             # بستانکار: درآمد کمیسیون بنگاه (طرف مقابل همان طلب مشتری)
-            entry_revenue = AccountEntry.objects.create(
-                transaction=trx,
-                account=revenue_account,
-                debit=Decimal("0"),
-                credit=amount,
-                description=f"درآمد کمیسیون از مشتری {cc.client.name} ({role_label})",
+            lines += ledger_pair(
+                client_acc,
+                revenue_account,
+                cc.amount,
+                f"کمیسیون مشتری {cc.client.name} ({role_label})",
+                f"درآمد کمیسیون از مشتری {cc.client.name} ({role_label})",
             )
-            entry_receivable.counterpart_entry = entry_revenue
-            entry_receivable.save(update_fields=["counterpart_entry"])
-            entry_revenue.counterpart_entry = entry_receivable
-            entry_revenue.save(update_fields=["counterpart_entry"])
 
         # ثبت تسهیم مشاوران
-        consultant_splits = deal.splits.filter(role="consultant")
         expense_consultant = base_accounts["expense_consultant_share"]
-        for split in consultant_splits:
+        for split in splits:
+            if split.role != "consultant":
+                continue
             if split.consultant and split.amount and split.amount > 0:
-                payable_acc, receivable_acc = ensure_consultant_accounts(
-                    split.consultant
-                )
-                amount = Decimal(str(split.amount))
+                payable_acc = person_accounts[
+                    ("consultant_payable", split.consultant_id)
+                ]
                 # بدهکار: هزینه سهم مشاور
-                entry_expense = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=expense_consultant,
-                    debit=amount,
-                    credit=Decimal("0"),
-                    description=f"هزینه سهم مشاور {split.consultant.name}",
-                )
                 # بستانکار: پرداختنی به مشاور (طرف مقابل همان هزینه)
-                entry_payable = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=payable_acc,
-                    debit=Decimal("0"),
-                    credit=amount,
-                    description=f"سهم مشاور {split.consultant.name} (طبق توافق)",
+                lines += ledger_pair(
+                    expense_consultant,
+                    payable_acc,
+                    split.amount,
+                    f"هزینه سهم مشاور {split.consultant.name}",
+                    f"سهم مشاور {split.consultant.name} (طبق توافق)",
                 )
-                entry_expense.counterpart_entry = entry_payable
-                entry_expense.save(update_fields=["counterpart_entry"])
-                entry_payable.counterpart_entry = entry_expense
-                entry_payable.save(update_fields=["counterpart_entry"])
 
         # ثبت تسهیم مدیر دفتر
-        manager_splits = deal.splits.filter(role="manager")
-        if manager_splits.exists() and deal.office:
-            _, manager_payable_acc = ensure_office_manager_accounts(deal.office)
-            expense_manager = base_accounts["expense_manager_share"]
-            total_manager_amount = sum(
-                Decimal(str(s.amount or 0)) for s in manager_splits
-            )
+        if manager_splits and deal.office:
             if total_manager_amount > 0:
+                manager_payable_acc = person_accounts[
+                    ("manager_payable", deal.office_id)
+                ]
                 # بدهکار: هزینه سهم مدیر
-                entry_expense_mgr = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=expense_manager,
-                    debit=total_manager_amount,
-                    credit=Decimal("0"),
-                    description=f"هزینه سهم مدیر دفتر - معامله {deal.id}",
-                )
                 # بستانکار: پرداختنی به مدیر (طرف مقابل همان هزینه)
-                entry_payable_mgr = AccountEntry.objects.create(
-                    transaction=trx,
-                    account=manager_payable_acc,
-                    debit=Decimal("0"),
-                    credit=total_manager_amount,
-                    description=f"سهم مدیر دفتر - معامله {deal.id}",
+                lines += ledger_pair(
+                    base_accounts["expense_manager_share"],
+                    manager_payable_acc,
+                    total_manager_amount,
+                    f"هزینه سهم مدیر دفتر - معامله {deal.id}",
+                    f"سهم مدیر دفتر - معامله {deal.id}",
                 )
-                entry_expense_mgr.counterpart_entry = entry_payable_mgr
-                entry_expense_mgr.save(update_fields=["counterpart_entry"])
-                entry_payable_mgr.counterpart_entry = entry_expense_mgr
-                entry_payable_mgr.save(update_fields=["counterpart_entry"])
 
-        # بررسی تعادل تراکنش
-        if not trx.is_balanced():
+        # قید سند کمیسیون: جمع طلب از مشتریان باید دقیقاً معادل درآمد کمیسیون باشد
+        client_debit = sum(
+            (
+                line["debit"]
+                for line in lines
+                if line["account"].category == Account.AccountCategory.RECEIVABLE_CLIENT
+            ),
+            Decimal("0"),
+        )
+        revenue_credit = sum(
+            (
+                line["credit"]
+                for line in lines
+                if line["account"].id == revenue_account.id
+            ),
+            Decimal("0"),
+        )
+        if client_debit != revenue_credit:
             raise ValueError(
-                f"تراکنش متعادل نیست! بدهکار: {trx.get_total_debit()}, "
-                f"بستانکار: {trx.get_total_credit()}"
+                "درآمد کمیسیون با طلب از مشتریان برابر نیست! "
+                f"طلب مشتریان: {client_debit}, درآمد: {revenue_credit}"
             )
 
+        # اعتبارسنجی تعادل و ثبت دسته‌ای همه ردیف‌ها
+        if lines:
+            entries = post_ledger_entries(trx, lines)
+            DealLedgerSummary.add_entries(deal.id, entries)
+
         # ایجاد DealFinance
         DealFinance.objects.create(deal=deal, income_transaction=trx)
 
@@ -583,37 +1282,46 @@ def create_deal_ledger_entry(deal):
             description=trx.description,
             transaction=trx,
             deal=deal,
+            office=deal.office,
         )
 
     return trx
 
 
-def get_next_doc_number(doc_type):
-    """شماره سند بعدی برای نوع داده‌شده (مثلاً رو-۱، در-۲، پا-۳)."""
-    prefix = {
-        AccountingDocument.DocType.JOURNAL: "رو",
-        AccountingDocument.DocType.RECEIPT: "در",
-        AccountingDocument.DocType.PAYMENT: "پا",
-        AccountingDocument.DocType.TRANSFER: "ان",
-        AccountingDocument.DocType.OTHER: "مت",
-    }.get(doc_type, "سند")
-    from django.db.models import Max
+DOC_NUMBER_PREFIXES = {
+    AccountingDocument.DocType.JOURNAL: "رو",
+    AccountingDocument.DocType.RECEIPT: "در",
+    AccountingDocument.DocType.PAYMENT: "پا",
+    AccountingDocument.DocType.TRANSFER: "ان",
+    AccountingDocument.DocType.CLOSING: "بس",
+    AccountingDocument.DocType.OTHER: "مت",
+}
 
-    last = (
-        AccountingDocument.objects.filter(
-            doc_type=doc_type, number__startswith=f"{prefix}-"
-        )
-        .aggregate(max_id=Max("id"))
-        .get("max_id")
-    )
-    seq = (last or 0) + 1
-    return f"{prefix}-{seq}"
+
+def jalali_fiscal_year(date):
+    """سال مالی (سال شمسی) یک تاریخ میلادی."""
+    from jdatetime import date as jdate
+
+    return jdate.fromgregorian(date=date).year
+
+
+def get_next_doc_number(doc_type, date=None, office=None):
+    """
+    شماره سند بعدی برای نوع داده‌شده در سال مالی تاریخ سند و بنگاه (مثلاً در-۱۴۰۳-۱۵).
+    شماره از DocumentSequence با قفل ردیف گرفته می‌شود؛ باید در همان تراکنشی صدا زده شود
+    که سند را می‌سازد تا با rollback سند، شماره هم آزاد شود و فاصله‌ای ایجاد نشود.
+    """
+    prefix = DOC_NUMBER_PREFIXES.get(doc_type, "سند")
+    fiscal_year = jalali_fiscal_year(date or date_type.today())
+    seq = DocumentSequence.next_number(doc_type, office, fiscal_year)
+    return f"{prefix}-{fiscal_year}-{seq}"
 
 
-def create_journal_document(date, description, rows):
+def create_journal_document(date, description, rows, office=None):
     """
     ثبت سند روزنامه دستی.
     rows: لیست دیکت با کلیدهای account, debit, credit, description.
+    office: بنگاه سند؛ شماره سند از شمارنده همین بنگاه گرفته می‌شود.
     برمی‌گرداند (transaction, document).
     """
     total_debit = sum(r["debit"] for r in rows)
@@ -627,15 +1335,10 @@ def create_journal_document(date, description, rows):
             description=description or "سند روزنامه دستی",
             date=date,
         )
-        for r in rows:
-            AccountEntry.objects.create(
-                transaction=trx,
-                account=r["account"],
-                debit=r["debit"],
-                credit=r["credit"],
-                description=r.get("description", ""),
-            )
-        number = get_next_doc_number(AccountingDocument.DocType.JOURNAL)
+        post_ledger_entries(trx, rows)
+        number = get_next_doc_number(
+            AccountingDocument.DocType.JOURNAL, date=date, office=office
+        )
         doc = AccountingDocument.objects.create(
             doc_type=AccountingDocument.DocType.JOURNAL,
             number=number,
@@ -643,6 +1346,7 @@ def create_journal_document(date, description, rows):
             description=description or "",
             transaction=trx,
             deal=None,
+            office=office,
         )
     return trx, doc
 
@@ -654,11 +1358,11 @@ def create_receipt_document(
     ایجاد سند دریافت (دریافت از طرف حساب به نقد و بانک).
     برمی‌گرداند (payment, document).
     """
-    from .utils import setup_chart_of_accounts
-
-    setup_chart_of_accounts()
-    number = get_next_doc_number(AccountingDocument.DocType.RECEIPT)
     with db_transaction.atomic():
+        office = getattr(user, "office", None)
+        number = get_next_doc_number(
+            AccountingDocument.DocType.RECEIPT, date=date, office=office
+        )
         doc = AccountingDocument.objects.create(
             doc_type=AccountingDocument.DocType.RECEIPT,
             number=number,
@@ -666,6 +1370,7 @@ def create_receipt_document(
             description=description or f"دریافت از {account.name}",
             transaction=None,
             deal=None,
+            office=office,
         )
         payment = create_account_payment(
             document=doc,
@@ -690,11 +1395,11 @@ def create_payment_document(
     ایجاد سند پرداخت (پرداخت از نقد و بانک به طرف حساب).
     برمی‌گرداند (payment, document).
     """
-    from .utils import setup_chart_of_accounts
-
-    setup_chart_of_accounts()
-    number = get_next_doc_number(AccountingDocument.DocType.PAYMENT)
     with db_transaction.atomic():
+        office = getattr(user, "office", None)
+        number = get_next_doc_number(
+            AccountingDocument.DocType.PAYMENT, date=date, office=office
+        )
         doc = AccountingDocument.objects.create(
             doc_type=AccountingDocument.DocType.PAYMENT,
             number=number,
@@ -702,6 +1407,7 @@ def create_payment_document(
             description=description or f"پرداخت به {account.name}",
             transaction=None,
             deal=None,
+            office=office,
         )
         payment = create_account_payment(
             document=doc,
@@ -0,0 +1,134 @@
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_migrate,
+)
+from django.dispatch import receiver
+
+from .models import (
+    Account,
+    AccountBalance,
+    AccountBalanceSnapshot,
+    AccountEntry,
+    AccountPayment,
+    AccountTreePath,
+    DealFinance,
+    DealLedgerSummary,
+    FiscalPeriod,
+)
+from .reports import invalidate_reports_on_commit
+from .utils import (
+    BASE_ACCOUNT_CODES,
+    bootstrap_chart_of_accounts,
+    forget_cached_account,
+    invalidate_chart_of_accounts,
+)
+
+
+@receiver(pre_delete, sender=AccountEntry)
+def remember_entry_date(sender, instance, **kwargs):
+    """
+    تاریخ تراکنش ثبت (و معامله‌ای که سند کمیسیونش است) پیش از حذف نگه داشته می‌شود؛
+    در حذف آبشاری، تراکنش والد بعد از این مرحله حذف می‌شود و دیگر قابل خواندن نیست.
+    ردیف مانده حساب هم اگر نباشد پیش از حذف از ثبت‌های موجود ساخته می‌شود.
+    حذف ثبت دوره بسته (مستقیم یا آبشاری با حذف تراکنش) با ValueError رد می‌شود.
+    """
+    FiscalPeriod.check_open([instance.date])
+    instance._ledger_date = instance.date
+    AccountBalance.ensure_rows([instance.account_id])
+    instance._ledger_deal_id = (
+        DealFinance.objects.filter(income_transaction_id=instance.transaction_id)
+        .values_list("deal_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=AccountEntry)
+def invalidate_reports_on_entry_save(sender, instance, **kwargs):
+    """
+    تغییر یک ثبت کش گزارش‌های مالی دوره آن را پس از commit باطل می‌کند؛ تاریخ‌های همه
+    ثبت‌های یک تراکنش جمع و یک بار باطل می‌شوند.
+    """
+    invalidate_reports_on_commit([instance.date])
+
+
+@receiver(post_delete, sender=AccountEntry)
+def remove_entry_from_balance(sender, instance, **kwargs):
+    """
+    کسر ثبت حذف‌شده از مانده تجمیعی حساب.
+    حذف آبشاری (مثلاً با حذف AccountingTransaction) هم از همین مسیر عبور می‌کند.
+    """
+    AccountBalance.apply_delta(
+        instance.account_id, -instance.debit, -instance.credit, -1
+    )
+    AccountBalanceSnapshot.apply_delta(
+        instance.account_id,
+        getattr(instance, "_ledger_date", None),
+        -instance.debit,
+        -instance.credit,
+        -1,
+    )
+    deal_id = getattr(instance, "_ledger_deal_id", None)
+    if deal_id:
+        DealLedgerSummary.remove_entry(deal_id, instance)
+    invalidate_reports_on_commit([getattr(instance, "_ledger_date", None)])
+    # اگر آخرین ثبت حساب حذف شده باشد، شناسه آخرین ثبت دوباره محاسبه می‌شود
+    if AccountBalance.objects.filter(
+        account_id=instance.account_id, last_entry_id=instance.pk
+    ).exists():
+        AccountBalance.objects.filter(account_id=instance.account_id).update(
+            last_entry_id=AccountEntry.objects.filter(
+                account_id=instance.account_id
+            ).aggregate(m=Max("id"))["m"]
+        )
+
+
+@receiver(post_delete, sender=AccountPayment)
+def remove_payment_from_deal_summary(sender, instance, **kwargs):
+    """کسر پرداخت/دریافت حذف‌شده از تسویه‌های خلاصه دفتر معامله."""
+    DealLedgerSummary.apply_payment(
+        instance.deal_id, instance.account_id, instance.direction, -instance.amount
+    )
+
+
+@receiver(pre_delete, sender=Account)
+def detach_account_subtree(sender, instance, **kwargs):
+    """
+    پیش از حذف حساب، زیرحساب‌ها از اجداد آن جدا می‌شوند؛ چون parent آن‌ها SET_NULL
+    می‌شود و خودشان ریشه درخت جدید خواهند بود.
+    """
+    AccountTreePath.detach_subtree(instance.pk)
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_cached_chart(sender, instance, **kwargs):
+    """تغییر یک حساب کش نمودار حساب‌ها یا کش زیرحساب‌های اشخاص را باطل می‌کند."""
+    if instance.code in BASE_ACCOUNT_CODES:
+        invalidate_chart_of_accounts()
+    else:
+        forget_cached_account(instance.code)
+
+
+@receiver(pre_migrate)
+def create_cache_table(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    جدول کش مشترک (DatabaseCache در settings) پیش از migrationهای finance ساخته می‌شود؛
+    ساخت نمودار حساب‌ها پس از migrate از کش استفاده می‌کند. اگر جدول باشد کاری نمی‌کند.
+    """
+    if getattr(sender, "name", None) != "finance":
+        return
+    call_command("createcachetable", database=using, verbosity=0)
+
+
+@receiver(post_migrate)
+def create_base_chart_of_accounts(sender, **kwargs):
+    """ساخت حساب‌های پایه یک بار پس از migrate تا در مسیر درخواست‌ها ساخته نشوند."""
+    if getattr(sender, "name", None) != "finance":
+        return
+    bootstrap_chart_of_accounts()
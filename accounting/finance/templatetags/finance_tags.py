@@ -7,6 +7,7 @@ from datetime import datetime as datetime_type
 
 from django import template
 from django.utils import timezone
+from transactions.normalization import fold_digits
 
 register = template.Library()
 
@@ -40,20 +41,7 @@ def _to_jdate(value, as_datetime=False):
         return jdate.fromgregorian(year=value.year, month=value.month, day=value.day)
     if isinstance(value, str) and value.strip():
         # رشته‌های عددی شمسی مثل 1403/05/15 یا ۱۴۰۳/۰۵/۱۵
-        parts = (
-            value.replace("۰", "0")
-            .replace("۱", "1")
-            .replace("۲", "2")
-            .replace("۳", "3")
-            .replace("۴", "4")
-            .replace("۵", "5")
-            .replace("۶", "6")
-            .replace("۷", "7")
-            .replace("۸", "8")
-            .replace("۹", "9")
-            .replace("/", "-")
-            .split("-")
-        )
+        parts = fold_digits(value).replace("/", "-").split("-")
         if len(parts) >= 3:
             try:
                 y, m, d = int(parts[0]), int(parts[1]), int(parts[2])
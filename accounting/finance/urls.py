@@ -10,6 +10,11 @@ urlpatterns = [
         views.OfficeFinanceView.as_view(),
         name="office-finance",
     ),
+    path(
+        "reports/",
+        views.FinancialReportsView.as_view(),
+        name="financial-reports",
+    ),
     path(
         "documents/",
         views.AccountingDocumentsListView.as_view(),
@@ -25,6 +30,11 @@ urlpatterns = [
         views.AccountLedgerView.as_view(),
         name="account-ledger",
     ),
+    path(
+        "account/<int:account_id>/ledger/api/",
+        views.AccountLedgerApiView.as_view(),
+        name="account-ledger-api",
+    ),
     path(
         "journal/create/",
         views.JournalEntryCreateView.as_view(),
@@ -62,6 +72,16 @@ urlpatterns = [
         views.RejectPendingDealPaymentView.as_view(),
         name="pending-deal-payment-reject",
     ),
+    path(
+        "deal/<int:deal_id>/pending/review/",
+        views.ReviewPendingDealPaymentsView.as_view(),
+        name="pending-deal-payments-review",
+    ),
+    path(
+        "payments/import/",
+        views.BulkPaymentImportView.as_view(),
+        name="payment-import",
+    ),
     path(
         "receipt/<int:payment_id>/",
         views.ServePaymentReceiptView.as_view(),
@@ -1,4 +1,9 @@
-from .models import Account
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+
+from .models import Account, AccountTreePath
 
 
 def _get_or_create_account(code, name, parent, account_type, category):
@@ -15,192 +20,377 @@ def _get_or_create_account(code, name, parent, account_type, category):
     return acc
 
 
+# حساب‌های اصلی (ریشه): (کد، نام، نوع)
+_ROOT_ACCOUNTS = [
+    ("1", "دارایی‌ها", Account.AccountType.ASSET),
+    ("2", "بدهی‌ها", Account.AccountType.LIABILITY),
+    ("4", "درآمدها", Account.AccountType.INCOME),
+    ("5", "هزینه‌ها", Account.AccountType.EXPENSE),
+]
+
+# سود (زیان) انباشته: مقصد سند بستن حساب‌های درآمد و هزینه در پایان سال مالی
+RETAINED_EARNINGS_CODE = "210601"
+
+# حساب‌های تفصیلی: (کلید، کد، نام، کد والد، نوع، دسته)
+_BASE_ACCOUNTS = [
+    (
+        "cash_bank",
+        "110101",
+        "نقد و بانک",
+        "1",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.CASH_BANK,
+    ),
+    (
+        "receivables_commission",
+        "110201",
+        "بستانکاری کمیسیون از مشتریان",
+        "1",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_CLIENT,
+    ),
+    (
+        "receivables_consultant",
+        "110302",
+        "بستانکاری از مشاوران",
+        "1",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_CONSULTANT,
+    ),
+    (
+        "receivables_office",
+        "110403",
+        "بستانکاری از بنگاه",
+        "1",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_OFFICE,
+    ),
+    (
+        "receivables_manager",
+        "110504",
+        "بستانکاری از مدیر بنگاه",
+        "1",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_MANAGER,
+    ),
+    (
+        "payables_consultant",
+        "210101",
+        "طلبکاری به مشاوران",
+        "2",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_CONSULTANT,
+    ),
+    (
+        "payables_persons",
+        "210201",
+        "حساب‌های جاری/دفتری اشخاص",
+        "2",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.OTHER,
+    ),
+    (
+        "payables_clients",
+        "210301",
+        "طلبکاری به مشتریان",
+        "2",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_CLIENT,
+    ),
+    (
+        "payables_offices",
+        "210401",
+        "طلبکاری به بنگاه",
+        "2",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_OFFICE,
+    ),
+    (
+        "payables_managers",
+        "210501",
+        "طلبکاری به مدیر بنگاه",
+        "2",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_MANAGER,
+    ),
+    (
+        "retained_earnings",
+        RETAINED_EARNINGS_CODE,
+        "سود (زیان) انباشته",
+        "2",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.OTHER,
+    ),
+    (
+        "revenue_commission",
+        "410101",
+        "درآمد کمیسیون",
+        "4",
+        Account.AccountType.INCOME,
+        Account.AccountCategory.REVENUE_COMMISSION,
+    ),
+    (
+        "expense_consultant_share",
+        "510101",
+        "هزینه سهم مشاور",
+        "5",
+        Account.AccountType.EXPENSE,
+        Account.AccountCategory.EXPENSE_CONSULTANT_SHARE,
+    ),
+    (
+        "expense_manager_share",
+        "510201",
+        "هزینه سهم مدیر",
+        "5",
+        Account.AccountType.EXPENSE,
+        Account.AccountCategory.EXPENSE_MANAGER_SHARE,
+    ),
+]
+
+BASE_ACCOUNT_CODES = frozenset(
+    [code for code, _, _ in _ROOT_ACCOUNTS] + [row[1] for row in _BASE_ACCOUNTS]
+)
+
+# کش درون‌پردازه‌ای حساب‌های پایه؛ نسخه آن در کش جنگو نگه داشته می‌شود تا با تغییر
+# هر حساب پایه (در هر پردازه‌ای که کش مشترک دارد) باطل شود.
+CHART_VERSION_CACHE_KEY = "finance:chart_of_accounts:version"
+_chart_cache = {"version": None, "accounts": None}
+
+
+def invalidate_chart_of_accounts():
+    """باطل کردن کش حساب‌های پایه (پس از ذخیره/حذف یکی از حساب‌های پایه)."""
+    _chart_cache["version"] = None
+    _chart_cache["accounts"] = None
+    cache.set(CHART_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def bootstrap_chart_of_accounts():
+    """
+    ایجاد نمودار حساب‌های پایه بر اساس ساختار تعریف شده (get_or_create برای هر حساب).
+    یک بار هنگام migrate/استقرار اجرا می‌شود؛ در مسیر عادی درخواست‌ها setup_chart_of_accounts
+    از کش استفاده می‌کند.
+    """
+    roots = {}
+    for code, name, acc_type in _ROOT_ACCOUNTS:
+        roots[code], _ = Account.objects.get_or_create(
+            code=code,
+            defaults={
+                "name": name,
+                "account_type": acc_type,
+                "category": Account.AccountCategory.OTHER,
+            },
+        )
+    created = {}
+    for key, code, name, parent_code, acc_type, category in _BASE_ACCOUNTS:
+        created[key] = _get_or_create_account(
+            code, name, roots[parent_code], acc_type, category
+        )
+    return created
+
+
 def setup_chart_of_accounts():
     """
-    ایجاد نمودار حساب‌های پایه بر اساس ساختار تعریف شده.
+    نمودار حساب‌های پایه (دیکت کلید → حساب).
     پشتیبانی از بستانکاری و طلبکاری برای مشتریان، مشاوران، بنگاه و مدیر بنگاه.
+    پس از اولین فراخوانی از کش درون‌پردازه‌ای برگردانده می‌شود.
     """
-    # حساب‌های اصلی (ریشه)
-    assets, _ = Account.objects.get_or_create(
-        code="1",
-        defaults={
-            "name": "دارایی‌ها",
-            "account_type": Account.AccountType.ASSET,
-            "category": Account.AccountCategory.OTHER,
-        },
-    )
-    liabilities, _ = Account.objects.get_or_create(
-        code="2",
-        defaults={
-            "name": "بدهی‌ها",
-            "account_type": Account.AccountType.LIABILITY,
-            "category": Account.AccountCategory.OTHER,
-        },
-    )
-    income, _ = Account.objects.get_or_create(
-        code="4",
-        defaults={
-            "name": "درآمدها",
-            "account_type": Account.AccountType.INCOME,
-            "category": Account.AccountCategory.OTHER,
-        },
-    )
-    expenses, _ = Account.objects.get_or_create(
-        code="5",
-        defaults={
-            "name": "هزینه‌ها",
-            "account_type": Account.AccountType.EXPENSE,
-            "category": Account.AccountCategory.OTHER,
-        },
-    )
+    version = cache.get(CHART_VERSION_CACHE_KEY)
+    if version is not None and _chart_cache["version"] == version:
+        return dict(_chart_cache["accounts"])
+
+    by_code = {
+        acc.code: acc
+        for acc in Account.objects.filter(code__in=[row[1] for row in _BASE_ACCOUNTS])
+    }
+    if len(by_code) < len(_BASE_ACCOUNTS):
+        # حساب‌های پایه هنوز ساخته نشده‌اند؛ ساخت آن‌ها بدون کش کردن (ممکن است
+        # تراکنش جاری rollback شود).
+        return bootstrap_chart_of_accounts()
+
+    accounts = {row[0]: by_code[row[1]] for row in _BASE_ACCOUNTS}
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(CHART_VERSION_CACHE_KEY, version, None)
+    _chart_cache["version"] = version
+    _chart_cache["accounts"] = accounts
+    return dict(accounts)
+
+
+# زیرحساب‌های اشخاص: نوع → (پیشوند کد، کلید حساب والد، قالب نام، نوع، دسته)
+PERSON_ACCOUNT_KINDS = {
+    "client_receivable": (
+        "12",
+        "receivables_commission",
+        "{name} (مشتری)",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_CLIENT,
+    ),
+    "client_payable": (
+        "23",
+        "payables_clients",
+        "{name} - پرداختنی",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_CLIENT,
+    ),
+    "consultant_payable": (
+        "22",
+        "payables_consultant",
+        "{name} - پرداختنی",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_CONSULTANT,
+    ),
+    "consultant_receivable": (
+        "32",
+        "receivables_consultant",
+        "{name} - بستانکاری",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_CONSULTANT,
+    ),
+    "office_receivable": (
+        "14",
+        "receivables_office",
+        "{name} - بستانکاری",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_OFFICE,
+    ),
+    "office_payable": (
+        "24",
+        "payables_offices",
+        "{name} - پرداختنی",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_OFFICE,
+    ),
+    "manager_receivable": (
+        "15",
+        "receivables_manager",
+        "مدیر - {name} - بستانکاری",
+        Account.AccountType.ASSET,
+        Account.AccountCategory.RECEIVABLE_MANAGER,
+    ),
+    "manager_payable": (
+        "25",
+        "payables_managers",
+        "مدیر - {name} - پرداختنی",
+        Account.AccountType.LIABILITY,
+        Account.AccountCategory.PAYABLE_MANAGER,
+    ),
+}
+
+# کش درون‌پردازه‌ای کد → زیرحساب شخص. فقط حساب‌هایی که در دیتابیس commit شده‌اند
+# نگه داشته می‌شوند و با ذخیره/حذف حساب (سیگنال) از کش خارج می‌شوند.
+PERSON_ACCOUNT_CACHE_SIZE = 20000
+_person_account_cache = {}
+
 
-    # حساب‌های تفصیلی: (کد، نام، والد، نوع، دسته)
-    sub_accounts = [
-        (
-            "110101",
-            "نقد و بانک",
-            assets,
-            Account.AccountType.ASSET,
-            Account.AccountCategory.CASH_BANK,
-        ),
-        (
-            "110201",
-            "بستانکاری کمیسیون از مشتریان",
-            assets,
-            Account.AccountType.ASSET,
-            Account.AccountCategory.RECEIVABLE_CLIENT,
-        ),
-        (
-            "110302",
-            "بستانکاری از مشاوران",
-            assets,
-            Account.AccountType.ASSET,
-            Account.AccountCategory.RECEIVABLE_CONSULTANT,
-        ),
-        (
-            "110403",
-            "بستانکاری از بنگاه",
-            assets,
-            Account.AccountType.ASSET,
-            Account.AccountCategory.RECEIVABLE_OFFICE,
-        ),
-        (
-            "110504",
-            "بستانکاری از مدیر بنگاه",
-            assets,
-            Account.AccountType.ASSET,
-            Account.AccountCategory.RECEIVABLE_MANAGER,
-        ),
-        (
-            "210101",
-            "طلبکاری به مشاوران",
-            liabilities,
-            Account.AccountType.LIABILITY,
-            Account.AccountCategory.PAYABLE_CONSULTANT,
-        ),
-        (
-            "210201",
-            "حساب‌های جاری/دفتری اشخاص",
-            liabilities,
-            Account.AccountType.LIABILITY,
-            Account.AccountCategory.OTHER,
-        ),
-        (
-            "210301",
-            "طلبکاری به مشتریان",
-            liabilities,
-            Account.AccountType.LIABILITY,
-            Account.AccountCategory.PAYABLE_CLIENT,
-        ),
-        (
-            "210401",
-            "طلبکاری به بنگاه",
-            liabilities,
-            Account.AccountType.LIABILITY,
-            Account.AccountCategory.PAYABLE_OFFICE,
-        ),
-        (
-            "210501",
-            "طلبکاری به مدیر بنگاه",
-            liabilities,
-            Account.AccountType.LIABILITY,
-            Account.AccountCategory.PAYABLE_MANAGER,
-        ),
-        (
-            "410101",
-            "درآمد کمیسیون",
-            income,
-            Account.AccountType.INCOME,
-            Account.AccountCategory.REVENUE_COMMISSION,
-        ),
-        (
-            "510101",
-            "هزینه سهم مشاور",
-            expenses,
-            Account.AccountType.EXPENSE,
-            Account.AccountCategory.EXPENSE_CONSULTANT_SHARE,
-        ),
-        (
-            "510201",
-            "هزینه سهم مدیر",
-            expenses,
-            Account.AccountType.EXPENSE,
-            Account.AccountCategory.EXPENSE_MANAGER_SHARE,
-        ),
+def person_account_code(kind, obj):
+    """
+    کد زیرحساب شخص: پیشوند دورقمی + id با حداقل چهار رقم (بدون برش).
+    برای id تا ۹۹۹۹ همان کد ۶ کاراکتری قبلی است و برای id بزرگ‌تر کد بلندتر می‌شود،
+    پس دو شخص هرگز یک کد نمی‌گیرند.
+    """
+    return f"{PERSON_ACCOUNT_KINDS[kind][0]}{obj.id:04d}"
+
+
+def legacy_person_account_code(kind, obj_id):
+    """کد قدیمی بریده‌شده به ۶ کاراکتر (برای یافتن حساب‌های مشترک شده در repair_account_codes)."""
+    return f"{PERSON_ACCOUNT_KINDS[kind][0]}{obj_id:04d}"[:6]
+
+
+def forget_cached_account(code):
+    """حذف یک حساب از کش زیرحساب‌های اشخاص."""
+    _person_account_cache.pop(code, None)
+
+
+def _remember_accounts(accounts):
+    if len(_person_account_cache) + len(accounts) > PERSON_ACCOUNT_CACHE_SIZE:
+        _person_account_cache.clear()
+    for acc in accounts:
+        _person_account_cache[acc.code] = acc
+
+
+def ensure_accounts_for(
+    clients=(), client_payables=(), consultants=(), offices=(), office_managers=()
+):
+    """
+    دریافت/ایجاد دسته‌ای زیرحساب‌های اشخاص.
+    - clients: حساب بستانکاری مشتری
+    - client_payables: حساب طلبکاری به مشتری
+    - consultants: حساب‌های طلبکاری و بستانکاری مشاور
+    - offices: حساب‌های بستانکاری و طلبکاری بنگاه
+    - office_managers: حساب‌های بستانکاری و طلبکاری مدیر بنگاه (بر اساس دفتر)
+
+    حساب‌های موجود با یک کوئری code__in خوانده و حساب‌های جاافتاده با یک bulk_create
+    ساخته می‌شوند. خروجی دیکت (نوع، id شیء) → حساب است.
+    """
+    requested = [
+        ("client_receivable", clients),
+        ("client_payable", client_payables),
+        ("consultant_payable", consultants),
+        ("consultant_receivable", consultants),
+        ("office_receivable", offices),
+        ("office_payable", offices),
+        ("manager_receivable", office_managers),
+        ("manager_payable", office_managers),
     ]
-    created = {}
-    for code, name, parent, acc_type, category in sub_accounts:
-        created[code] = _get_or_create_account(code, name, parent, acc_type, category)
-
-    return {
-        "cash_bank": created["110101"],
-        "receivables_commission": created["110201"],
-        "receivables_consultant": created["110302"],
-        "receivables_office": created["110403"],
-        "receivables_manager": created["110504"],
-        "payables_consultant": created["210101"],
-        "payables_persons": created["210201"],
-        "payables_clients": created["210301"],
-        "payables_offices": created["210401"],
-        "payables_managers": created["210501"],
-        "revenue_commission": created["410101"],
-        "expense_consultant_share": created["510101"],
-        "expense_manager_share": created["510201"],
+    codes = {}
+    wanted = {}
+    for kind, objs in requested:
+        for obj in objs:
+            code = person_account_code(kind, obj)
+            codes[(kind, obj.id)] = code
+            wanted.setdefault(code, (kind, obj))
+    if not codes:
+        return {}
+
+    found = {
+        code: _person_account_cache[code]
+        for code in wanted
+        if code in _person_account_cache
     }
+    missing = [code for code in wanted if code not in found]
+    if missing:
+        existing = list(Account.objects.filter(code__in=missing))
+        # ممکن است در همین تراکنش ساخته شده باشند؛ کش فقط پس از commit به‌روز می‌شود
+        db_transaction.on_commit(lambda: _remember_accounts(existing))
+        found.update({acc.code: acc for acc in existing})
+        to_create = [code for code in missing if code not in found]
+        if to_create:
+            base_accounts = setup_chart_of_accounts()
+            new_accounts = []
+            for code in to_create:
+                kind, obj = wanted[code]
+                _, parent_key, name_format, acc_type, category = PERSON_ACCOUNT_KINDS[
+                    kind
+                ]
+                new_accounts.append(
+                    Account(
+                        code=code,
+                        name=name_format.format(name=obj.name),
+                        parent=base_accounts[parent_key],
+                        account_type=acc_type,
+                        category=category,
+                    )
+                )
+            with db_transaction.atomic():
+                # bulk_create با ignore_conflicts کلید اصلی را برنمی‌گرداند و save حساب
+                # (جدول بستار) را هم اجرا نمی‌کند؛ هر دو اینجا جبران می‌شوند.
+                Account.objects.bulk_create(new_accounts, ignore_conflicts=True)
+                created = list(Account.objects.filter(code__in=to_create))
+                AccountTreePath.link_new_accounts(created)
+            found.update({acc.code: acc for acc in created})
+            db_transaction.on_commit(lambda: _remember_accounts(created))
+
+    return {key: found[code] for key, code in codes.items()}
 
 
 def ensure_client_account(client):
     """ایجاد/دریافت حساب بستانکاری از مشتری (کمیسیون دریافتنی)."""
-    base_accounts = setup_chart_of_accounts()
-    # کد ۶ کاراکتر: 12 + id چهاررقمی
-    code = f"12{client.id:04d}"[:6]
-    account, _ = Account.objects.get_or_create(
-        code=code,
-        defaults={
-            "name": f"{client.name} (مشتری)",
-            "parent": base_accounts["receivables_commission"],
-            "account_type": Account.AccountType.ASSET,
-            "category": Account.AccountCategory.RECEIVABLE_CLIENT,
-        },
-    )
-    return account
+    return ensure_accounts_for(clients=[client])[("client_receivable", client.id)]
 
 
 def ensure_client_payable_account(client):
     """ایجاد/دریافت حساب طلبکاری به مشتری (پرداختنی به مشتری)."""
-    base_accounts = setup_chart_of_accounts()
-    # کد ۶ کاراکتر: 23 + id چهاررقمی
-    code = f"23{client.id:04d}"[:6]
-    account, _ = Account.objects.get_or_create(
-        code=code,
-        defaults={
-            "name": f"{client.name} - پرداختنی",
-            "parent": base_accounts["payables_clients"],
-            "account_type": Account.AccountType.LIABILITY,
-            "category": Account.AccountCategory.PAYABLE_CLIENT,
-        },
-    )
-    return account
+    return ensure_accounts_for(client_payables=[client])[("client_payable", client.id)]
 
 
 def ensure_consultant_accounts(consultant):
@@ -209,50 +399,16 @@ def ensure_consultant_accounts(consultant):
     1. حساب طلبکاری (بدهی) - برای ردیابی بدهی ما به مشاور
     2. حساب بستانکاری (دارایی) - برای ردیابی طلب از مشاور
     """
-    base_accounts = setup_chart_of_accounts()
-
-    # 1. حساب طلبکاری - کد ۶ کاراکتر: 22 + id چهاررقمی
-    payable_code = f"22{consultant.id:04d}"[:6]
-    payable_acc, _ = Account.objects.get_or_create(
-        code=payable_code,
-        defaults={
-            "name": f"{consultant.name} - پرداختنی",
-            "parent": base_accounts["payables_consultant"],
-            "account_type": Account.AccountType.LIABILITY,
-            "category": Account.AccountCategory.PAYABLE_CONSULTANT,
-        },
-    )
-
-    # 2. حساب بستانکاری - کد ۶ کاراکتر: 32 + id چهاررقمی
-    receivable_code = f"32{consultant.id:04d}"[:6]
-    receivable_acc, _ = Account.objects.get_or_create(
-        code=receivable_code,
-        defaults={
-            "name": f"{consultant.name} - بستانکاری",
-            "parent": base_accounts["receivables_consultant"],
-            "account_type": Account.AccountType.ASSET,
-            "category": Account.AccountCategory.RECEIVABLE_CONSULTANT,
-        },
+    accounts = ensure_accounts_for(consultants=[consultant])
+    return (
+        accounts[("consultant_payable", consultant.id)],
+        accounts[("consultant_receivable", consultant.id)],
     )
 
-    return payable_acc, receivable_acc
-
 
 def ensure_consultant_receivable_account(consultant):
     """ایجاد/دریافت حساب بستانکاری از مشاور (طلب از مشاور)."""
-    base_accounts = setup_chart_of_accounts()
-    # کد ۶ کاراکتر: 32 + id چهاررقمی
-    code = f"32{consultant.id:04d}"[:6]
-    account, _ = Account.objects.get_or_create(
-        code=code,
-        defaults={
-            "name": f"{consultant.name} - بستانکاری",
-            "parent": base_accounts["receivables_consultant"],
-            "account_type": Account.AccountType.ASSET,
-            "category": Account.AccountCategory.RECEIVABLE_CONSULTANT,
-        },
-    )
-    return account
+    return ensure_consultant_accounts(consultant)[1]
 
 
 def ensure_office_accounts(office):
@@ -260,30 +416,11 @@ def ensure_office_accounts(office):
     ایجاد/دریافت حساب‌های بنگاه: بستانکاری از بنگاه و طلبکاری به بنگاه.
     Returns (receivable_account, payable_account).
     """
-    base_accounts = setup_chart_of_accounts()
-    # کد ۶ کاراکتر: 14/24 + id چهاررقمی
-    rec_code = f"14{office.id:04d}"[:6]
-    pay_code = f"24{office.id:04d}"[:6]
-
-    rec, _ = Account.objects.get_or_create(
-        code=rec_code,
-        defaults={
-            "name": f"{office.name} - بستانکاری",
-            "parent": base_accounts["receivables_office"],
-            "account_type": Account.AccountType.ASSET,
-            "category": Account.AccountCategory.RECEIVABLE_OFFICE,
-        },
+    accounts = ensure_accounts_for(offices=[office])
+    return (
+        accounts[("office_receivable", office.id)],
+        accounts[("office_payable", office.id)],
     )
-    pay, _ = Account.objects.get_or_create(
-        code=pay_code,
-        defaults={
-            "name": f"{office.name} - پرداختنی",
-            "parent": base_accounts["payables_offices"],
-            "account_type": Account.AccountType.LIABILITY,
-            "category": Account.AccountCategory.PAYABLE_OFFICE,
-        },
-    )
-    return rec, pay
 
 
 def ensure_office_manager_accounts(office):
@@ -292,31 +429,11 @@ def ensure_office_manager_accounts(office):
     سهم مدیر از کمیسیون در پرداختنی ثبت می‌شود.
     Returns (receivable_account, payable_account).
     """
-    base_accounts = setup_chart_of_accounts()
-    name = f"مدیر - {office.name}"
-    # کد ۶ کاراکتر: 15/25 + id چهاررقمی دفتر
-    rec_code = f"15{office.id:04d}"[:6]
-    pay_code = f"25{office.id:04d}"[:6]
-
-    rec, _ = Account.objects.get_or_create(
-        code=rec_code,
-        defaults={
-            "name": f"{name} - بستانکاری",
-            "parent": base_accounts["receivables_manager"],
-            "account_type": Account.AccountType.ASSET,
-            "category": Account.AccountCategory.RECEIVABLE_MANAGER,
-        },
-    )
-    pay, _ = Account.objects.get_or_create(
-        code=pay_code,
-        defaults={
-            "name": f"{name} - پرداختنی",
-            "parent": base_accounts["payables_managers"],
-            "account_type": Account.AccountType.LIABILITY,
-            "category": Account.AccountCategory.PAYABLE_MANAGER,
-        },
+    accounts = ensure_accounts_for(office_managers=[office])
+    return (
+        accounts[("manager_receivable", office.id)],
+        accounts[("manager_payable", office.id)],
     )
-    return rec, pay
 
 
 def ensure_personal_bookkeeping_account(user_or_name, identifier):
@@ -333,11 +450,10 @@ def ensure_personal_bookkeeping_account(user_or_name, identifier):
         else str(user_or_name)
     )
 
-    # کد ۶ کاراکتر: 29 + چهار رقم از identifier
-    code_suffix = str(identifier).replace("-", "")[:4].zfill(4)
-    code = f"29{code_suffix}"[:6]
+    # کد: 29 + identifier (حداقل چهار رقم، بدون برش تا سقف طول کد)
+    code_suffix = str(identifier).replace("-", "").zfill(4)[:18]
     account, _ = Account.objects.get_or_create(
-        code=code,
+        code=f"29{code_suffix}",
         defaults={
             "name": f"{name} - حساب دفتری",
             "parent": parent,
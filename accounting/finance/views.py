@@ -1,11 +1,13 @@
 import json
 import os
+import uuid
 from datetime import date as date_type
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction as db_transaction
 from django.db.models import Q, Sum
 from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
@@ -15,6 +17,7 @@ from django.views.generic import FormView, ListView, TemplateView
 from transactions.models import Deals
 
 from .forms import JournalEntryForm, VoucherDocumentForm
+from .idempotency import run_idempotent
 from .models import (
     Account,
     AccountEntry,
@@ -23,19 +26,23 @@ from .models import (
     DealFinance,
     PendingDealPayment,
 )
+from .payment_import import import_payments, parse_payment_rows
+from .reports import get_financial_reports
 from .services import (
+    LEDGER_PAGE_SIZE,
+    check_settleable_amount,
     create_account_payment,
     create_journal_document,
     create_payment_document,
     create_receipt_document,
+    get_account_ledger_page,
+    get_balances,
     get_deal_ledger_summary,
-    repair_deal_ledger_revenue,
-)
-from .utils import (
-    ensure_office_accounts,
-    ensure_office_manager_accounts,
-    setup_chart_of_accounts,
+    get_settleable_balance,
+    parse_date_string,
+    review_pending_payments,
 )
+from .utils import ensure_accounts_for, setup_chart_of_accounts
 
 
 class DealAccountsView(LoginRequiredMixin, TemplateView):
@@ -72,7 +79,6 @@ class DealAccountsView(LoginRequiredMixin, TemplateView):
             return context
 
         trx = finance.income_transaction
-        repair_deal_ledger_revenue(deal, trx)
         context["transaction"] = trx
         context["document"] = AccountingDocument.objects.filter(
             deal=deal, transaction=trx
@@ -135,17 +141,21 @@ class OfficeFinanceView(LoginRequiredMixin, TemplateView):
             context["recent_payments"] = []
             return context
 
-        acc_rec, acc_pay = ensure_office_accounts(office)
+        accounts = ensure_accounts_for(offices=[office], office_managers=[office])
+        acc_rec = accounts[("office_receivable", office.id)]
+        acc_pay = accounts[("office_payable", office.id)]
+        mgr_rec = accounts[("manager_receivable", office.id)]
+        mgr_pay = accounts[("manager_payable", office.id)]
+        balances = get_balances([acc_rec.id, acc_pay.id, mgr_rec.id, mgr_pay.id])
         context["office_receivable"] = acc_rec
         context["office_payable"] = acc_pay
-        context["balance_receivable"] = acc_rec.get_balance()
-        context["balance_payable"] = acc_pay.get_balance()
+        context["balance_receivable"] = balances.get(acc_rec.id, Decimal("0"))
+        context["balance_payable"] = balances.get(acc_pay.id, Decimal("0"))
 
-        mgr_rec, mgr_pay = ensure_office_manager_accounts(office)
         context["manager_receivable"] = mgr_rec
         context["manager_payable"] = mgr_pay
-        context["balance_manager_receivable"] = mgr_rec.get_balance()
-        context["balance_manager_payable"] = mgr_pay.get_balance()
+        context["balance_manager_receivable"] = balances.get(mgr_rec.id, Decimal("0"))
+        context["balance_manager_payable"] = balances.get(mgr_pay.id, Decimal("0"))
 
         deals_qs = (
             Deals.objects.filter(office=office)
@@ -203,6 +213,35 @@ class OfficeFinanceView(LoginRequiredMixin, TemplateView):
         return context
 
 
+class FinancialReportsView(LoginRequiredMixin, TemplateView):
+    """گزارش‌های مالی بنگاه: تراز آزمایشی، صورت سود و زیان و ترازنامه برای یک بازه تاریخ."""
+
+    template_name = "finance/financial_reports.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        office = getattr(self.request.user, "office", None)
+        date_from = self.request.GET.get("date_from")
+        date_to = self.request.GET.get("date_to")
+        context["office"] = office
+        context["date_from"] = date_from or ""
+        context["date_to"] = date_to or ""
+        if not office:
+            # office=None در get_financial_reports یعنی کل دفاتر؛ کاربر بدون بنگاه گزارشی ندارد
+            context["reports"] = None
+            return context
+        try:
+            context["reports"] = get_financial_reports(
+                office=office,
+                date_from=parse_date_string(date_from),
+                date_to=parse_date_string(date_to),
+            )
+        except ValueError as e:
+            context["reports"] = None
+            context["error"] = str(e)
+        return context
+
+
 class AccountingDocumentsListView(LoginRequiredMixin, ListView):
     model = AccountingDocument
     template_name = "finance/accounting_documents_list.html"
@@ -215,7 +254,12 @@ class AccountingDocumentsListView(LoginRequiredMixin, ListView):
         )
         office = getattr(self.request.user, "office", None)
         if office:
-            qs = qs.filter(Q(deal__isnull=True) | Q(deal__office=office))
+            # اسناد بدون بنگاه (مثل بستن سال یا اسناد قدیمی) با معامله‌شان محدود می‌شوند
+            qs = qs.filter(
+                Q(office=office)
+                | Q(office__isnull=True)
+                & (Q(deal__isnull=True) | Q(deal__office=office))
+            )
         return qs
 
 
@@ -231,6 +275,8 @@ class ChartOfAccountsView(LoginRequiredMixin, ListView):
         qs = (
             Account.objects.filter(is_active=True)
             .select_related("parent")
+            .with_balances()
+            .with_subtree_balances()
             .order_by("code")
         )
         account_type = self.request.GET.get("account_type")
@@ -242,7 +288,13 @@ class ChartOfAccountsView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         accounts_with_balance = []
         for acc in context["accounts"]:
-            accounts_with_balance.append({"account": acc, "balance": acc.get_balance()})
+            accounts_with_balance.append(
+                {
+                    "account": acc,
+                    "balance": acc.balance,
+                    "subtree_balance": acc.subtree_balance,
+                }
+            )
         context["accounts_with_balance"] = accounts_with_balance
         context["account_type_filter"] = self.request.GET.get("account_type", "")
         context["account_type_choices"] = Account.AccountType.choices
@@ -263,42 +315,71 @@ class AccountLedgerView(LoginRequiredMixin, TemplateView):
 
         date_from = self.request.GET.get("date_from")
         date_to = self.request.GET.get("date_to")
-        entries_qs = (
-            AccountEntry.objects.filter(account=account)
-            .select_related("transaction")
-            .order_by("transaction__date", "transaction_id", "id")
+        cursor = self.request.GET.get("cursor")
+        page = get_account_ledger_page(
+            account,
+            date_from=parse_date_string(date_from),
+            date_to=parse_date_string(date_to),
+            cursor=cursor,
         )
-        if date_from:
-            entries_qs = entries_qs.filter(transaction__date__gte=date_from)
-        if date_to:
-            entries_qs = entries_qs.filter(transaction__date__lte=date_to)
-
-        rows = []
-        running = Decimal("0")
-        for e in entries_qs:
-            debit = e.debit or Decimal("0")
-            credit = e.credit or Decimal("0")
-            if account.account_type in (
-                Account.AccountType.ASSET,
-                Account.AccountType.EXPENSE,
-            ):
-                running += debit - credit
-            else:
-                running += credit - debit
-            rows.append(
-                {
-                    "entry": e,
-                    "debit": debit,
-                    "credit": credit,
-                    "running_balance": running,
-                }
-            )
-        context["ledger_rows"] = rows
+        context["ledger_rows"] = page["rows"]
+        context["opening_balance"] = page["opening_balance"]
+        context["next_cursor"] = page["next_cursor"]
+        context["is_first_page"] = not cursor
         context["date_from"] = date_from or ""
         context["date_to"] = date_to or ""
         return context
 
 
+class AccountLedgerApiView(LoginRequiredMixin, View):
+    """نسخه JSON گردش حساب با صفحه‌بندی keyset (پارامترهای date_from، date_to، cursor، size)."""
+
+    def get(self, request, account_id):
+        account = get_object_or_404(Account, id=account_id, is_active=True)
+        try:
+            size = int(request.GET.get("size") or LEDGER_PAGE_SIZE)
+        except ValueError:
+            size = LEDGER_PAGE_SIZE
+        size = max(1, min(size, 500))
+        page = get_account_ledger_page(
+            account,
+            date_from=parse_date_string(request.GET.get("date_from")),
+            date_to=parse_date_string(request.GET.get("date_to")),
+            cursor=request.GET.get("cursor"),
+            page_size=size,
+        )
+        rows = [
+            {
+                "id": row["entry"].id,
+                "transaction_id": row["entry"].transaction_id,
+                "date": row["entry"].transaction.date,
+                "transaction_description": row["entry"].transaction.description,
+                "description": row["entry"].description,
+                "debit": row["debit"],
+                "credit": row["credit"],
+                "running_balance": row["running_balance"],
+            }
+            for row in page["rows"]
+        ]
+        return JsonResponse(
+            {
+                "success": True,
+                "account": {
+                    "id": account.id,
+                    "code": account.code,
+                    "name": account.name,
+                },
+                "opening_balance": page["opening_balance"],
+                "closing_balance": page["closing_balance"],
+                "rows": rows,
+                "has_next": page["has_next"],
+                "next_cursor": page["next_cursor"],
+            },
+            encoder=DjangoJSONEncoder,
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+
 class JournalEntryCreateView(LoginRequiredMixin, FormView):
     """ثبت سند روزنامه دستی."""
 
@@ -339,7 +420,12 @@ class JournalEntryCreateView(LoginRequiredMixin, FormView):
         date_val = form.cleaned_data.get("date")
         description = (form.cleaned_data.get("description") or "").strip()
         try:
-            trx, doc = create_journal_document(date_val, description, rows)
+            trx, doc = create_journal_document(
+                date_val,
+                description,
+                rows,
+                office=getattr(self.request.user, "office", None),
+            )
         except ValueError as e:
             form.add_error(None, str(e))
             return self.form_invalid(form)
@@ -364,25 +450,32 @@ class CreateVoucherView(LoginRequiredMixin, FormView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["voucher_type"] = self.kwargs.get("voucher_type", "receipt")
+        # کلید یکتایی فرم؛ در نمایش مجدد فرم نامعتبر همان کلید قبلی حفظ می‌شود
+        context["idempotency_key"] = (
+            self.request.POST.get("idempotency_key") or uuid.uuid4().hex
+        )
         return context
 
     def form_valid(self, form):
         voucher_type = form.cleaned_data["voucher_type"]
-        receipt_file = self.request.FILES.get("receipt_file")
-        common = {
-            "date": form.cleaned_data["date"],
-            "account": form.cleaned_data["account"],
-            "amount": form.cleaned_data["amount"],
-            "method": form.cleaned_data.get("method") or "",
-            "description": form.cleaned_data.get("description") or "",
-            "user": self.request.user,
-            "receipt_file": receipt_file,
-        }
-        if voucher_type == "receipt":
-            create_receipt_document(**common)
-        else:
-            create_payment_document(**common)
-        return redirect(self.get_success_url())
+
+        def _create_voucher():
+            common = {
+                "date": form.cleaned_data["date"],
+                "account": form.cleaned_data["account"],
+                "amount": form.cleaned_data["amount"],
+                "method": form.cleaned_data.get("method") or "",
+                "description": form.cleaned_data.get("description") or "",
+                "user": self.request.user,
+                "receipt_file": self.request.FILES.get("receipt_file"),
+            }
+            if voucher_type == "receipt":
+                create_receipt_document(**common)
+            else:
+                create_payment_document(**common)
+            return redirect(self.get_success_url())
+
+        return run_idempotent(self.request, f"voucher:{voucher_type}", _create_voucher)
 
 
 class ServePaymentReceiptView(LoginRequiredMixin, View):
@@ -416,6 +509,14 @@ class CreateDealAccountPaymentView(LoginRequiredMixin, View):
     """ثبت پرداخت/دریافت برای یکی از حساب‌های معامله (فقط POST). مشاور فقط حساب مشتری و به‌صورت در انتظار تایید ثبت می‌کند."""
 
     def post(self, request, deal_id):
+        # ارسال مجدد با همان کلید یکتایی فقط پاسخ ثبت اول را می‌گیرد
+        return run_idempotent(
+            request,
+            f"deal-payment:{deal_id}",
+            lambda: self._create_payment(request, deal_id),
+        )
+
+    def _create_payment(self, request, deal_id):
         user = request.user
         office = getattr(user, "office", None)
         is_consultant = getattr(user, "is_consultant", False) and getattr(
@@ -436,9 +537,9 @@ class CreateDealAccountPaymentView(LoginRequiredMixin, View):
             )
 
         try:
-            finance = DealFinance.objects.select_related("income_transaction").get(
-                deal=deal
-            )
+            finance = DealFinance.objects.select_related(
+                "income_transaction__accounting_document"
+            ).get(deal=deal)
         except DealFinance.DoesNotExist:
             return JsonResponse(
                 {"success": False, "message": "سند حسابداری این معامله یافت نشد."},
@@ -450,8 +551,8 @@ class CreateDealAccountPaymentView(LoginRequiredMixin, View):
                 return None
             s = str(value).strip().replace(",", "").replace("٬", "").replace("،", "")
             try:
-                return float(s) if s else None
-            except ValueError:
+                return Decimal(s) if s else None
+            except InvalidOperation:
                 return None
 
         if request.content_type and "multipart/form-data" in (
@@ -510,19 +611,14 @@ class CreateDealAccountPaymentView(LoginRequiredMixin, View):
                 status=400,
             )
 
-        trx = finance.income_transaction
-        allowed_account_ids = set(
-            AccountEntry.objects.filter(transaction=trx).values_list(
-                "account_id", flat=True
-            )
-        )
-        if int(account_id) not in allowed_account_ids:
+        try:
+            account_id = int(account_id)
+        except (TypeError, ValueError):
             return JsonResponse(
-                {"success": False, "message": "این حساب مربوط به این معامله نیست."},
+                {"success": False, "message": "حساب را انتخاب کنید."},
                 status=400,
             )
 
-        account = get_object_or_404(Account, id=account_id)
         # مشاور فقط می‌تواند تراکنش برای حساب‌های نوع مشتری پیشنهاد دهد (در انتظار تایید).
         _client_categories = ("receivable_client", "payable_client")
         _transaction_target_categories = (
@@ -533,160 +629,83 @@ class CreateDealAccountPaymentView(LoginRequiredMixin, View):
             "receivable_manager",
             "payable_manager",
         )
-        if is_consultant:
-            if getattr(account, "category", None) not in _client_categories:
+        document = getattr(finance.income_transaction, "accounting_document", None)
+
+        with db_transaction.atomic():
+            # مانده اولیه و تسویه‌شده این حساب در معامله با یک کوئری؛ برای ثبت مستقیم ردیف
+            # خلاصه قفل می‌شود تا پرداخت هم‌زمان دیگری از بررسی مانده عبور نکند.
+            summary = get_settleable_balance(deal, account_id, lock=not is_consultant)
+            if summary is None:
+                return JsonResponse(
+                    {"success": False, "message": "این حساب مربوط به این معامله نیست."},
+                    status=400,
+                )
+            account = summary.account
+            if is_consultant:
+                if getattr(account, "category", None) not in _client_categories:
+                    return JsonResponse(
+                        {
+                            "success": False,
+                            "message": "مشاور فقط می‌تواند تراکنش برای حساب‌های مشتری (پرداخت/دریافت مشتری) ثبت کند.",
+                        },
+                        status=400,
+                    )
+            elif (
+                getattr(account, "category", None) not in _transaction_target_categories
+            ):
                 return JsonResponse(
                     {
                         "success": False,
-                        "message": "مشاور فقط می‌تواند تراکنش برای حساب‌های مشتری (پرداخت/دریافت مشتری) ثبت کند.",
+                        "message": "ثبت تراکنش فقط برای پرداخت/دریافت مشتری، پرداخت به مشاور و پرداخت به مدیر بنگاه امکان‌پذیر است.",
                     },
                     status=400,
                 )
-        elif getattr(account, "category", None) not in _transaction_target_categories:
-            return JsonResponse(
-                {
-                    "success": False,
-                    "message": "ثبت تراکنش فقط برای پرداخت/دریافت مشتری، پرداخت به مشاور و پرداخت به مدیر بنگاه امکان‌پذیر است.",
-                },
-                status=400,
-            )
 
-        document = AccountingDocument.objects.filter(
-            deal=deal, doc_type=AccountingDocument.DocType.COMMISSION
-        ).first()
-
-        # محاسبه مانده اولیه این حساب در سند کمیسیون (بدهکار / بستانکار)
-        entries_for_account = AccountEntry.objects.filter(
-            transaction=trx, account=account
-        )
-        entry_totals = entries_for_account.aggregate(
-            total_debit=Sum("debit"), total_credit=Sum("credit")
-        )
-        orig_debit = entry_totals["total_debit"] or Decimal("0")
-        orig_credit = entry_totals["total_credit"] or Decimal("0")
-
-        # مبالغی که قبلاً برای این حساب و این معامله تسویه شده‌اند
-        payments_for_account = AccountPayment.objects.filter(deal=deal, account=account)
-        paid_receive = payments_for_account.filter(
-            direction=AccountPayment.Direction.RECEIVE
-        ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        paid_pay = payments_for_account.filter(
-            direction=AccountPayment.Direction.PAY
-        ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-
-        # مانده قابل تسویه بر اساس نوع حساب:
-        # - برای حساب‌های بدهکار (طلب بنگاه از طرف مقابل): orig_debit - مجموع دریافت‌ها
-        # - برای حساب‌های بستانکار (بدهی بنگاه به طرف مقابل): orig_credit - مجموع پرداخت‌ها
-        remaining_receivable = orig_debit - paid_receive
-        remaining_payable = orig_credit - paid_pay
-
-        amt_dec = Decimal(str(amount))
-
-        # اگر این حساب طلب بنگاه است، اجازه دریافت بیش از مانده را نده
-        if (
-            direction == AccountPayment.Direction.RECEIVE
-            and orig_debit > 0
-            and amt_dec > remaining_receivable
-        ):
-            return JsonResponse(
-                {
-                    "success": False,
-                    "message": (
-                        "مبلغ وارد شده بیشتر از مانده قابل دریافت از این حساب است. "
-                        f"مانده فعلی: {remaining_receivable} ریال."
-                    ),
-                },
-                status=400,
-            )
-
-        # اگر این حساب بدهی بنگاه است، اجازه پرداخت بیش از مانده را نده
-        if (
-            direction == AccountPayment.Direction.PAY
-            and orig_credit > 0
-            and amt_dec > remaining_payable
-        ):
-            return JsonResponse(
-                {
-                    "success": False,
-                    "message": (
-                        "مبلغ وارد شده بیشتر از مانده قابل پرداخت به این حساب است. "
-                        f"مانده فعلی: {remaining_payable} ریال."
-                    ),
-                },
-                status=400,
-            )
-
-        # مشاور: ثبت به‌صورت «در انتظار تایید»؛ پس از تایید اپراتور/مدیر در دفتر اعمال می‌شود.
-        if is_consultant:
-            date_val = None
-            if payment_date:
-                try:
-                    parts = str(payment_date).replace("/", "-").split("-")
-                    if len(parts) >= 3:
-                        y, m, d = int(parts[0]), int(parts[1]), int(parts[2])
-                        if y < 1500:
-                            from jdatetime import date as jdate
-
-                            date_val = jdate(y, m, d).togregorian()
-                        else:
-                            date_val = date_type(y, m, d)
-                except (ValueError, TypeError):
-                    pass
-            if date_val is None:
-                date_val = date_type.today()
-            PendingDealPayment.objects.create(
-                deal=deal,
-                account=account,
-                amount=amt_dec,
-                direction=direction,
-                date=date_val,
-                method=method or "",
-                description=description or "",
-                receipt_file=receipt_file,
-                created_by=user,
-                status=PendingDealPayment.Status.PENDING,
-            )
-            return JsonResponse(
-                {
-                    "success": True,
-                    "message": "تراکنش ثبت شد و پس از تایید اپراتور یا مدیر بنگاه در دفتر اعمال می‌شود.",
-                },
-            )
-
-        date_val = None
-        if payment_date:
             try:
-                parts = str(payment_date).replace("/", "-").split("-")
-                if len(parts) >= 3:
-                    y, m, d = int(parts[0]), int(parts[1]), int(parts[2])
-                    if y < 1500:
-                        from jdatetime import date as jdate
-
-                        date_val = jdate(y, m, d).togregorian()
-                    else:
-                        date_val = date_type(y, m, d)
-            except (ValueError, TypeError):
-                pass
-        if date_val is None:
-            date_val = date_type.today()
+                check_settleable_amount(summary, direction, amount)
+            except ValueError as e:
+                return JsonResponse({"success": False, "message": str(e)}, status=400)
+
+            date_val = parse_date_string(payment_date) or date_type.today()
+
+            # مشاور: ثبت به‌صورت «در انتظار تایید»؛ پس از تایید اپراتور/مدیر در دفتر اعمال می‌شود.
+            if is_consultant:
+                PendingDealPayment.objects.create(
+                    deal=deal,
+                    account=account,
+                    amount=amount,
+                    direction=direction,
+                    date=date_val,
+                    method=method or "",
+                    description=description or "",
+                    receipt_file=receipt_file,
+                    created_by=user,
+                    status=PendingDealPayment.Status.PENDING,
+                )
+                return JsonResponse(
+                    {
+                        "success": True,
+                        "message": "تراکنش ثبت شد و پس از تایید اپراتور یا مدیر بنگاه در دفتر اعمال می‌شود.",
+                    },
+                )
 
-        try:
-            create_account_payment(
-                document=document,
-                account=account,
-                amount=amount,
-                direction=AccountPayment.Direction(direction),
-                date=date_val,
-                method=method or "",
-                description=description or "",
-                user=request.user,
-                receipt_file=receipt_file,
-            )
-        except ValueError as e:
-            return JsonResponse(
-                {"success": False, "message": str(e)},
-                status=400,
-            )
+            try:
+                create_account_payment(
+                    document=document,
+                    account=account,
+                    amount=amount,
+                    direction=AccountPayment.Direction(direction),
+                    date=date_val,
+                    method=method or "",
+                    description=description or "",
+                    user=request.user,
+                    receipt_file=receipt_file,
+                )
+            except ValueError as e:
+                return JsonResponse(
+                    {"success": False, "message": str(e)},
+                    status=400,
+                )
 
         return JsonResponse(
             {"success": True, "message": "تراکنش با موفقیت ثبت شد."},
@@ -712,41 +731,45 @@ class ApprovePendingDealPaymentView(LoginRequiredMixin, View):
                 status=403,
             )
         deal = get_object_or_404(Deals, id=deal_id, office=office)
-        pending = get_object_or_404(
-            PendingDealPayment,
-            id=pending_id,
-            deal=deal,
-            status=PendingDealPayment.Status.PENDING,
-        )
         document = AccountingDocument.objects.filter(
             deal=deal, doc_type=AccountingDocument.DocType.COMMISSION
         ).first()
         try:
-            payment = create_account_payment(
-                document=document,
-                account=pending.account,
-                amount=pending.amount,
-                direction=AccountPayment.Direction(pending.direction),
-                date=pending.date,
-                method=pending.method or "",
-                description=pending.description or "",
-                user=request.user,
-                receipt_file=pending.receipt_file,
-            )
-            from django.utils import timezone as tz
-
-            pending.status = PendingDealPayment.Status.APPROVED
-            pending.reviewed_by = request.user
-            pending.reviewed_at = tz.now()
-            pending.account_payment = payment
-            pending.save(
-                update_fields=[
-                    "status",
-                    "reviewed_by",
-                    "reviewed_at",
-                    "account_payment",
-                ]
-            )
+            with db_transaction.atomic():
+                pending = get_object_or_404(
+                    PendingDealPayment.objects.select_for_update(),
+                    id=pending_id,
+                    deal=deal,
+                    status=PendingDealPayment.Status.PENDING,
+                )
+                summary = get_settleable_balance(deal, pending.account_id, lock=True)
+                if summary is not None:
+                    check_settleable_amount(summary, pending.direction, pending.amount)
+                payment = create_account_payment(
+                    document=document,
+                    account=pending.account,
+                    amount=pending.amount,
+                    direction=AccountPayment.Direction(pending.direction),
+                    date=pending.date,
+                    method=pending.method or "",
+                    description=pending.description or "",
+                    user=request.user,
+                    receipt_file=pending.receipt_file,
+                )
+                from django.utils import timezone as tz
+
+                pending.status = PendingDealPayment.Status.APPROVED
+                pending.reviewed_by = request.user
+                pending.reviewed_at = tz.now()
+                pending.account_payment = payment
+                pending.save(
+                    update_fields=[
+                        "status",
+                        "reviewed_by",
+                        "reviewed_at",
+                        "account_payment",
+                    ]
+                )
         except ValueError as e:
             return JsonResponse(
                 {"success": False, "message": str(e)},
@@ -803,3 +826,140 @@ class RejectPendingDealPaymentView(LoginRequiredMixin, View):
         return JsonResponse(
             {"success": True, "message": "تراکنش رد شد."},
         )
+
+
+class ReviewPendingDealPaymentsView(LoginRequiredMixin, View):
+    """
+    تایید یا رد دسته‌ای تراکنش‌های پیشنهادی مشاور یک معامله.
+    بدنه JSON: {"ids": [...], "action": "approve" | "reject", "rejection_reason": ""}.
+    """
+
+    def post(self, request, deal_id):
+        if getattr(request.user, "is_consultant", False):
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": "فقط اپراتور یا مدیر بنگاه می‌تواند تایید یا رد کند.",
+                },
+                status=403,
+            )
+        office = getattr(request.user, "office", None)
+        if not office:
+            return JsonResponse(
+                {"success": False, "message": "دسترسی مجاز نیست."},
+                status=403,
+            )
+        deal = get_object_or_404(Deals, id=deal_id, office=office)
+
+        if request.content_type and "application/json" in request.content_type:
+            try:
+                data = json.loads(request.body)
+            except json.JSONDecodeError:
+                return JsonResponse(
+                    {"success": False, "message": "داده ارسالی نامعتبر است."},
+                    status=400,
+                )
+            ids = data.get("ids") or []
+            action = data.get("action")
+            reason = str(data.get("rejection_reason") or "").strip()
+        else:
+            ids = request.POST.getlist("ids")
+            action = request.POST.get("action")
+            reason = (request.POST.get("rejection_reason") or "").strip()
+        try:
+            ids = [int(pid) for pid in ids]
+        except (TypeError, ValueError):
+            ids = []
+        if not ids:
+            return JsonResponse(
+                {"success": False, "message": "هیچ تراکنشی انتخاب نشده است."},
+                status=400,
+            )
+        if action not in ("approve", "reject"):
+            return JsonResponse(
+                {"success": False, "message": "عملیات باید تایید یا رد باشد."},
+                status=400,
+            )
+
+        try:
+            result = review_pending_payments(
+                deal,
+                ids,
+                approve=action == "approve",
+                user=request.user,
+                reason=reason,
+            )
+        except ValueError as e:
+            return JsonResponse({"success": False, "message": str(e)}, status=400)
+        verb = "تایید و در دفتر اعمال" if action == "approve" else "رد"
+        message = f"{len(result['reviewed'])} تراکنش {verb} شد."
+        if not result["reviewed"] and result["errors"]:
+            message = result["errors"][0]["message"]
+        return JsonResponse(
+            {
+                "success": bool(result["reviewed"]),
+                "message": message,
+                **result,
+            },
+            status=200 if result["reviewed"] else 400,
+        )
+
+
+class BulkPaymentImportView(LoginRequiredMixin, View):
+    """
+    ورود دسته‌ای پرداخت/دریافت‌ها از فایل CSV/JSON (فیلد file) یا بدنه JSON ({"rows": [...]}).
+    با dry_run=1 فقط اعتبارسنجی انجام می‌شود. خطای هر ردیف جداگانه برگردانده می‌شود.
+    """
+
+    def post(self, request):
+        if getattr(request.user, "is_consultant", False):
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": "فقط اپراتور یا مدیر بنگاه می‌تواند پرداخت‌ها را وارد کند.",
+                },
+                status=403,
+            )
+        office = getattr(request.user, "office", None)
+        if not office:
+            return JsonResponse(
+                {"success": False, "message": "دسترسی مجاز نیست."},
+                status=403,
+            )
+        return run_idempotent(
+            request, "payment-import", lambda: self._import(request, office)
+        )
+
+    def _import(self, request, office):
+        upload = request.FILES.get("file")
+        dry_run = (
+            request.GET.get("dry_run") == "1" or request.POST.get("dry_run") == "1"
+        )
+        try:
+            if upload is not None:
+                fmt = "json" if upload.name.lower().endswith(".json") else "csv"
+                rows = parse_payment_rows(upload.read(), fmt)
+            elif request.content_type and "application/json" in request.content_type:
+                rows = parse_payment_rows(request.body, "json")
+            else:
+                return JsonResponse(
+                    {"success": False, "message": "فایل پرداخت‌ها را انتخاب کنید."},
+                    status=400,
+                )
+        except ValueError as e:
+            return JsonResponse({"success": False, "message": str(e)}, status=400)
+
+        result = import_payments(
+            rows, user=request.user, office=office, dry_run=dry_run
+        )
+        return JsonResponse(
+            {
+                "success": True,
+                "dry_run": dry_run,
+                "message": (
+                    f"{result['created']} از {result['total']} ردیف "
+                    f"{'معتبر است' if dry_run else 'ثبت شد'}."
+                ),
+                **result,
+            }
+        )
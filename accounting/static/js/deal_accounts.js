@@ -12,6 +12,7 @@
   var canApprovePending = config.canApprovePending;
   var approvePendingUrlTemplate = config.approvePendingUrlTemplate || "";
   var rejectPendingUrlTemplate = config.rejectPendingUrlTemplate || "";
+  var reviewPendingUrl = config.reviewPendingUrl || "";
 
   function getCsrfToken() {
     var match = document.cookie.match(/csrftoken=([^;]+)/);
@@ -181,6 +182,13 @@
       amountInput.addEventListener("input", formatAmountInput);
     }
 
+    // کلید یکتایی هر ثبت: در خطای ارتباط حفظ می‌شود تا ارسال مجدد، ثبت تکراری نسازد
+    var idempotencyKey = null;
+    function newIdempotencyKey() {
+      if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+      return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+    }
+
     form.addEventListener("submit", function (e) {
       e.preventDefault();
       if (!paymentUrl) { messageEl.textContent = "آدرس ثبت تراکنش یافت نشد."; messageEl.className = "form-message error"; return; }
@@ -193,8 +201,10 @@
       messageEl.textContent = "در حال ثبت...";
       messageEl.className = "form-message";
       submitBtn.disabled = true;
-      fetch(paymentUrl, { method: "POST", headers: { "X-CSRFToken": csrf, "Accept": "application/json" }, body: fd })
+      if (!idempotencyKey) idempotencyKey = newIdempotencyKey();
+      fetch(paymentUrl, { method: "POST", headers: { "X-CSRFToken": csrf, "Accept": "application/json", "Idempotency-Key": idempotencyKey }, body: fd })
         .then(function (res) { return res.json().then(function (data) {
+          if (!res.ok) idempotencyKey = null;
           if (res.ok && data.success) {
             messageEl.textContent = data.message || "ثبت شد.";
             messageEl.className = "form-message success";
@@ -251,11 +261,53 @@
     });
   }
 
+  function initPendingBulkReview() {
+    if (!canApprovePending || !reviewPendingUrl) return;
+    var selectAll = document.querySelector(".pending-select-all");
+    if (selectAll) {
+      selectAll.addEventListener("change", function () {
+        document.querySelectorAll(".pending-select").forEach(function (cb) { cb.checked = selectAll.checked; });
+      });
+    }
+    document.querySelectorAll(".btn-review-selected").forEach(function (btn) {
+      btn.addEventListener("click", function () {
+        var ids = [];
+        document.querySelectorAll(".pending-select:checked").forEach(function (cb) { ids.push(parseInt(cb.value, 10)); });
+        if (!ids.length) { alert("هیچ تراکنشی انتخاب نشده است."); return; }
+        var action = btn.getAttribute("data-action");
+        var reason = "";
+        if (action === "approve") {
+          if (!confirm("آیا از تایید " + ids.length + " تراکنش و اعمال آن‌ها در دفتر مطمئن هستید؟")) return;
+        } else {
+          reason = prompt("علت رد (اختیاری):", "");
+          if (reason === null) return;
+        }
+        btn.disabled = true;
+        fetch(reviewPendingUrl, {
+          method: "POST",
+          headers: { "X-CSRFToken": getCsrfToken(), "Content-Type": "application/json" },
+          credentials: "include",
+          body: JSON.stringify({ ids: ids, action: action, rejection_reason: (reason || "").trim() }),
+        })
+          .then(function (r) { return r.json().catch(function () { return {}; }); })
+          .then(function (data) {
+            var errors = (data.errors || []).map(function (err) { return "#" + err.id + ": " + err.message; });
+            if (errors.length) alert((data.message || "") + "\n" + errors.join("\n"));
+            else if (!data.success) alert(data.message || "خطا در بررسی تراکنش‌ها");
+            if (data.reviewed && data.reviewed.length) window.location.reload();
+            else btn.disabled = false;
+          })
+          .catch(function () { alert("خطا در ارتباط با سرور."); btn.disabled = false; });
+      });
+    });
+  }
+
   function init() {
     initDealDetailModal();
     initPaymentsModal();
     initRegisterPaymentModal();
     initPendingApprovalButtons();
+    initPendingBulkReview();
   }
 
   if (document.readyState === "loading") document.addEventListener("DOMContentLoaded", init);
@@ -20,21 +20,21 @@ from transactions.models import (
     DealProperty,
     Deals,
 )
+from transactions.normalization import normalize_digits, to_persian_digits
+from transactions.search import CLIENT_SEARCH_FIELDS, filter_normalized
 from weasyprint.text.fonts import FontConfiguration
 
-_ASCII_TO_PERSIAN = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
-
 
 def to_persian_nums(value):
     if value is None:
         return ""
-    return str(value).translate(_ASCII_TO_PERSIAN)
+    return to_persian_digits(value)
 
 
 def text_to_persian_digits(text):
     if not text:
         return text
-    return str(text).translate(_ASCII_TO_PERSIAN)
+    return to_persian_digits(text)
 
 
 PLACEHOLDER = "......"
@@ -545,8 +545,8 @@ def client_search_api(request):
     qs = Client.objects.filter(office=office).order_by("-created_at")
     q = (request.GET.get("q") or "").strip()
     if q:
-        qs = qs.filter(
-            Q(name__icontains=q) | Q(national_id__icontains=q) | Q(phone__icontains=q)
+        qs = filter_normalized(qs, CLIENT_SEARCH_FIELDS, q, stored=True).order_by(
+            "-score", "-created_at"
         )
     qs = qs[:50]
     clients = [
@@ -577,7 +577,7 @@ def quick_create_client(request):
     office = getattr(request.user, "office", None)
     if national_id and national_id.strip():
         national_id = national_id.strip()
-        qs = Client.objects.filter(national_id=national_id)
+        qs = Client.objects.filter(national_id_normalized=normalize_digits(national_id))
         if office:
             qs = qs.filter(office=office)
         existing = qs.first()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from transactions.models import Client
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the normalized shadow columns of clients (name, national id, "
+        "phone). Run once after adding the columns, or after bulk updates that "
+        "bypassed Client.save()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Clients read and updated per batch (default 1000).",
+        )
+
+    def handle(self, *args, **options):
+        changed = Client.refresh_normalized(batch_size=max(options["batch_size"], 1))
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ ستون‌های نرمال‌شده {changed} مشتری به‌روز شد.")
+        )
@@ -1,8 +1,16 @@
 from ckeditor.fields import RichTextField
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
 from django.utils import timezone
 from users.models import Consultant, CustomUser, Office
 
+from .normalization import PersianNormalize, normalize_digits, normalize_persian
+
+
+def trigram_index(field, name):
+    """ایندکس GIN trigram روی متن نرمال‌شده فیلد (برای transactions.search)."""
+    return GinIndex(OpClass(PersianNormalize(field), name="gin_trgm_ops"), name=name)
+
 
 class Client(models.Model):
     name = models.CharField(max_length=255)
@@ -20,11 +28,88 @@ class Client(models.Model):
     )
     phone = models.CharField(max_length=20, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
-    office = models.ForeignKey(Office, on_delete=models.SET_NULL, null=True, blank=True)
+    # ایندکس جدا ندارد: پیشوند ایندکس‌های ترکیبی client_office_* است
+    office = models.ForeignKey(
+        Office, on_delete=models.SET_NULL, null=True, blank=True, db_index=False
+    )
+    # ستون‌های نرمال‌شده (normalization.py) برای جستجو و تشخیص تکراری؛ در save پر می‌شوند
+    name_normalized = models.CharField(
+        max_length=255, blank=True, default="", editable=False, db_index=True
+    )
+    national_id_normalized = models.CharField(
+        max_length=10, blank=True, default="", editable=False
+    )
+    phone_normalized = models.CharField(
+        max_length=20, blank=True, default="", editable=False, db_index=True
+    )
+
+    NORMALIZED_FIELDS = {
+        "name": ("name_normalized", normalize_persian),
+        "national_id": ("national_id_normalized", normalize_digits),
+        "phone": ("phone_normalized", normalize_digits),
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["office", "national_id_normalized"],
+                name="client_office_national_id",
+            ),
+            models.Index(fields=["office", "created_at"], name="client_office_created"),
+            GinIndex(
+                fields=["name_normalized"],
+                opclasses=["gin_trgm_ops"],
+                name="client_name_trgm",
+            ),
+            GinIndex(
+                fields=["national_id_normalized"],
+                opclasses=["gin_trgm_ops"],
+                name="client_national_id_trgm",
+            ),
+            GinIndex(
+                fields=["phone_normalized"],
+                opclasses=["gin_trgm_ops"],
+                name="client_phone_trgm",
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def normalize_fields(self):
+        """پر کردن ستون‌های نرمال‌شده از مقدار فعلی نام، کد ملی و تلفن."""
+        for source, (target, normalize) in self.NORMALIZED_FIELDS.items():
+            setattr(self, target, normalize(getattr(self, source)))
+
+    def save(self, *args, **kwargs):
+        self.normalize_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {
+                target
+                for source, (target, _) in self.NORMALIZED_FIELDS.items()
+                if source in update_fields
+            }
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def refresh_normalized(cls, batch_size=1000):
+        """
+        بازسازی ستون‌های نرمال‌شده همه مشتریان (پس از افزودن ستون‌ها یا ویرایش با
+        update()). برمی‌گرداند تعداد ردیف‌های تغییرکرده.
+        """
+        changed = []
+        targets = [target for target, _ in cls.NORMALIZED_FIELDS.values()]
+        for client in cls.objects.only("id", *cls.NORMALIZED_FIELDS, *targets).iterator(
+            chunk_size=batch_size
+        ):
+            before = [getattr(client, target) for target in targets]
+            client.normalize_fields()
+            if before != [getattr(client, target) for target in targets]:
+                changed.append(client)
+        cls.objects.bulk_update(changed, targets, batch_size=batch_size)
+        return len(changed)
+
 
 class TransactionType(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -74,7 +159,10 @@ class Deals(models.Model):
     )
     buyers = models.ManyToManyField(Client, related_name="purchased_deals", blank=True)
     sellers = models.ManyToManyField(Client, related_name="sold_deals", blank=True)
-    office = models.ForeignKey(Office, on_delete=models.SET_NULL, null=True, blank=True)
+    # ایندکس جدا ندارد: پیشوند ایندکس‌های ترکیبی deals_office_* است
+    office = models.ForeignKey(
+        Office, on_delete=models.SET_NULL, null=True, blank=True, db_index=False
+    )
     created_by = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, null=True, blank=True
     )
@@ -86,6 +174,19 @@ class Deals(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     rejection_reason = models.TextField(blank=True, default="", verbose_name="علت رد")
 
+    class Meta:
+        indexes = [
+            # لیست معاملات بنگاه به ترتیب جدیدترین (id برای صفحه‌بندی cursor)
+            models.Index(
+                fields=["office", "created_at", "id"], name="deals_office_created"
+            ),
+            models.Index(
+                fields=["office", "status", "created_at"],
+                name="deals_office_status_created",
+            ),
+            trigram_index("title", "deals_title_trgm"),
+        ]
+
     def __str__(self):
         return f"{self.type.name} - {self.amount} ریال"
 
@@ -249,6 +350,14 @@ class DealProperty(models.Model):
         max_length=20, blank=True, default="", verbose_name="کد پستی"
     )
 
+    class Meta:
+        indexes = [
+            trigram_index("registry_main_number", "property_registry_main_trgm"),
+            trigram_index("registry_sub_number", "property_registry_sub_trgm"),
+            trigram_index("registry_piece_number", "property_registry_piece_trgm"),
+            trigram_index("property_address", "property_address_trgm"),
+        ]
+
     def __str__(self):
         return f"اطلاعات ملک معامله {self.deal_id}"
 
@@ -383,6 +492,7 @@ class DealContract(models.Model):
         on_delete=models.CASCADE,
         related_name="contracts",
         verbose_name="معامله مربوطه",
+        db_index=False,  # پیشوند ایندکس contract_deal_created
     )
     template = models.ForeignKey(
         ContractTemplate,
@@ -399,5 +509,10 @@ class DealContract(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["deal", "created_at"], name="contract_deal_created"),
+        ]
+
     def __str__(self):
         return f"قرارداد معامله {self.deal.id} - {self.template.title if self.template else 'بدون الگو'}"
@@ -0,0 +1,70 @@
+"""
+نرمال‌سازی متن فارسی برای جستجو و مقایسه: ی و ک عربی به فارسی، ارقام فارسی و عربی به
+لاتین، نیم‌فاصله به فاصله و حروف کوچک. همان تبدیل هم در پایتون (normalize_persian، برای
+عبارت جستجو و ستون‌های نرمال‌شده مدل‌ها) و هم در SQL (PersianNormalize، برای ایندکس‌های
+عبارتی و فیلترها) انجام می‌شود تا مقدار جستجوشده و ستون ایندکس‌شده یکسان نرمال شوند.
+"""
+
+import re
+
+from django.db.models import CharField, Func
+
+PERSIAN_DIGITS = "۰۱۲۳۴۵۶۷۸۹"
+ARABIC_DIGITS = "٠١٢٣٤٥٦٧٨٩"
+ASCII_DIGITS = "0123456789"
+
+_FROM_CHARS = "يىك" + PERSIAN_DIGITS + ARABIC_DIGITS + "‌"
+_TO_CHARS = "ییک" + ASCII_DIGITS + ASCII_DIGITS + " "
+_TRANSLATION = str.maketrans(_FROM_CHARS, _TO_CHARS)
+_FOLD_DIGITS = str.maketrans(PERSIAN_DIGITS + ARABIC_DIGITS, ASCII_DIGITS * 2)
+_TO_PERSIAN_DIGITS = str.maketrans(ASCII_DIGITS, PERSIAN_DIGITS)
+_SPACES = re.compile(r"\s+")
+_NON_DIGITS = re.compile(r"[^0-9]")
+
+
+def fold_digits(value):
+    """ارقام فارسی و عربی به لاتین (بقیه متن بدون تغییر)."""
+    return str(value).translate(_FOLD_DIGITS)
+
+
+def to_persian_digits(value):
+    """ارقام لاتین به فارسی (برای نمایش)."""
+    return str(value).translate(_TO_PERSIAN_DIGITS)
+
+
+def normalize_digits(value):
+    """فقط ارقام (لاتین) یک مقدار عددی مثل کد ملی یا تلفن؛ برای None رشته خالی."""
+    if value is None:
+        return ""
+    return _NON_DIGITS.sub("", fold_digits(value))
+
+
+def normalize_persian(value):
+    """نسخه نرمال‌شده متن (برای None رشته خالی) با فاصله‌های تکراری حذف‌شده."""
+    if value is None:
+        return ""
+    return _SPACES.sub(" ", str(value).translate(_TRANSLATION)).strip().lower()
+
+
+class PersianNormalize(Func):
+    """
+    عبارت SQL نرمال‌سازی یک ستون (translate روی lower، سپس فاصله‌های پشت سر هم یکی و دو
+    سر متن trim می‌شود؛ همان ترتیب normalize_persian). ایندکس‌های trigram روی همین عبارت
+    ساخته می‌شوند، پس فیلترها باید از همین کلاس استفاده کنند تا ایندکس به کار رود.
+    """
+
+    function = "TRANSLATE"
+    output_field = CharField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler,
+            connection,
+            template=(
+                "BTRIM(REGEXP_REPLACE(TRANSLATE(LOWER(%(expressions)s), "
+                "%(from_chars)s, %(to_chars)s), '\\s+', ' ', 'g'))"
+            ),
+            from_chars=f"'{_FROM_CHARS}'",
+            to_chars=f"'{_TO_CHARS}'",
+            **extra_context,
+        )
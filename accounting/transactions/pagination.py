@@ -1,6 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
+COUNT_CACHE_TIMEOUT = 60
+
 
 class CustomPagination(PageNumberPagination):
     page_size = 10  # The number of items per page
@@ -18,3 +23,52 @@ class CustomPagination(PageNumberPagination):
                 "results": data,  # Paginated data (list of deals)
             }
         )
+
+
+def cached_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """
+    COUNT(*) of the queryset, cached for a short time under a key derived from its
+    SQL, so repeated infinite-scroll requests do not recount the whole office.
+    """
+    key = "pagination:count:" + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Cursor pagination on (created_at, id), newest first: no OFFSET on deep pages and
+    no COUNT(*) unless the client asks for it with ?count=1 (then it is cached).
+    """
+
+    page_size = 10
+    page_size_query_param = "size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get("count") in ("1", "true"):
+            self.count = cached_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,  # None unless ?count=1
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+
+def get_list_pagination(request):
+    """Cursor mode with ?pagination=cursor (or a cursor param), page numbers otherwise."""
+    params = request.query_params
+    if params.get("pagination") == "cursor" or "cursor" in params:
+        return CreatedAtCursorPagination()
+    return CustomPagination()
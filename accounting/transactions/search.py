@@ -0,0 +1,147 @@
+"""
+جستجوی رتبه‌بندی‌شده روی معاملات (عنوان)، مشتریان (نام، کد ملی، تلفن) و اطلاعات ملک
+(شماره‌های ثبتی و آدرس) یک بنگاه.
+
+فیلدها با PersianNormalize نرمال می‌شوند (مشتریان ستون‌های نرمال‌شده ذخیره‌شده دارند) و
+روی همان عبارت یا ستون ایندکس GIN با gin_trgm_ops دارند (Meta.indexes مدل‌ها؛ فقط PostgreSQL)،
+پس هم جستجوی زیررشته (LIKE '%q%') و هم شباهت trigram از ایندکس استفاده می‌کنند. رتبه
+بیشترین شباهت trigram بین فیلدهای هر ردیف است.
+"""
+
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import Client, DealProperty, Deals
+from .normalization import PersianNormalize, normalize_persian
+
+SEARCH_MIN_LENGTH = 2
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+DEAL_SEARCH_FIELDS = ("title",)
+CLIENT_SEARCH_FIELDS = ("name_normalized", "national_id_normalized", "phone_normalized")
+PROPERTY_SEARCH_FIELDS = (
+    "registry_main_number",
+    "registry_sub_number",
+    "registry_piece_number",
+    "property_address",
+)
+
+
+def filter_normalized(qs, fields, query, stored=False):
+    """
+    فیلتر qs به ردیف‌هایی که یکی از fields (نرمال‌شده) شامل query (نرمال‌شده) یا شبیه
+    آن (trigram) است، با score بیشترین شباهت.
+    stored=True یعنی fields خودشان ستون‌های نرمال‌شده ذخیره‌شده‌اند؛ در این حالت query
+    برای هر ستون با همان تابع ستون نرمال می‌شود (NORMALIZED_FIELDS مدل، مثلاً فقط ارقام
+    برای کد ملی و تلفن) و ستونی که query برایش خالی می‌شود (متن برای ستون عددی) کنار
+    گذاشته می‌شود.
+    """
+    if stored:
+        normalizers = {
+            target: normalize
+            for target, normalize in getattr(qs.model, "NORMALIZED_FIELDS", {}).values()
+        }
+        queries = {
+            f"_{field}": (F(field), normalizers.get(field, normalize_persian)(query))
+            for field in fields
+        }
+    else:
+        query = normalize_persian(query)
+        queries = {
+            f"{field}_normalized": (PersianNormalize(field), query) for field in fields
+        }
+    queries = {alias: pair for alias, pair in queries.items() if pair[1]}
+    if not queries:
+        return qs.none()
+    qs = qs.alias(**{alias: expression for alias, (expression, _) in queries.items()})
+    condition = reduce(
+        or_,
+        (
+            Q(**{f"{alias}__contains": value})
+            | Q(**{f"{alias}__trigram_similar": value})
+            for alias, (_, value) in queries.items()
+        ),
+    )
+    similarities = [
+        TrigramSimilarity(alias, value) for alias, (_, value) in queries.items()
+    ]
+    score = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+    return qs.filter(condition).annotate(score=score)
+
+
+def search_office(user, query, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    جستجوی یک‌جا در معاملات، مشتریان و املاک بنگاه کاربر (برای مشاور فقط معاملات خودش).
+    برمی‌گرداند لیست دیکت {"kind", "id", "deal_id", "title", "subtitle", "score"}
+    مرتب‌شده بر اساس score؛ هر نوع حداکثر limit ردیف و در مجموع limit ردیف.
+    """
+    office = getattr(user, "office", None)
+    if len(normalize_persian(query)) < SEARCH_MIN_LENGTH:
+        return []
+    consultant = getattr(user, "consultant_profile", None)
+    if getattr(user, "is_consultant", False) and consultant:
+        deals = Deals.objects.filter(consultants=consultant)
+        properties = DealProperty.objects.filter(deal__consultants=consultant)
+    elif office:
+        deals = Deals.objects.filter(office=office)
+        properties = DealProperty.objects.filter(deal__office=office)
+    else:
+        return []
+    clients = Client.objects.filter(office=office) if office else Client.objects.none()
+
+    results = []
+    for deal in filter_normalized(deals, DEAL_SEARCH_FIELDS, query).order_by(
+        "-score", "-created_at"
+    )[:limit]:
+        results.append(
+            {
+                "kind": "deal",
+                "id": deal.id,
+                "deal_id": deal.id,
+                "title": deal.title,
+                "subtitle": deal.get_status_display(),
+                "score": deal.score,
+            }
+        )
+    for client in filter_normalized(
+        clients, CLIENT_SEARCH_FIELDS, query, stored=True
+    ).order_by("-score", "-created_at")[:limit]:
+        results.append(
+            {
+                "kind": "client",
+                "id": client.id,
+                "deal_id": None,
+                "title": client.name,
+                "subtitle": " - ".join(
+                    v for v in (client.national_id, client.phone) if v
+                ),
+                "score": client.score,
+            }
+        )
+    for prop in (
+        filter_normalized(properties, PROPERTY_SEARCH_FIELDS, query)
+        .select_related("deal")
+        .order_by("-score", "-id")[:limit]
+    ):
+        registry = "/".join(
+            v for v in (prop.registry_main_number, prop.registry_sub_number) if v
+        )
+        results.append(
+            {
+                "kind": "property",
+                "id": prop.id,
+                "deal_id": prop.deal_id,
+                "title": prop.deal.title,
+                "subtitle": " - ".join(
+                    v for v in (registry, prop.property_address) if v
+                ),
+                "score": prop.score,
+            }
+        )
+    results.sort(key=lambda r: r["score"], reverse=True)
+    return results[:limit]
@@ -95,6 +95,9 @@ class DealsListSerializer(serializers.ModelSerializer):
             return False
         if obj.status != "consultant_pending":
             return False
+        if hasattr(obj, "pending_approval"):
+            # annotation در DealsListView (Exists)
+            return obj.pending_approval
         consultant = getattr(request.user, "consultant_profile", None)
         if not consultant:
             return False
@@ -124,6 +127,9 @@ class DealsListSerializer(serializers.ModelSerializer):
         ]
 
     def get_latest_contract_id(self, obj):
+        if hasattr(obj, "latest_contract_pk"):
+            # annotation در DealsListView (Subquery)
+            return obj.latest_contract_pk
         contract = obj.contracts.order_by("-created_at").first()
         return contract.pk if contract else None
 
@@ -0,0 +1,16 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import pre_migrate
+from django.dispatch import receiver
+
+
+@receiver(pre_migrate)
+def create_trigram_extension(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    ایندکس‌های جستجوی trigram (transactions.search) به افزونه pg_trgm نیاز دارند؛
+    پیش از اجرای migrationهای transactions در PostgreSQL ساخته می‌شود.
+    """
+    connection = connections[using]
+    if sender.name != "transactions" or connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
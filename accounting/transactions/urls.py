@@ -15,6 +15,7 @@ from transactions.views import (
     DealsListView,
     DeleteDealView,
     RejectDealView,
+    SearchView,
     UpdateCommissionSplitView,
     UpdateDealView,
 )
@@ -24,6 +25,7 @@ urlpatterns = [
     # path("list-view/", DealsListPageView.as_view(), name="deals-list-view"),
     path("list/", DealsListView.as_view(), name="deals-list"),
     path("contracts-list/", ContractListView.as_view(), name="contracts-list"),
+    path("search/", SearchView.as_view(), name="deals-search"),
     path("list/<int:id>/", DealDetailView.as_view(), name="deal-detail"),
     path("consultant/", ConsultantListByOfficeView.as_view(), name="consultant-list"),
     path("clients/", ClientListByOfficeView.as_view(), name="client-list"),
@@ -1,11 +1,12 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
 from django.http import Http404
 from django.utils import timezone
 from django.views.generic import TemplateView
 from drf_yasg.utils import swagger_auto_schema
 from finance.models import DealFinance
-from finance.services import create_deal_ledger_entry
+from finance.services import check_deal_open, create_deal_ledger_entry
 from rest_framework import status
 from rest_framework.generics import RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
@@ -22,7 +23,9 @@ from .models import (
     Deals,
     TransactionType,
 )
-from .pagination import CustomPagination
+from .normalization import PersianNormalize, normalize_digits, normalize_persian
+from .pagination import get_list_pagination
+from .search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, search_office
 from .serializers import (
     CommissionSplitSerializer,
     ContractListSerializer,
@@ -33,38 +36,54 @@ from .serializers import (
 
 
 class DealsListView(APIView):
+    """
+    لیست معاملات. آخرین قرارداد و وضعیت تایید مشاور به‌صورت annotation (Subquery/Exists)
+    و نوع و ثبت‌کننده با join خوانده می‌شوند؛ هر صفحه با دو کوئری (شمارش و صفحه) ساخته می‌شود.
+    با ?pagination=cursor صفحه‌بندی cursor روی (created_at, id) و بدون شمارش انجام می‌شود.
+    """
+
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         user = request.user
         office = getattr(user, "office", None)
+        latest_contract = (
+            DealContract.objects.filter(deal=OuterRef("pk"))
+            .order_by("-created_at", "-pk")
+            .values("pk")[:1]
+        )
 
         if getattr(user, "is_consultant", False) and getattr(
             user, "consultant_profile", None
         ):
             consultant = user.consultant_profile
-            deals = (
-                Deals.objects.filter(
-                    consultants=consultant,
-                    status__in=["consultant_pending", "pending", "approved"],
+            deals = Deals.objects.filter(
+                consultants=consultant,
+                status__in=["consultant_pending", "pending", "approved"],
+            ).annotate(
+                pending_approval=Exists(
+                    DealConsultantApproval.objects.filter(
+                        deal=OuterRef("pk"),
+                        consultant=consultant,
+                        status=DealConsultantApproval.ApprovalStatus.PENDING,
+                    )
                 )
-                .select_related("created_by")
-                .prefetch_related("contracts")
-                .order_by("-created_at")
             )
         elif office:
-            deals = (
-                Deals.objects.filter(office=office)
-                .select_related("created_by")
-                .prefetch_related("contracts")
-                .order_by("-created_at")
-            )
+            deals = Deals.objects.filter(office=office)
         else:
             deals = Deals.objects.none()
+        deals = (
+            deals.select_related("type", "created_by")
+            .annotate(latest_contract_pk=Subquery(latest_contract))
+            .order_by("-created_at")
+        )
 
-        search = (request.GET.get("search") or "").strip()
+        search = normalize_persian(request.GET.get("search"))
         if search:
-            deals = deals.filter(title__icontains=search)
+            deals = deals.alias(title_normalized=PersianNormalize("title")).filter(
+                title_normalized__contains=search
+            )
 
         status_filter = (request.GET.get("status") or "").strip()
         if status_filter:
@@ -78,7 +97,7 @@ class DealsListView(APIView):
             if status_filter in valid_statuses:
                 deals = deals.filter(status=status_filter)
 
-        paginator = CustomPagination()
+        paginator = get_list_pagination(request)
         result_page = paginator.paginate_queryset(deals, request)
 
         serializer = DealsListSerializer(
@@ -88,7 +107,27 @@ class DealsListView(APIView):
         return paginator.get_paginated_response(serializer.data)
 
 
+class SearchView(APIView):
+    """
+    جستجوی رتبه‌بندی‌شده در معاملات، مشتریان و املاک بنگاه (پارامترهای q و limit).
+    متن با ی/ک عربی، ارقام فارسی یا نیم‌فاصله هم پیدا می‌شود.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.GET.get("limit") or SEARCH_DEFAULT_LIMIT)
+        except ValueError:
+            limit = SEARCH_DEFAULT_LIMIT
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        results = search_office(request.user, request.GET.get("q") or "", limit=limit)
+        return Response({"results": results})
+
+
 class ContractListView(APIView):
+    """لیست قراردادهای بنگاه؛ با ?pagination=cursor صفحه‌بندی cursor روی (created_at, id)."""
+
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
@@ -102,7 +141,7 @@ class ContractListView(APIView):
                 .select_related("deal", "deal__type", "template")
                 .order_by("-created_at")
             )
-        paginator = CustomPagination()
+        paginator = get_list_pagination(request)
         result_page = paginator.paginate_queryset(qs, request)
         serializer = ContractListSerializer(result_page, many=True)
         return paginator.get_paginated_response(serializer.data)
@@ -227,7 +266,9 @@ class ClientListByOfficeView(APIView):
 
         if national_id and str(national_id).strip():
             national_id = str(national_id).strip()
-            qs = Client.objects.filter(national_id=national_id)
+            qs = Client.objects.filter(
+                national_id_normalized=normalize_digits(national_id)
+            )
             if office:
                 qs = qs.filter(office=office)
             existing = qs.first()
@@ -345,6 +386,11 @@ class DeleteDealView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        try:
+            check_deal_open(deal)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         deal.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
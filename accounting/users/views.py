@@ -10,9 +10,9 @@ from django.urls import reverse, reverse_lazy
 from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView
 from finance.models import AccountEntry, AccountPayment
+from finance.services import get_balances
 from finance.utils import (
-    ensure_client_account,
-    ensure_client_payable_account,
+    ensure_accounts_for,
     ensure_consultant_accounts,
 )
 from rest_framework.authentication import SessionAuthentication
@@ -402,21 +402,23 @@ def client_account_detail(request, client_id):
     office = getattr(request.user, "office", None)
     client = get_object_or_404(Client, id=client_id, office=office)
 
-    acc_receivable = ensure_client_account(client)
-    acc_payable = ensure_client_payable_account(client)
+    accounts = ensure_accounts_for(clients=[client], client_payables=[client])
+    acc_receivable = accounts[("client_receivable", client.id)]
+    acc_payable = accounts[("client_payable", client.id)]
 
-    balance_receivable = acc_receivable.get_balance()
-    balance_payable = acc_payable.get_balance()
+    balances = get_balances([acc_receivable.id, acc_payable.id])
+    balance_receivable = balances[acc_receivable.id]
+    balance_payable = balances[acc_payable.id]
 
     entries_receivable = (
         AccountEntry.objects.filter(account=acc_receivable)
         .select_related("transaction")
-        .order_by("-transaction__date", "-id")[:30]
+        .order_by("-date", "-id")[:30]
     )
     entries_payable = (
         AccountEntry.objects.filter(account=acc_payable)
         .select_related("transaction")
-        .order_by("-transaction__date", "-id")[:30]
+        .order_by("-date", "-id")[:30]
     )
 
     payments_receivable = AccountPayment.objects.filter(
@@ -468,18 +470,19 @@ def consultant_account_detail(request, consultant_id):
 
     acc_payable, acc_receivable = ensure_consultant_accounts(consultant)
 
-    balance_payable = acc_payable.get_balance()
-    balance_receivable = acc_receivable.get_balance()
+    balances = get_balances([acc_payable.id, acc_receivable.id])
+    balance_payable = balances[acc_payable.id]
+    balance_receivable = balances[acc_receivable.id]
 
     entries_payable = (
         AccountEntry.objects.filter(account=acc_payable)
         .select_related("transaction")
-        .order_by("-transaction__date", "-id")[:30]
+        .order_by("-date", "-id")[:30]
     )
     entries_receivable = (
         AccountEntry.objects.filter(account=acc_receivable)
         .select_related("transaction")
-        .order_by("-transaction__date", "-id")[:30]
+        .order_by("-date", "-id")[:30]
     )
 
     payments_payable = AccountPayment.objects.filter(account=acc_payable).order_by(